@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Appointment, AppointmentHistory
+from .models import Appointment, AppointmentHistory, AppointmentHistoryArchive
 
 
 @admin.register(Appointment)
@@ -38,3 +38,11 @@ class AppointmentHistoryAdmin(admin.ModelAdmin):
                     'changed_by__first_name', 'changed_by__last_name')
     ordering = ('-created_at',)
     readonly_fields = ('created_at',)
+
+
+@admin.register(AppointmentHistoryArchive)
+class AppointmentHistoryArchiveAdmin(admin.ModelAdmin):
+    list_display = ('appointment_id', 'change_type', 'changed_by_id', 'created_at', 'month')
+    list_filter = ('change_type', 'month')
+    search_fields = ('appointment_id',)
+    ordering = ('-created_at',)
@@ -0,0 +1,152 @@
+"""Ghi lịch sử lịch hẹn (AppointmentHistory) theo lô.
+
+`record_history` không insert ngay trong request: sự kiện được đưa vào bộ đệm
+của tiến trình khi transaction commit (thay đổi bị rollback thì không có lịch
+sử), rồi cả bộ đệm được ghi bằng một `bulk_create` khi đủ
+APPOINTMENT_AUDIT_FLUSH_SIZE sự kiện hoặc sau APPOINTMENT_AUDIT_FLUSH_SECONDS
+giây. Khi tiến trình thoát, phần còn lại được ghi nốt; tiến trình bị kill đột
+ngột có thể mất tối đa một bộ đệm.
+
+Đặt APPOINTMENT_AUDIT_FLUSH_SIZE = 1 để ghi đồng bộ như trước.
+
+Lịch sử cũ được chuyển theo từng tháng sang AppointmentHistoryArchive
+(`archive_appointment_history`) để bảng đang dùng luôn nhỏ.
+"""
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import AppointmentHistory, AppointmentHistoryArchive
+
+logger = logging.getLogger(__name__)
+
+
+class AuditBuffer:
+    """Bộ đệm AppointmentHistory chờ ghi, dùng chung giữa các thread của tiến trình"""
+
+    def __init__(self, flush_size, flush_seconds):
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._timer = None
+
+    def add(self, entry):
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.flush_size
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.flush_seconds, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def _take(self):
+        with self._lock:
+            entries, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return entries
+
+    def flush(self):
+        """Ghi toàn bộ bộ đệm bằng một bulk_create; trả về số dòng đã ghi"""
+        with self._flush_lock:
+            entries = self._take()
+            if not entries:
+                return 0
+            try:
+                AppointmentHistory.objects.bulk_create(entries)
+            except Exception:
+                logger.exception('Không ghi được %s dòng lịch sử lịch hẹn', len(entries))
+                return 0
+            return len(entries)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # Thread của timer tự mở kết nối CSDL riêng, phải tự đóng
+            connection.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_audit_buffer():
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = AuditBuffer(
+                    flush_size=max(1, getattr(settings, 'APPOINTMENT_AUDIT_FLUSH_SIZE', 50)),
+                    flush_seconds=getattr(settings, 'APPOINTMENT_AUDIT_FLUSH_SECONDS', 2.0),
+                )
+                atexit.register(_buffer.flush)
+    return _buffer
+
+
+def record_history(appointment_id, change_type, old_value=None, new_value=None, changed_by=None, notes=''):
+    """Ghi một dòng lịch sử sau khi transaction hiện tại commit, theo lô"""
+    entry = AppointmentHistory(
+        appointment_id=appointment_id,
+        changed_by=changed_by,
+        change_type=change_type,
+        old_value=old_value,
+        new_value=new_value,
+        notes=notes,
+    )
+    transaction.on_commit(lambda: get_audit_buffer().add(entry))
+
+
+def flush_history():
+    """Ghi ngay các dòng lịch sử đang chờ (trước khi đọc lịch sử)"""
+    return get_audit_buffer().flush()
+
+
+def month_start(value):
+    """Mốc 0:00 ngày 1 của tháng chứa `value` (giờ địa phương)"""
+    local = timezone.localtime(value)
+    return local.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month(start):
+    return timezone.make_aware(datetime(start.year + start.month // 12, start.month % 12 + 1, 1))
+
+
+def archive_history_month(start, batch_size=1000):
+    """Chuyển lịch sử của tháng bắt đầu lúc `start` sang AppointmentHistoryArchive; trả về số dòng đã chuyển"""
+    end = next_month(start)
+    moved = 0
+    fields = ['id', 'appointment_id', 'changed_by_id', 'change_type', 'old_value', 'new_value', 'notes', 'created_at']
+    while True:
+        with transaction.atomic():
+            rows = list(
+                AppointmentHistory.objects.filter(created_at__gte=start, created_at__lt=end)
+                .order_by('pk').values_list(*fields)[:batch_size]
+            )
+            if not rows:
+                return moved
+            # ignore_conflicts: chạy lại sau khi bị dừng giữa chừng không nhân đôi dòng lưu trữ
+            AppointmentHistoryArchive.objects.bulk_create([
+                AppointmentHistoryArchive(
+                    original_id=pk, appointment_id=appointment_id, changed_by_id=changed_by_id,
+                    change_type=change_type, old_value=old_value, new_value=new_value, notes=notes,
+                    created_at=created_at, month=start.date(),
+                )
+                for pk, appointment_id, changed_by_id, change_type, old_value, new_value, notes, created_at in rows
+            ], ignore_conflicts=True)
+            AppointmentHistory.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        moved += len(rows)
@@ -0,0 +1,229 @@
+"""Kiểm tra lịch trống của bác sĩ bằng chỉ mục khoảng thời gian.
+
+Lịch hẹn của một bác sĩ trong một ngày được nạp bằng một truy vấn
+`values_list` gọn (id, giờ bắt đầu, thời lượng, tên khách, trạng thái) và sắp
+theo giờ bắt đầu. Kèm theo là mảng "giờ kết thúc lớn nhất tính đến vị trí i",
+nên các lịch trùng với khoảng [start, end) được tìm bằng hai lần tìm nhị phân
+thay vì duyệt và `datetime.combine` từng lịch hẹn.
+
+Thời gian được biểu diễn bằng số phút tính từ 0:00 của ngày hẹn.
+"""
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from datetime import time, timedelta
+
+from .models import Appointment
+
+Booking = namedtuple('Booking', ['id', 'start', 'end', 'customer_name', 'status'])
+
+STATUS_LABELS = dict(Appointment.STATUS_CHOICES)
+
+SLOT_STEP_MINUTES = 15
+
+
+def business_hours(day):
+    """Khoảng giờ được phép bắt đầu lịch hẹn (phút): Chủ nhật 8–12, thứ 2–7 8–20"""
+    if day.weekday() == 6:
+        return 8 * 60, 12 * 60
+    return 8 * 60, 20 * 60
+
+
+def to_minutes(value):
+    """time -> số phút từ 0:00"""
+    return value.hour * 60 + value.minute
+
+
+def format_minutes(minutes):
+    """Số phút từ 0:00 -> 'HH:MM'"""
+    return time(minutes // 60 % 24, minutes % 60).strftime('%H:%M')
+
+
+class DayIndex:
+    """Các lịch hẹn của một bác sĩ trong một ngày, sắp theo giờ bắt đầu"""
+
+    def __init__(self, bookings=()):
+        self.bookings = sorted(bookings, key=lambda booking: (booking.start, booking.id))
+        self.starts = [booking.start for booking in self.bookings]
+        self.max_ends = []
+        running = None
+        for booking in self.bookings:
+            running = booking.end if running is None else max(running, booking.end)
+            self.max_ends.append(running)
+
+    def __len__(self):
+        return len(self.bookings)
+
+    def conflicts(self, start, end, exclude_id=None):
+        """Các lịch hẹn giao với khoảng [start, end) (phút)"""
+        # Chỉ lịch bắt đầu trước `end` mới có thể trùng; trong đó bỏ qua phần đầu
+        # mà mọi lịch đều đã kết thúc trước `start` (max_ends tăng dần).
+        hi = bisect_left(self.starts, end)
+        lo = bisect_right(self.max_ends, start, 0, hi)
+        return [
+            booking for booking in self.bookings[lo:hi]
+            if booking.end > start and booking.id != exclude_id
+        ]
+
+    def starting_at(self, start, exclude_id=None):
+        """Các lịch hẹn bắt đầu đúng phút `start`"""
+        lo = bisect_left(self.starts, start)
+        hi = bisect_right(self.starts, start)
+        return [booking for booking in self.bookings[lo:hi] if booking.id != exclude_id]
+
+    def is_free(self, start, end, exclude_id=None):
+        return not self.conflicts(start, end, exclude_id=exclude_id)
+
+    def conflicts_many(self, slots, exclude_id=None):
+        """Kiểm tra nhiều khoảng (start, end) cùng lúc; trả về list conflicts theo thứ tự slots"""
+        return [self.conflicts(start, end, exclude_id=exclude_id) for start, end in slots]
+
+    def free_starts(self, duration, opening, closing, step=SLOT_STEP_MINUTES, not_before=None, limit=None):
+        """Các giờ bắt đầu còn trống trong [opening, closing), theo lưới `step` phút từ `opening`.
+
+        Khi gặp lịch trùng, nhảy thẳng tới mốc lưới đầu tiên sau khi các lịch đó kết thúc.
+        """
+        def align(minute):
+            return opening + -(-(minute - opening) // step) * step
+
+        starts = []
+        current = opening if not_before is None or not_before <= opening else align(not_before)
+        while current < closing and (limit is None or len(starts) < limit):
+            blocking = self.conflicts(current, current + duration) or self.starting_at(current)
+            if not blocking:
+                starts.append(current)
+                current += step
+            else:
+                current = max(current + step, align(max(booking.end for booking in blocking)))
+        return starts
+
+
+def _bookings(queryset):
+    rows = queryset.values_list(
+        'doctor_id', 'appointment_date', 'id', 'appointment_time', 'duration_minutes',
+        'customer_name', 'status',
+    ).order_by()
+    for doctor_id, day, appointment_id, start_time, duration, customer_name, status in rows:
+        start = to_minutes(start_time)
+        yield (doctor_id, day), Booking(appointment_id, start, start + (duration or 0), customer_name, status)
+
+
+def load_indexes(doctor_ids, days, exclude_ids=()):
+    """Chỉ mục cho mọi cặp (bác sĩ, ngày) trong một truy vấn.
+
+    Trả về dict (doctor_id, date) -> DayIndex; cặp không có lịch hẹn nào cũng
+    có một DayIndex rỗng.
+    """
+    doctor_ids = {int(doctor_id) for doctor_id in doctor_ids}
+    days = set(days)
+    queryset = Appointment.objects.filter(doctor_id__in=doctor_ids, appointment_date__in=days)
+    if exclude_ids:
+        queryset = queryset.exclude(pk__in=list(exclude_ids))
+
+    grouped = {(doctor_id, day): [] for doctor_id in doctor_ids for day in days}
+    for key, booking in _bookings(queryset):
+        grouped.setdefault(key, []).append(booking)
+    return {key: DayIndex(bookings) for key, bookings in grouped.items()}
+
+
+def load_day_index(doctor_id, day, exclude_ids=()):
+    """Chỉ mục lịch hẹn của một bác sĩ trong một ngày"""
+    return load_indexes([doctor_id], [day], exclude_ids=exclude_ids)[(int(doctor_id), day)]
+
+
+def find_conflicts(doctor_id, day, start_time, duration_minutes, exclude_id=None):
+    """Các lịch hẹn của bác sĩ trùng với lịch mới bắt đầu lúc `start_time`"""
+    start = to_minutes(start_time)
+    index = load_day_index(doctor_id, day)
+    return index.conflicts(start, start + duration_minutes, exclude_id=exclude_id)
+
+
+def slot_conflicts(doctor_id, day, start_time, duration_minutes, exclude_id=None):
+    """Lịch chồng giờ, hoặc trùng đúng giờ bắt đầu (unique_together), với lịch dự kiến"""
+    start = to_minutes(start_time)
+    index = load_day_index(doctor_id, day)
+    return (index.conflicts(start, start + duration_minutes, exclude_id=exclude_id)
+            or index.starting_at(start, exclude_id=exclude_id))
+
+
+def check_slots(slots, exclude_id=None):
+    """Kiểm tra hàng loạt lịch dự kiến (doctor_id, date, start_time, duration_minutes).
+
+    Tất cả chỉ mục cần thiết được nạp bằng một truy vấn. Trả về list các list
+    Booking trùng (chồng giờ hoặc cùng giờ bắt đầu), cùng thứ tự với `slots`
+    (list rỗng = còn trống).
+    """
+    slots = list(slots)
+    if not slots:
+        return []
+    indexes = load_indexes({slot[0] for slot in slots}, {slot[1] for slot in slots})
+    results = []
+    for doctor_id, day, start_time, duration_minutes in slots:
+        start = to_minutes(start_time)
+        index = indexes[(int(doctor_id), day)]
+        results.append(index.conflicts(start, start + duration_minutes, exclude_id=exclude_id)
+                       or index.starting_at(start, exclude_id=exclude_id))
+    return results
+
+
+def batch_overlaps(slots):
+    """Các lịch trong cùng lô trùng nhau: với mỗi slot, list vị trí các slot đứng trước bị trùng"""
+    placed = {}
+    results = []
+    for position, (doctor_id, day, start_time, duration_minutes) in enumerate(slots):
+        start = to_minutes(start_time)
+        end = start + duration_minutes
+        earlier = placed.setdefault((int(doctor_id), day), [])
+        results.append([
+            other for other, other_start, other_end in earlier
+            if other_start == start or (other_start < end and start < other_end)
+        ])
+        earlier.append((position, start, end))
+    return results
+
+
+def find_free_slots(doctor_ids, start_date, end_date, duration, limit=5, step=SLOT_STEP_MINUTES, now=None):
+    """Các lịch trống sớm nhất của từng bác sĩ trong khoảng ngày.
+
+    Toàn bộ lịch hẹn của khoảng ngày được nạp bằng một truy vấn. Giờ bắt đầu
+    phải nằm trong giờ làm việc (`business_hours`) và không ở quá khứ. Trả về
+    dict doctor_id -> list (date, start_minute) theo thứ tự thời gian, tối đa
+    `limit` phần tử mỗi bác sĩ.
+    """
+    doctor_ids = [int(doctor_id) for doctor_id in doctor_ids]
+    days = [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+    indexes = load_indexes(doctor_ids, days)
+    today = now.date() if now else None
+    current_minute = to_minutes(now) if now else None
+
+    slots = {}
+    for doctor_id in doctor_ids:
+        found = []
+        for day in days:
+            if len(found) >= limit:
+                break
+            if today and day < today:
+                continue
+            opening, closing = business_hours(day)
+            not_before = current_minute if today and day == today else None
+            for start in indexes[(doctor_id, day)].free_starts(
+                duration, opening, closing, step=step, not_before=not_before, limit=limit - len(found)
+            ):
+                found.append((day, start))
+        slots[doctor_id] = found
+    return slots
+
+
+def service_names_by_appointment(appointment_ids):
+    """Tên dịch vụ của các lịch hẹn trong một truy vấn: id -> [tên]"""
+    names = {appointment_id: [] for appointment_id in appointment_ids}
+    if not names:
+        return names
+    rows = (
+        Appointment.services.through.objects
+        .filter(appointment_id__in=list(names))
+        .values_list('appointment_id', 'service__name')
+        .order_by('appointment_id', 'id')
+    )
+    for appointment_id, service_name in rows:
+        names[appointment_id].append(service_name)
+    return names
@@ -0,0 +1,79 @@
+"""Bảng lịch hẹn trong ngày (today/) và sắp tới (upcoming/) đã render sẵn.
+
+Mỗi chi nhánh (và "tất cả chi nhánh") có một bản JSON đã serialize cho từng
+ngày, lưu trong cache dưới dạng bytes: đọc lại chỉ tốn một lần cache.get. Khi
+một lịch hẹn được ghi, đổi trạng thái hoặc xoá, signal xoá đúng các bản của chi
+nhánh/ngày cũ và mới của lịch đó (sau commit). TTL ngắn chỉ là lưới an toàn cho
+các trường phụ thuộc giờ hiện tại như is_past.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from .models import Appointment
+
+DAY_SHEET_SECONDS = 300
+ACTIVE_STATUSES = ['scheduled', 'confirmed', 'arrived', 'in_progress']
+UPCOMING_LIMIT = 10
+
+
+def sheet_key(kind, branch_id, day):
+    return f'appointments:{kind}:{branch_id or "all"}:{day.isoformat()}'
+
+
+def _queryset(branch_id):
+    queryset = Appointment.objects.select_related('doctor', 'branch', 'created_by', 'consultant').prefetch_related('services')
+    if branch_id:
+        queryset = queryset.filter(branch_id=branch_id)
+    return queryset.filter(status__in=ACTIVE_STATUSES)
+
+
+def _render(appointments):
+    from .serializers import AppointmentListSerializer
+
+    return JSONRenderer().render(AppointmentListSerializer(appointments, many=True).data)
+
+
+def _cached(key, build):
+    content = cache.get(key)
+    if content is None:
+        content = build()
+        cache.set(key, content, DAY_SHEET_SECONDS)
+    return content
+
+
+def today_sheet(day, branch_id=None):
+    """JSON (bytes) các lịch hẹn còn mở của ngày `day`"""
+    return _cached(sheet_key('today', branch_id, day), lambda: _render(
+        _queryset(branch_id).filter(appointment_date=day).order_by('appointment_time')
+    ))
+
+
+def upcoming_sheet(day, branch_id=None):
+    """JSON (bytes) UPCOMING_LIMIT lịch hẹn còn mở sớm nhất từ ngày `day`"""
+    return _cached(sheet_key('upcoming', branch_id, day), lambda: _render(
+        _queryset(branch_id).filter(appointment_date__gte=day).order_by('appointment_date', 'appointment_time')[:UPCOMING_LIMIT]
+    ))
+
+
+def invalidate_day_sheets(slots, today):
+    """Xoá bản render của các cặp (branch_id, date) bị ảnh hưởng.
+
+    Bảng "sắp tới" tính từ hôm nay nên chỉ cần xoá khi lịch thay đổi từ hôm nay trở đi.
+    """
+    keys = set()
+    for branch_id, day in slots:
+        if not day:
+            continue
+        for scope in (branch_id, None):
+            keys.add(sheet_key('today', scope, day))
+            if day >= today:
+                keys.add(sheet_key('upcoming', scope, today))
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def invalidate_on_commit(slots):
+    slots = list(slots)
+    transaction.on_commit(lambda: invalidate_day_sheets(slots, timezone.localdate()))
@@ -0,0 +1,112 @@
+"""Bảng lịch hẹn trực tiếp: pub/sub sự kiện lịch hẹn theo chi nhánh.
+
+Mỗi lần lịch hẹn được tạo, sửa, đổi trạng thái hoặc xoá, signal phát một sự
+kiện (sau khi transaction commit) lên hub. Endpoint SSE của từng chi nhánh
+đăng ký với hub và đẩy sự kiện xuống màn hình lễ tân/bác sĩ ngay lập tức, thay
+cho việc các màn hình liên tục gọi `today/`.
+
+Hub mặc định (`InProcessHub`) chỉ phân phối trong một tiến trình ASGI. Khi
+chạy nhiều tiến trình, trỏ setting `APPOINTMENT_LIVE_HUB` tới một lớp khác
+có cùng giao diện `publish(branch_id, event)` / `subscribe(branch_id)` /
+`unsubscribe(subscription)` dùng broker cục bộ (Redis pub/sub, PostgreSQL
+LISTEN/NOTIFY, ...).
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Hàng đợi sự kiện của một kết nối SSE, gắn với event loop đã tạo ra nó"""
+
+    def __init__(self, branch_id):
+        self.branch_id = branch_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def deliver(self, event):
+        """Đưa sự kiện vào hàng đợi; client quá chậm thì bỏ sự kiện cũ nhất"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def next_event(self, timeout):
+        """Sự kiện tiếp theo, hoặc None nếu hết `timeout` giây mà không có gì"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class InProcessHub:
+    """Hub pub/sub trong tiến trình: publish được gọi từ thread đồng bộ bất kỳ"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = {}
+
+    def subscribe(self, branch_id):
+        subscription = Subscription(branch_id)
+        with self._lock:
+            self._subscriptions.setdefault(branch_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription.branch_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[subscription.branch_id]
+
+    def publish(self, branch_id, event):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(branch_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # Event loop của kết nối đã đóng
+                self.unsubscribe(subscription)
+
+    def subscriber_count(self, branch_id=None):
+        with self._lock:
+            if branch_id is not None:
+                return len(self._subscriptions.get(branch_id, ()))
+            return sum(len(subscribers) for subscribers in self._subscriptions.values())
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    """Hub dùng chung của tiến trình, theo setting APPOINTMENT_LIVE_HUB"""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                hub_path = getattr(settings, 'APPOINTMENT_LIVE_HUB', 'appointments.live.InProcessHub')
+                _hub = import_string(hub_path)()
+    return _hub
+
+
+def publish_appointment_event(event_type, branch_id, payload):
+    """Phát sự kiện lịch hẹn tới các màn hình của chi nhánh; lỗi hub không làm hỏng thao tác ghi"""
+    try:
+        get_hub().publish(branch_id, {'type': event_type, 'appointment': payload})
+    except Exception:
+        logger.exception('Không phát được sự kiện lịch hẹn %s', event_type)
+
+
+def format_sse(event):
+    """Một sự kiện theo định dạng text/event-stream"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
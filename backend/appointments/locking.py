@@ -0,0 +1,71 @@
+"""Khoá đặt lịch theo (bác sĩ, ngày).
+
+Kiểm tra trùng lịch rồi mới ghi là thao tác đọc-rồi-ghi: hai lễ tân đặt cùng
+bác sĩ vào hai giờ chồng lên nhau có thể cùng vượt qua bước kiểm tra. Mọi
+thao tác ghi lịch hẹn vì vậy chạy trong `booking_lock`, giữ khoá của các cặp
+(bác sĩ, ngày) liên quan tới hết transaction rồi mới kiểm tra lại và ghi.
+
+- PostgreSQL: `pg_advisory_xact_lock(doctor_id, date.toordinal())`, tự nhả
+  khi transaction kết thúc.
+- CSDL khác: khoá dòng bác sĩ bằng SELECT ... FOR UPDATE (nếu hỗ trợ) cộng
+  một khoá trong tiến trình, đủ cho SQLite khi chạy dev server nhiều thread.
+"""
+import threading
+from contextlib import contextmanager
+from weakref import WeakValueDictionary
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+User = get_user_model()
+
+
+class _KeyLock:
+    """threading.Lock có thể tham chiếu yếu, để registry tự dọn các khoá không dùng"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+_process_locks = WeakValueDictionary()
+_registry_lock = threading.Lock()
+
+
+def _process_lock(key):
+    with _registry_lock:
+        key_lock = _process_locks.get(key)
+        if key_lock is None:
+            key_lock = _process_locks[key] = _KeyLock()
+        return key_lock
+
+
+def _lock_in_database(keys):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for doctor_id, day in keys:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [doctor_id, day.toordinal()])
+    elif connection.features.has_select_for_update:
+        doctor_ids = sorted({doctor_id for doctor_id, _ in keys})
+        list(User.objects.select_for_update().filter(pk__in=doctor_ids).order_by('pk').values_list('pk', flat=True))
+
+
+@contextmanager
+def booking_lock(*keys):
+    """Mở transaction và giữ khoá của các cặp (doctor_id, date) cho tới khi kết thúc.
+
+    Các khoá luôn được lấy theo thứ tự tăng dần để hai thao tác cùng khoá
+    nhiều cặp (ví dụ đổi lịch sang ngày khác) không gây deadlock.
+    """
+    keys = sorted({(int(doctor_id), day) for doctor_id, day in keys if doctor_id and day})
+    local_locks = [] if connection.vendor == 'postgresql' else [_process_lock(key) for key in keys]
+    acquired = []
+    try:
+        for key_lock in local_locks:
+            key_lock.lock.acquire()
+            acquired.append(key_lock)
+        with transaction.atomic():
+            _lock_in_database(keys)
+            yield
+    finally:
+        for key_lock in reversed(acquired):
+            key_lock.lock.release()
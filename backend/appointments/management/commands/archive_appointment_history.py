@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Min
+from django.utils import timezone
+
+from appointments.audit import archive_history_month, month_start, next_month
+from appointments.models import AppointmentHistory
+
+
+class Command(BaseCommand):
+    help = 'Chuyển lịch sử lịch hẹn cũ hơn số tháng chỉ định sang bảng lưu trữ, từng tháng một'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-months', type=int, default=12,
+                            help='Số tháng gần nhất (kể cả tháng hiện tại) giữ lại trong bảng chính (mặc định 12)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Số dòng chuyển mỗi transaction (mặc định 1000)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Chỉ đếm số dòng của từng tháng sẽ được chuyển',
+        )
+
+    def handle(self, *args, **options):
+        keep_months = max(1, options['keep_months'])
+        cutoff = month_start(timezone.now())
+        for _ in range(keep_months - 1):
+            cutoff = month_start(cutoff - timedelta(days=1))
+
+        oldest = AppointmentHistory.objects.filter(created_at__lt=cutoff).aggregate(oldest=Min('created_at'))['oldest']
+        if oldest is None:
+            self.stdout.write(self.style.SUCCESS(f'Không có lịch sử nào trước {cutoff:%m/%Y} cần lưu trữ'))
+            return
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - Không có thay đổi nào được thực hiện'))
+
+        total = 0
+        start = month_start(oldest)
+        while start < cutoff:
+            if options['dry_run']:
+                moved = AppointmentHistory.objects.filter(created_at__gte=start, created_at__lt=next_month(start)).count()
+            else:
+                moved = archive_history_month(start, batch_size=max(1, options['batch_size']))
+            if moved:
+                self.stdout.write(f'  {start:%m/%Y}: {moved} dòng')
+            total += moved
+            start = next_month(start)
+        verb = 'Sẽ lưu trữ' if options['dry_run'] else 'Đã lưu trữ'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {total} dòng lịch sử trước {cutoff:%m/%Y}'))
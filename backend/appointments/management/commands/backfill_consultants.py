@@ -0,0 +1,64 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from appointments.models import Appointment, parse_consultant_id
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Điền khoá ngoại consultant cho lịch hẹn cũ từ tiền tố CONSULTANT_ID:<id> trong ghi chú'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Số lịch hẹn xử lý mỗi lượt (mặc định 1000)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Chỉ đếm số lịch hẹn sẽ được cập nhật mà không ghi',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - Không có thay đổi nào được thực hiện'))
+
+        candidates = (
+            Appointment.objects.filter(consultant__isnull=True, notes__contains='CONSULTANT_ID:')
+            .order_by('pk')
+        )
+        last_pk = 0
+        updated = 0
+        missing = 0
+        while True:
+            # Phân trang theo pk để mỗi lượt chỉ đọc id + ghi chú của batch_size dòng
+            rows = list(candidates.filter(pk__gt=last_pk).values_list('pk', 'notes')[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+
+            by_consultant = defaultdict(list)
+            for pk, notes in rows:
+                consultant_id = parse_consultant_id(notes)
+                if consultant_id:
+                    by_consultant[consultant_id].append(pk)
+            existing = set(User.objects.filter(pk__in=list(by_consultant)).values_list('pk', flat=True))
+
+            with transaction.atomic():
+                for consultant_id, appointment_ids in by_consultant.items():
+                    if consultant_id not in existing:
+                        missing += len(appointment_ids)
+                        continue
+                    if not dry_run:
+                        # update() không chạm updated_at: nội dung hiển thị không đổi nên client không cần đồng bộ lại
+                        Appointment.objects.filter(pk__in=appointment_ids).update(consultant_id=consultant_id)
+                    updated += len(appointment_ids)
+            self.stdout.write(f'  Đã xử lý tới lịch hẹn #{last_pk}')
+
+        self.stdout.write(self.style.SUCCESS(f'Đã gán tư vấn viên cho {updated} lịch hẹn'))
+        if missing:
+            self.stdout.write(self.style.WARNING(f'Bỏ qua {missing} lịch hẹn có tư vấn viên không còn tồn tại'))
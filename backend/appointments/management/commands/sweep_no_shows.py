@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from appointments.transitions import OPEN_STATUSES, apply_status_transition, overdue_open_appointments
+
+
+class Command(BaseCommand):
+    help = ('Chuyển các lịch hẹn đã quá giờ mà vẫn chờ/đã xác nhận sang "Khách không đến". '
+            'Chạy định kỳ (cron) sau giờ đóng cửa hoặc vài lần trong ngày')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-minutes', type=int, default=60,
+                            help='Số phút sau giờ kết thúc mới coi là không đến (mặc định 60)')
+        parser.add_argument('--days-back', type=int, default=7,
+                            help='Chỉ quét lịch hẹn trong số ngày gần nhất (mặc định 7)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Số lịch hẹn đổi trạng thái mỗi transaction (mặc định 500)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Chỉ đếm số lịch hẹn sẽ bị đổi mà không ghi',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.localtime() - timedelta(minutes=options['grace_minutes'])
+        since = cutoff.date() - timedelta(days=options['days_back'])
+        ids = list(overdue_open_appointments(cutoff, since))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - Không có thay đổi nào được thực hiện'))
+            self.stdout.write(f'{len(ids)} lịch hẹn quá giờ trước {cutoff:%d/%m/%Y %H:%M} sẽ chuyển sang no_show')
+            return
+
+        batch_size = max(1, options['batch_size'])
+        swept = 0
+        for offset in range(0, len(ids), batch_size):
+            # Lịch vừa được lễ tân cập nhật trong lúc quét sẽ bị bỏ qua nhờ from_statuses
+            swept += len(apply_status_transition(
+                ids[offset:offset + batch_size], 'no_show',
+                notes='Tự động: quá giờ hẹn', from_statuses=OPEN_STATUSES,
+            ))
+        self.stdout.write(self.style.SUCCESS(f'Đã chuyển {swept} lịch hẹn sang "Khách không đến"'))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0014_appointment_waitlist_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('appointment_id', models.BigIntegerField(verbose_name='Lịch hẹn')),
+                ('doctor_id', models.BigIntegerField(null=True, verbose_name='Bác sĩ')),
+                ('branch_id', models.BigIntegerField(null=True, verbose_name='Chi nhánh')),
+                ('appointment_date', models.DateField(verbose_name='Ngày hẹn')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Xoá lúc')),
+            ],
+            options={
+                'verbose_name': 'Lịch hẹn đã xoá',
+                'verbose_name_plural': 'Lịch hẹn đã xoá',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['updated_at'], name='appt_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmenttombstone',
+            index=models.Index(fields=['deleted_at'], name='appt_tombstone_deleted_idx'),
+        ),
+    ]
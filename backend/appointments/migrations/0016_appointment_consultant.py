@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appointments', '0015_appointment_sync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='consultant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consulted_appointments', to=settings.AUTH_USER_MODEL, verbose_name='Tư vấn viên'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0016_appointment_consultant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentHistoryArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name='Id gốc')),
+                ('appointment_id', models.BigIntegerField(verbose_name='Lịch hẹn')),
+                ('changed_by_id', models.BigIntegerField(blank=True, null=True, verbose_name='Thay đổi bởi')),
+                ('change_type', models.CharField(max_length=50, verbose_name='Loại thay đổi')),
+                ('old_value', models.TextField(blank=True, null=True, verbose_name='Giá trị cũ')),
+                ('new_value', models.TextField(blank=True, null=True, verbose_name='Giá trị mới')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Ghi chú')),
+                ('created_at', models.DateTimeField()),
+                ('month', models.DateField(verbose_name='Tháng')),
+            ],
+            options={
+                'verbose_name': 'Lịch sử lịch hẹn (lưu trữ)',
+                'verbose_name_plural': 'Lịch sử lịch hẹn (lưu trữ)',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='appointmenthistory',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='appointmenthistory',
+            index=models.Index(fields=['appointment', '-created_at'], name='appt_history_appt_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmenthistory',
+            index=models.Index(fields=['created_at'], name='appt_history_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmenthistoryarchive',
+            index=models.Index(fields=['appointment_id', '-created_at'], name='appt_hist_arch_appt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmenthistoryarchive',
+            index=models.Index(fields=['month'], name='appt_hist_arch_month_idx'),
+        ),
+    ]
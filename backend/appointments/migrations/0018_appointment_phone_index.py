@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0017_history_indexes_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='customer_phone_e164',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='customer_phone_reversed',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=15),
+        ),
+    ]
@@ -1,9 +1,24 @@
+import re
+
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from customers.models import Customer, Branch, Service
+from customers.phones import phone_index_values
 
 User = get_user_model()
 
+# Định dạng cũ: tư vấn viên ghi ở dòng đầu của ghi chú, "CONSULTANT_ID:<id>"
+CONSULTANT_NOTE_PATTERN = re.compile(r'^CONSULTANT_ID:(\d+)')
+
+
+def parse_consultant_id(notes):
+    """Id tư vấn viên trong tiền tố CONSULTANT_ID:<id> của ghi chú, None nếu không có"""
+    if not notes:
+        return None
+    match = CONSULTANT_NOTE_PATTERN.match(notes.strip())
+    return int(match.group(1)) if match else None
+
 
 class Appointment(models.Model):
     """Lịch hẹn"""
@@ -27,6 +42,9 @@ class Appointment(models.Model):
     # Thông tin khách hàng tạm thời (chỉ để hẹn lịch, không liên kết với hệ thống khách hàng)
     customer_name = models.CharField(max_length=200, verbose_name="Tên khách hàng", default="Khách hàng chưa xác định")
     customer_phone = models.CharField(max_length=20, verbose_name="Số điện thoại khách hàng", default="")
+    # SĐT dạng E.164 và chữ số viết ngược, dùng tra cứu theo đuôi số (customers/phones.py)
+    customer_phone_e164 = models.CharField(max_length=16, blank=True, default='', editable=False, db_index=True)
+    customer_phone_reversed = models.CharField(max_length=15, blank=True, default='', editable=False, db_index=True)
     doctor = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -55,6 +73,14 @@ class Appointment(models.Model):
     is_waitlist = models.BooleanField(default=False, verbose_name="Danh sách chờ")
     waitlist_position = models.PositiveIntegerField(null=True, blank=True, verbose_name="Vị trí trong danh sách chờ")
     notes = models.TextField(blank=True, null=True, verbose_name="Ghi chú")
+    consultant = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='consulted_appointments',
+        verbose_name="Tư vấn viên",
+    )
 
     # Thông tin hệ thống
     created_by = models.ForeignKey(
@@ -72,6 +98,9 @@ class Appointment(models.Model):
         verbose_name_plural = "Lịch hẹn"
         ordering = ['-appointment_date', '-appointment_time']
         unique_together = ['doctor', 'appointment_date', 'appointment_time']
+        indexes = [
+            models.Index(fields=['updated_at'], name='appt_updated_at_idx'),
+        ]
 
     def __str__(self):
         return f"{self.customer_name} - {self.appointment_date} {self.appointment_time}"
@@ -101,6 +130,7 @@ class Appointment(models.Model):
             start_datetime = datetime.combine(self.appointment_date, self.appointment_time)
             end_datetime = start_datetime + timedelta(minutes=self.duration_minutes)
             self.end_time = end_datetime.time()
+        self.customer_phone_e164, self.customer_phone_reversed = phone_index_values(self.customer_phone)
         super().save(*args, **kwargs)
     
     @property
@@ -118,6 +148,25 @@ class Appointment(models.Model):
         return None
 
 
+class AppointmentTombstone(models.Model):
+    """Lịch hẹn đã xoá, để calendar đồng bộ theo updated_since gỡ khỏi client"""
+    appointment_id = models.BigIntegerField(verbose_name="Lịch hẹn")
+    doctor_id = models.BigIntegerField(null=True, verbose_name="Bác sĩ")
+    branch_id = models.BigIntegerField(null=True, verbose_name="Chi nhánh")
+    appointment_date = models.DateField(verbose_name="Ngày hẹn")
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name="Xoá lúc")
+
+    class Meta:
+        verbose_name = "Lịch hẹn đã xoá"
+        verbose_name_plural = "Lịch hẹn đã xoá"
+        indexes = [
+            models.Index(fields=['deleted_at'], name='appt_tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.appointment_id} - {self.deleted_at}"
+
+
 class AppointmentHistory(models.Model):
     """Lịch sử thay đổi lịch hẹn"""
     appointment = models.ForeignKey(
@@ -131,13 +180,43 @@ class AppointmentHistory(models.Model):
     old_value = models.TextField(blank=True, null=True, verbose_name="Giá trị cũ")
     new_value = models.TextField(blank=True, null=True, verbose_name="Giá trị mới")
     notes = models.TextField(blank=True, null=True, verbose_name="Ghi chú")
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Thời điểm thay đổi, không phải lúc bộ ghi theo lô (appointments.audit) insert
+    created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         verbose_name = "Lịch sử lịch hẹn"
         verbose_name_plural = "Lịch sử lịch hẹn"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['appointment', '-created_at'], name='appt_history_appt_created_idx'),
+            models.Index(fields=['created_at'], name='appt_history_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.appointment} - {self.change_type}"
 
+
+class AppointmentHistoryArchive(models.Model):
+    """Lịch sử lịch hẹn cũ, chuyển khỏi bảng AppointmentHistory theo từng tháng"""
+    original_id = models.BigIntegerField(unique=True, verbose_name="Id gốc")
+    appointment_id = models.BigIntegerField(verbose_name="Lịch hẹn")
+    changed_by_id = models.BigIntegerField(null=True, blank=True, verbose_name="Thay đổi bởi")
+    change_type = models.CharField(max_length=50, verbose_name="Loại thay đổi")
+    old_value = models.TextField(blank=True, null=True, verbose_name="Giá trị cũ")
+    new_value = models.TextField(blank=True, null=True, verbose_name="Giá trị mới")
+    notes = models.TextField(blank=True, null=True, verbose_name="Ghi chú")
+    created_at = models.DateTimeField()
+    month = models.DateField(verbose_name="Tháng")
+
+    class Meta:
+        verbose_name = "Lịch sử lịch hẹn (lưu trữ)"
+        verbose_name_plural = "Lịch sử lịch hẹn (lưu trữ)"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['appointment_id', '-created_at'], name='appt_hist_arch_appt_idx'),
+            models.Index(fields=['month'], name='appt_hist_arch_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.appointment_id} - {self.change_type} ({self.month:%m/%Y})"
+
@@ -1,14 +1,49 @@
 from rest_framework import serializers
-from .models import Appointment, AppointmentHistory
+from .models import Appointment, AppointmentHistory, AppointmentHistoryArchive, parse_consultant_id
+from .availability import (STATUS_LABELS, batch_overlaps, business_hours, check_slots, format_minutes,
+                           load_day_index, slot_conflicts, to_minutes)
+from .locking import booking_lock
+from .signals import announce_bulk_change
 from customers.serializers import CustomerSerializer, ServiceSerializer, BranchSerializer
 from users.serializers import DoctorSerializer
+from django.utils import timezone
 from django.utils.dateformat import format
-from customers.models import Service  # Import from customers.models
+from customers.models import Branch, Service  # Import from customers.models
+from customers.phones import phone_index_values
 from django.contrib.auth import get_user_model
+from datetime import datetime, timedelta
 
 User = get_user_model()
 
 
+def overlap_error_message(conflicts):
+    """Validation message listing the appointments a new booking overlaps"""
+    error_message = "Bác sĩ đã có lịch hẹn trùng thời gian:\n"
+    for booking in conflicts:
+        status_label = STATUS_LABELS.get(booking.status, booking.status)
+        error_message += f"- {format_minutes(booking.start)} ({booking.end - booking.start} phút) - {booking.customer_name} ({status_label})\n"
+    error_message += "Vui lòng chọn thời gian khác."
+    return error_message
+
+
+def schedule_error(appointment_date, appointment_time):
+    """Lỗi khi giờ hẹn ở quá khứ hoặc ngoài giờ làm việc; None nếu hợp lệ"""
+    now = timezone.localtime().replace(second=0, microsecond=0)
+    if appointment_date < now.date():
+        return "Không thể đặt lịch hẹn trong quá khứ. Vui lòng chọn ngày hôm nay hoặc trong tương lai."
+    appointment_datetime = timezone.make_aware(datetime.combine(appointment_date, appointment_time))
+    if appointment_date == now.date() and appointment_datetime < now:
+        return "Không thể đặt lịch hẹn trong quá khứ. Vui lòng chọn thời gian trong tương lai."
+
+    # Giờ làm việc dùng chung với tìm lịch trống (availability.business_hours)
+    opening, closing = business_hours(appointment_date)
+    if not opening <= appointment_time.hour * 60 < closing:
+        if appointment_date.weekday() == 6:
+            return "Chủ nhật chỉ có thể đặt lịch từ 8:00 đến 12:00"
+        return "Thứ 2 đến thứ 7 chỉ có thể đặt lịch từ 8:00 đến 20:00"
+    return None
+
+
 class AppointmentSerializer(serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
     services = serializers.PrimaryKeyRelatedField(many=True, queryset=Service.objects.all())
@@ -26,8 +61,8 @@ class AppointmentSerializer(serializers.ModelSerializer):
     updated_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M', read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     # Consultant handling: accept optional consultant id on write, expose id+name on read
-    consultant = serializers.SerializerMethodField(read_only=True)
-    consultant_name = serializers.SerializerMethodField(read_only=True)
+    consultant = serializers.IntegerField(source='consultant_id', read_only=True)
+    consultant_name = serializers.CharField(source='consultant.get_full_name', read_only=True, default=None)
     consultant_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     
     class Meta:
@@ -60,8 +95,7 @@ class AppointmentSerializer(serializers.ModelSerializer):
                     consultant_int = int(consultant_val)
                     # Ensure notes start with CONSULTANT_ID:<id>\n (but avoid duplicating if already present)
                     existing_notes = data.get('notes') or ''
-                    import re
-                    if not re.match(r'^CONSULTANT_ID:\d+', str(existing_notes or '')):
+                    if parse_consultant_id(str(existing_notes)) is None:
                         prefix = f"CONSULTANT_ID:{consultant_int}"
                         data['notes'] = f"{prefix}\n{existing_notes}".strip()
                 except (ValueError, TypeError):
@@ -76,7 +110,18 @@ class AppointmentSerializer(serializers.ModelSerializer):
             raise e
         return validated_data
 
+    def validate_consultant_id(self, value):
+        if value is not None and not User.objects.filter(pk=value).exists():
+            raise serializers.ValidationError('Tư vấn viên không tồn tại')
+        return value
+
     def validate(self, data):
+        # Ghi chú kiểu cũ chỉ có tiền tố CONSULTANT_ID:<id>: giữ khoá ngoại consultant khớp với ghi chú
+        if 'consultant_id' not in data and data.get('notes'):
+            consultant_id = parse_consultant_id(data['notes'])
+            if consultant_id and User.objects.filter(pk=consultant_id).exists():
+                data['consultant_id'] = consultant_id
+
         doctor = data.get('doctor')
         appointment_date = data.get('appointment_date')
         appointment_time = data.get('appointment_time')
@@ -99,159 +144,85 @@ class AppointmentSerializer(serializers.ModelSerializer):
             data['duration_minutes'] = calculated_duration
 
         if doctor and appointment_date and appointment_time:
-            from datetime import datetime, timedelta
+            from datetime import datetime
             
-            # Convert to datetime for easier calculation
-            appointment_datetime = datetime.combine(appointment_date, appointment_time)
-            appointment_end_datetime = appointment_datetime + timedelta(minutes=duration_minutes)
-            
-            # Check for existing appointments for the same doctor on the same date
-            queryset = Appointment.objects.filter(
-                doctor=doctor,
-                appointment_date=appointment_date
-            )
-
-            # If updating an existing appointment, exclude itself from the check
-            if self.instance:
-                queryset = queryset.exclude(pk=self.instance.pk)
+            # Check against the doctor's interval index for that day
+            index = load_day_index(doctor.pk, appointment_date)
+            exclude_id = self.instance.pk if self.instance else None
+            start = to_minutes(appointment_time)
 
             # Check for exact time conflicts (unique_together constraint)
-            exact_time_conflicts = queryset.filter(appointment_time=appointment_time)
-            if exact_time_conflicts.exists():
-                conflict = exact_time_conflicts.first()
+            exact_time_conflicts = index.starting_at(start, exclude_id=exclude_id)
+            if exact_time_conflicts:
+                conflict = exact_time_conflicts[0]
                 raise serializers.ValidationError(
                     f"Bác sĩ đã có lịch hẹn vào cùng thời điểm ({appointment_time}) với khách hàng '{conflict.customer_name}'. "
                     f"Vui lòng chọn thời gian khác hoặc thay đổi bác sĩ."
                 )
 
             # Check for time overlap conflicts
-            conflicting_appointments = []
-            for existing_appointment in queryset:
-                existing_datetime = datetime.combine(
-                    existing_appointment.appointment_date, 
-                    existing_appointment.appointment_time
-                )
-                existing_end_datetime = existing_datetime + timedelta(
-                    minutes=existing_appointment.duration_minutes
-                )
-                
-                # Check if there's any overlap
-                if (appointment_datetime < existing_end_datetime and 
-                    appointment_end_datetime > existing_datetime):
-                    conflicting_appointments.append({
-                        'time': existing_appointment.appointment_time.strftime('%H:%M'),
-                        'duration': existing_appointment.duration_minutes,
-                        'customer': existing_appointment.customer_name,
-                        'status': existing_appointment.get_status_display()
-                    })
-
-            if conflicting_appointments:
-                error_message = "Bác sĩ đã có lịch hẹn trùng thời gian:\n"
-                for conflict in conflicting_appointments:
-                    error_message += f"- {conflict['time']} ({conflict['duration']} phút) - {conflict['customer']} ({conflict['status']})\n"
-                error_message += "Vui lòng chọn thời gian khác."
-                raise serializers.ValidationError(error_message.strip())
-
-        # Check if appointment is in the past
-        if appointment_date and appointment_time:
-            from django.utils import timezone
-            appointment_datetime = datetime.combine(appointment_date, appointment_time)
-            
-            # Make appointment_datetime timezone-aware for comparison
-            if appointment_datetime.tzinfo is None:
-                appointment_datetime = timezone.make_aware(appointment_datetime)
-            
-            now = timezone.now().replace(second=0, microsecond=0)
-            
-            # Ensure both datetimes are in the same timezone for comparison
-            if appointment_datetime.tzinfo != now.tzinfo:
-                appointment_datetime = appointment_datetime.astimezone(now.tzinfo)
-            
-            today = now.date()
-            
-            # Allow appointments for today and future dates
-            if appointment_date < today:
-                raise serializers.ValidationError(
-                    "Không thể đặt lịch hẹn trong quá khứ. Vui lòng chọn ngày hôm nay hoặc trong tương lai."
-                )
-            
-            # For today's appointments, check if time is in the past
-            if appointment_date == today and appointment_datetime < now:
-                raise serializers.ValidationError(
-                    "Không thể đặt lịch hẹn trong quá khứ. Vui lòng chọn thời gian trong tương lai."
-                )
+            conflicts = index.conflicts(start, start + duration_minutes, exclude_id=exclude_id)
+            if conflicts:
+                raise serializers.ValidationError(overlap_error_message(conflicts))
 
-        # Check business hours
+        # Past dates/times and business hours (shared with bulk booking)
         if appointment_date and appointment_time:
-            appointment_hour = appointment_time.hour
-            day_of_week = appointment_date.weekday()  # 0 = Monday, 6 = Sunday
-            
-            # Sunday (weekday 6)
-            if day_of_week == 6:
-                if not (8 <= appointment_hour < 12):
-                    raise serializers.ValidationError(
-                        "Chủ nhật chỉ có thể đặt lịch từ 8:00 đến 12:00"
-                    )
-            # Monday to Saturday (weekday 0-5)
-            else:
-                if not (8 <= appointment_hour < 20):
-                    raise serializers.ValidationError(
-                        "Thứ 2 đến thứ 7 chỉ có thể đặt lịch từ 8:00 đến 20:00"
-                    )
+            error = schedule_error(appointment_date, appointment_time)
+            if error:
+                raise serializers.ValidationError(error)
 
         return data
 
+    def _ensure_slot_free(self, doctor, appointment_date, appointment_time, duration_minutes, exclude_id=None):
+        """Re-check the slot while holding the (doctor, date) booking lock"""
+        conflicts = slot_conflicts(doctor.pk, appointment_date, appointment_time, duration_minutes,
+                                   exclude_id=exclude_id)
+        if conflicts:
+            raise serializers.ValidationError(overlap_error_message(conflicts))
+
     def create(self, validated_data):
         services_data = validated_data.pop('services', [])
         validated_data['created_by'] = self.context['request'].user
-        appointment = Appointment.objects.create(**validated_data)
-        if services_data:
-            try:
-                # Make sure we're passing IDs to set()
-                service_ids = [service.id for service in services_data]
-                appointment.services.set(service_ids)
-            except Service.DoesNotExist as e:
-                raise serializers.ValidationError({'services': f'One or more services are invalid: {e}'})
+        doctor = validated_data['doctor']
+        appointment_date = validated_data['appointment_date']
+        with booking_lock((doctor.pk, appointment_date)):
+            self._ensure_slot_free(doctor, appointment_date, validated_data['appointment_time'],
+                                   validated_data['duration_minutes'])
+            appointment = Appointment.objects.create(**validated_data)
+            if services_data:
+                try:
+                    # Make sure we're passing IDs to set()
+                    service_ids = [service.id for service in services_data]
+                    appointment.services.set(service_ids)
+                except Service.DoesNotExist as e:
+                    raise serializers.ValidationError({'services': f'One or more services are invalid: {e}'})
         return appointment
 
     def update(self, instance, validated_data):
         services_data = validated_data.pop('services', None)
         
-        instance = super().update(instance, validated_data)
+        doctor = validated_data.get('doctor', instance.doctor)
+        appointment_date = validated_data.get('appointment_date', instance.appointment_date)
+        appointment_time = validated_data.get('appointment_time', instance.appointment_time)
+        duration_minutes = validated_data.get('duration_minutes', instance.duration_minutes)
+        rescheduled = (doctor.pk, appointment_date, appointment_time, duration_minutes) != (
+            instance.doctor_id, instance.appointment_date, instance.appointment_time, instance.duration_minutes
+        )
         
-        if services_data is not None:
-            instance.services.set(services_data)
+        with booking_lock((instance.doctor_id, instance.appointment_date), (doctor.pk, appointment_date)):
+            if rescheduled:
+                self._ensure_slot_free(doctor, appointment_date, appointment_time, duration_minutes,
+                                       exclude_id=instance.pk)
+            instance = super().update(instance, validated_data)
+            
+            if services_data is not None:
+                instance.services.set(services_data)
         
         return instance
 
     def get_service_names(self, obj):
         return ", ".join([service.name for service in obj.services.all()])
 
-    def _parse_consultant_id(self, notes: str | None):
-        if not notes:
-            return None
-        import re
-        m = re.match(r'^CONSULTANT_ID:(\d+)', notes.strip())
-        if m:
-            try:
-                return int(m.group(1))
-            except (TypeError, ValueError):
-                return None
-        return None
-
-    def get_consultant(self, obj):
-        return self._parse_consultant_id(getattr(obj, 'notes', None))
-
-    def get_consultant_name(self, obj):
-        consultant_id = self._parse_consultant_id(getattr(obj, 'notes', None))
-        if not consultant_id:
-            return None
-        try:
-            user = User.objects.get(id=consultant_id)
-            return user.get_full_name()
-        except User.DoesNotExist:
-            return None
-
 
 class AppointmentListSerializer(serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
@@ -268,8 +239,8 @@ class AppointmentListSerializer(serializers.ModelSerializer):
     end_time = serializers.TimeField(format='%H:%M', read_only=True)
     calculated_end_time = serializers.TimeField(format='%H:%M', read_only=True)
     created_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M', read_only=True)
-    consultant = serializers.SerializerMethodField(read_only=True)
-    consultant_name = serializers.SerializerMethodField(read_only=True)
+    consultant = serializers.IntegerField(source='consultant_id', read_only=True)
+    consultant_name = serializers.CharField(source='consultant.get_full_name', read_only=True, default=None)
     
     class Meta:
         model = Appointment
@@ -280,31 +251,6 @@ class AppointmentListSerializer(serializers.ModelSerializer):
     def get_service_names(self, obj):
         return ", ".join([service.name for service in obj.services.all()])
 
-    def _parse_consultant_id(self, notes: str | None):
-        if not notes:
-            return None
-        import re
-        m = re.match(r'^CONSULTANT_ID:(\d+)', notes.strip())
-        if m:
-            try:
-                return int(m.group(1))
-            except (TypeError, ValueError):
-                return None
-        return None
-
-    def get_consultant(self, obj):
-        return self._parse_consultant_id(getattr(obj, 'notes', None))
-
-    def get_consultant_name(self, obj):
-        consultant_id = self._parse_consultant_id(getattr(obj, 'notes', None))
-        if not consultant_id:
-            return None
-        try:
-            user = User.objects.get(id=consultant_id)
-            return user.get_full_name()
-        except User.DoesNotExist:
-            return None
-
 
 class AppointmentHistorySerializer(serializers.ModelSerializer):
     changed_by_name = serializers.CharField(source='changed_by.get_full_name', read_only=True)
@@ -317,6 +263,32 @@ class AppointmentHistorySerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at']
 
 
+class AppointmentHistoryArchiveSerializer(serializers.ModelSerializer):
+    """Dòng lịch sử đã lưu trữ, cùng dạng với AppointmentHistorySerializer"""
+    id = serializers.IntegerField(source='original_id', read_only=True)
+    appointment = serializers.IntegerField(source='appointment_id', read_only=True)
+    changed_by = serializers.IntegerField(source='changed_by_id', read_only=True)
+    changed_by_name = serializers.SerializerMethodField()
+    created_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M', read_only=True)
+    archived = serializers.BooleanField(default=True, read_only=True)
+
+    class Meta:
+        model = AppointmentHistoryArchive
+        fields = ['id', 'appointment', 'changed_by', 'changed_by_name', 'change_type',
+                 'old_value', 'new_value', 'notes', 'created_at', 'archived']
+
+    def get_changed_by_name(self, obj):
+        return self.context.get('user_names', {}).get(obj.changed_by_id)
+
+
+def archived_history_data(appointment_id):
+    """Lịch sử đã lưu trữ của một lịch hẹn, tên người sửa lấy bằng một truy vấn"""
+    rows = list(AppointmentHistoryArchive.objects.filter(appointment_id=appointment_id))
+    user_ids = {row.changed_by_id for row in rows if row.changed_by_id}
+    user_names = {user.pk: user.get_full_name() for user in User.objects.filter(pk__in=user_ids)} if user_ids else {}
+    return AppointmentHistoryArchiveSerializer(rows, many=True, context={'user_names': user_names}).data
+
+
 class AppointmentCalendarSerializer(serializers.ModelSerializer):
     doctor_name = serializers.CharField(source='doctor.get_full_name', read_only=True)
     service_names = serializers.SerializerMethodField()
@@ -326,8 +298,8 @@ class AppointmentCalendarSerializer(serializers.ModelSerializer):
     doctor = serializers.IntegerField(source='doctor.id', read_only=True)
     branch = serializers.IntegerField(source='branch.id', read_only=True)
     appointment_date = serializers.DateField(format='%d/%m/%Y', input_formats=['%d/%m/%Y', '%Y-%m-%d'])
-    consultant = serializers.SerializerMethodField(read_only=True)
-    consultant_name = serializers.SerializerMethodField(read_only=True)
+    consultant = serializers.IntegerField(source='consultant_id', read_only=True)
+    consultant_name = serializers.CharField(source='consultant.get_full_name', read_only=True, default=None)
     
     class Meta:
         model = Appointment
@@ -335,32 +307,151 @@ class AppointmentCalendarSerializer(serializers.ModelSerializer):
                  'appointment_date', 'appointment_time', 'status', 'notes', 'consultant', 'consultant_name']
     
     def get_title(self, obj):
-        return f"{obj.customer_name} - {obj.service_names}"
+        return f"{obj.customer_name} - {self.get_service_names(obj)}"
 
     def get_service_names(self, obj):
         return ", ".join([service.name for service in obj.services.all()])
 
-    def _parse_consultant_id(self, notes: str | None):
-        if not notes:
-            return None
-        import re
-        m = re.match(r'^CONSULTANT_ID:(\d+)', notes.strip())
-        if m:
-            try:
-                return int(m.group(1))
-            except (TypeError, ValueError):
-                return None
-        return None
-
-    def get_consultant(self, obj):
-        return self._parse_consultant_id(getattr(obj, 'notes', None))
-
-    def get_consultant_name(self, obj):
-        consultant_id = self._parse_consultant_id(getattr(obj, 'notes', None))
-        if not consultant_id:
-            return None
-        try:
-            user = User.objects.get(id=consultant_id)
-            return user.get_full_name()
-        except User.DoesNotExist:
-            return None
+
+BULK_MAX_APPOINTMENTS = 50
+
+
+class AppointmentBulkItemSerializer(serializers.Serializer):
+    """Một lịch hẹn trong lô; khoá ngoại được kiểm tra chung cho cả lô"""
+    customer_name = serializers.CharField(max_length=200)
+    customer_phone = serializers.CharField(max_length=20, required=False, allow_blank=True, default='')
+    doctor = serializers.IntegerField()
+    branch = serializers.IntegerField()
+    services = serializers.ListField(child=serializers.IntegerField(), required=False, default=list)
+    appointment_date = serializers.DateField(input_formats=['%d/%m/%Y', '%Y-%m-%d'])
+    appointment_time = serializers.TimeField(input_formats=['%H:%M'])
+    services_with_quantity = serializers.JSONField(required=False, default=list)
+    end_time = serializers.TimeField(input_formats=['%H:%M'], required=False, allow_null=True, default=None)
+    duration_minutes = serializers.IntegerField(min_value=1, default=30)
+    appointment_type = serializers.ChoiceField(choices=Appointment.APPOINTMENT_TYPE_CHOICES, default='consultation')
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True, default='')
+    consultant_id = serializers.IntegerField(required=False, allow_null=True, default=None)
+
+    def validate(self, data):
+        # Giống AppointmentSerializer: có giờ kết thúc thì thời lượng tính theo giờ kết thúc
+        if data.get('end_time'):
+            start = to_minutes(data['appointment_time'])
+            end = to_minutes(data['end_time'])
+            if end <= start:
+                raise serializers.ValidationError("Giờ kết thúc phải sau giờ bắt đầu")
+            data['duration_minutes'] = end - start
+        return data
+
+
+class AppointmentRecurrenceSerializer(serializers.Serializer):
+    every_weeks = serializers.IntegerField(min_value=1, max_value=52)
+    occurrences = serializers.IntegerField(min_value=1, max_value=BULK_MAX_APPOINTMENTS)
+
+
+class AppointmentBulkSerializer(serializers.Serializer):
+    """Đặt nhiều lịch hẹn (hoặc chuỗi lặp lại mỗi N tuần) trong một transaction.
+
+    Cả lô được kiểm tra với một lần nạp chỉ mục lịch hẹn, ghi bằng bulk_create
+    và chèn dịch vụ hàng loạt; chỉ cần một lịch không hợp lệ là không lịch nào
+    được tạo, lỗi trả về theo từng vị trí.
+    """
+    appointments = AppointmentBulkItemSerializer(many=True, allow_empty=False)
+    recurrence = AppointmentRecurrenceSerializer(required=False)
+
+    def validate(self, data):
+        recurrence = data.get('recurrence')
+        items = []
+        for item in data['appointments']:
+            occurrences = recurrence['occurrences'] if recurrence else 1
+            for occurrence in range(occurrences):
+                shift = timedelta(weeks=recurrence['every_weeks'] * occurrence) if recurrence else timedelta()
+                items.append({**item, 'appointment_date': item['appointment_date'] + shift})
+        if len(items) > BULK_MAX_APPOINTMENTS:
+            raise serializers.ValidationError(f'Tối đa {BULK_MAX_APPOINTMENTS} lịch hẹn mỗi lần')
+
+        doctors = {doctor.pk: doctor for doctor in User.objects.filter(
+            pk__in={item['doctor'] for item in items}, groups__name='doctor').distinct()}
+        branches = set(Branch.objects.filter(pk__in={item['branch'] for item in items}).values_list('pk', flat=True))
+        services = set(Service.objects.filter(
+            pk__in={pk for item in items for pk in item['services']}).values_list('pk', flat=True))
+        consultant_ids = {item['consultant_id'] for item in items if item['consultant_id']}
+        consultants = set(User.objects.filter(pk__in=consultant_ids).values_list('pk', flat=True)) if consultant_ids else set()
+
+        errors = []
+        for item in items:
+            item_errors = {}
+            if item['doctor'] not in doctors:
+                item_errors['doctor'] = 'Bác sĩ không tồn tại'
+            if item['branch'] not in branches:
+                item_errors['branch'] = 'Chi nhánh không tồn tại'
+            if set(item['services']) - services:
+                item_errors['services'] = 'One or more provided service IDs are invalid or do not exist.'
+            if item['consultant_id'] and item['consultant_id'] not in consultants:
+                item_errors['consultant_id'] = 'Tư vấn viên không tồn tại'
+            error = schedule_error(item['appointment_date'], item['appointment_time'])
+            if error:
+                item_errors['non_field_errors'] = [error]
+            errors.append(item_errors)
+        if any(errors):
+            raise serializers.ValidationError({'appointments': errors})
+
+        data['items'] = items
+        return data
+
+    def _conflict_errors(self, items):
+        slots = [(item['doctor'], item['appointment_date'], item['appointment_time'], item['duration_minutes'])
+                 for item in items]
+        errors = []
+        for item, existing, earlier in zip(items, check_slots(slots), batch_overlaps(slots)):
+            item_errors = {}
+            if existing:
+                item_errors['non_field_errors'] = [overlap_error_message(existing)]
+            if earlier:
+                item_errors['batch_conflicts'] = [
+                    f'Trùng giờ với lịch hẹn số {position + 1} trong cùng lô' for position in earlier
+                ]
+            errors.append(item_errors)
+        return errors
+
+    def create(self, validated_data):
+        items = validated_data['items']
+        created_by = self.context['request'].user
+        appointments = []
+        for item in items:
+            notes = item['notes'] or ''
+            if item['consultant_id'] and parse_consultant_id(notes) is None:
+                notes = f"CONSULTANT_ID:{item['consultant_id']}\n{notes}".strip()
+            start = datetime.combine(item['appointment_date'], item['appointment_time'])
+            phone_e164, phone_reversed = phone_index_values(item['customer_phone'])
+            appointments.append(Appointment(
+                customer_name=item['customer_name'],
+                customer_phone=item['customer_phone'],
+                # bulk_create bỏ qua Appointment.save(), nên tự điền cột tra cứu SĐT
+                customer_phone_e164=phone_e164,
+                customer_phone_reversed=phone_reversed,
+                doctor_id=item['doctor'],
+                branch_id=item['branch'],
+                appointment_date=item['appointment_date'],
+                appointment_time=item['appointment_time'],
+                # bulk_create bỏ qua Appointment.save(), nên tự tính giờ kết thúc
+                end_time=(start + timedelta(minutes=item['duration_minutes'])).time(),
+                duration_minutes=item['duration_minutes'],
+                services_with_quantity=item['services_with_quantity'],
+                appointment_type=item['appointment_type'],
+                notes=notes,
+                consultant_id=item['consultant_id'],
+                created_by=created_by,
+            ))
+
+        with booking_lock(*{(item['doctor'], item['appointment_date']) for item in items}):
+            errors = self._conflict_errors(items)
+            if any(errors):
+                raise serializers.ValidationError({'appointments': errors})
+            appointments = Appointment.objects.bulk_create(appointments)
+            Appointment.services.through.objects.bulk_create([
+                Appointment.services.through(appointment_id=appointment.pk, service_id=service_id)
+                for appointment, item in zip(appointments, items)
+                for service_id in dict.fromkeys(item['services'])
+            ])
+            announce_bulk_change('created', [appointment.pk for appointment in appointments])
+        return appointments
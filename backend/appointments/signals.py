@@ -0,0 +1,132 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from appointments.day_sheet import invalidate_day_sheets, invalidate_on_commit
+from appointments.live import publish_appointment_event
+from appointments.models import Appointment, AppointmentTombstone
+from appointments.stats import invalidate_appointment_stats
+
+# Tombstone được giữ đủ lâu cho mọi client đang đồng bộ theo updated_since
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+
+@receiver(post_delete, sender=Appointment)
+def record_appointment_tombstone(sender, instance, **kwargs):
+    """Ghi lại lịch hẹn bị xoá để calendar delta sync trả về cho client"""
+    AppointmentTombstone.objects.create(
+        appointment_id=instance.pk,
+        doctor_id=instance.doctor_id,
+        branch_id=instance.branch_id,
+        appointment_date=instance.appointment_date,
+    )
+    AppointmentTombstone.objects.filter(deleted_at__lt=timezone.now() - TOMBSTONE_RETENTION).delete()
+
+
+def _live_payloads(appointment_ids):
+    from appointments.serializers import AppointmentListSerializer
+
+    appointments = (
+        Appointment.objects.select_related('doctor', 'branch', 'created_by', 'consultant')
+        .prefetch_related('services')
+        .filter(pk__in=appointment_ids)
+        .order_by('pk')
+    )
+    return AppointmentListSerializer(appointments, many=True).data
+
+
+def _live_payload(appointment_id):
+    payloads = _live_payloads([appointment_id])
+    return payloads[0] if payloads else None
+
+
+def announce_bulk_change(event_type, appointment_ids, extra=None):
+    """bulk_create/update() không phát signal: sau commit tự làm mới thống kê và đẩy sự kiện lên bảng trực tiếp.
+
+    `extra` (tuỳ chọn) là dict id -> các trường thêm vào payload, ví dụ previous_status.
+    """
+    appointment_ids = list(appointment_ids)
+    extra = extra or {}
+
+    def publish():
+        invalidate_appointment_stats()
+        invalidate_day_sheets(
+            Appointment.objects.filter(pk__in=appointment_ids).values_list('branch_id', 'appointment_date').distinct(),
+            timezone.localdate(),
+        )
+        for payload in _live_payloads(appointment_ids):
+            payload.update(extra.get(payload['id'], {}))
+            publish_appointment_event(event_type, payload['branch'], payload)
+
+    transaction.on_commit(publish)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_status(sender, instance, **kwargs):
+    """Giữ trạng thái, chi nhánh và ngày cũ: phân biệt đổi trạng thái, và xoá đúng bảng ngày cũ khi dời lịch"""
+    if instance.pk:
+        previous = Appointment.objects.filter(pk=instance.pk).values_list('status', 'branch_id', 'appointment_date').first()
+        if previous:
+            instance._previous_status = previous[0]
+            instance._previous_slot = previous[1:]
+
+
+@receiver(post_save, sender=Appointment)
+def expire_day_sheets_on_save(sender, instance, **kwargs):
+    """Bảng lịch trong ngày của chi nhánh/ngày cũ và mới phải render lại"""
+    slots = [(instance.branch_id, instance.appointment_date)]
+    previous_slot = getattr(instance, '_previous_slot', None)
+    if previous_slot:
+        slots.append(previous_slot)
+    invalidate_on_commit(slots)
+
+
+@receiver(post_delete, sender=Appointment)
+def expire_day_sheets_on_delete(sender, instance, **kwargs):
+    invalidate_on_commit([(instance.branch_id, instance.appointment_date)])
+
+
+@receiver(post_save, sender=Appointment)
+def publish_appointment_saved(sender, instance, created, **kwargs):
+    """Đẩy lịch hẹn mới/đã sửa lên bảng trực tiếp của chi nhánh sau khi commit"""
+    previous_status = getattr(instance, '_previous_status', None)
+    if created:
+        event_type = 'created'
+    elif previous_status is not None and previous_status != instance.status:
+        event_type = 'status_changed'
+    else:
+        event_type = 'updated'
+    appointment_id, branch_id = instance.pk, instance.branch_id
+
+    def publish():
+        # Dịch vụ (M2M) được gán sau save(), nên chỉ serialize khi transaction đã commit
+        payload = _live_payload(appointment_id)
+        if payload is None:
+            return
+        if event_type == 'status_changed':
+            payload['previous_status'] = previous_status
+        publish_appointment_event(event_type, branch_id, payload)
+
+    transaction.on_commit(publish)
+
+
+@receiver(post_delete, sender=Appointment)
+def publish_appointment_deleted(sender, instance, **kwargs):
+    """Báo lịch hẹn bị xoá cho bảng trực tiếp của chi nhánh"""
+    payload = {
+        'id': instance.pk,
+        'doctor': instance.doctor_id,
+        'branch': instance.branch_id,
+        'appointment_date': instance.appointment_date.strftime('%d/%m/%Y') if instance.appointment_date else None,
+    }
+    transaction.on_commit(lambda: publish_appointment_event('deleted', instance.branch_id, payload))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def expire_appointment_stats(sender, **kwargs):
+    """Thống kê lịch hẹn đang cache không còn đúng sau mỗi lần ghi/xoá"""
+    transaction.on_commit(invalidate_appointment_stats)
@@ -0,0 +1,89 @@
+"""Thống kê lịch hẹn theo trạng thái và theo bác sĩ.
+
+Toàn bộ số liệu được tính bằng một truy vấn GROUP BY doctor với các
+`Count(filter=Q(...))`; tổng chung là tổng các dòng theo bác sĩ. Kết quả được
+cache ngắn hạn với khoá có kèm "phiên bản" thống kê; signal của Appointment
+tăng phiên bản mỗi khi có lịch hẹn được ghi hoặc xoá, nên cache cũ tự bị bỏ.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Appointment
+
+STATS_CACHE_SECONDS = 60
+STATS_VERSION_KEY = 'appointments:stats:version'
+
+
+def stats_version():
+    return cache.get_or_set(STATS_VERSION_KEY, 1, timeout=None)
+
+
+def invalidate_appointment_stats():
+    """Bỏ mọi kết quả thống kê đang cache (gọi sau khi lịch hẹn thay đổi)"""
+    try:
+        cache.incr(STATS_VERSION_KEY)
+    except ValueError:
+        cache.set(STATS_VERSION_KEY, 1, timeout=None)
+
+
+def compute_appointment_stats(today, branch_id=None, date_from=None, date_to=None):
+    """Số lịch hẹn tổng, hôm nay, tháng này, theo trạng thái và theo bác sĩ trong phạm vi lọc"""
+    queryset = Appointment.objects.all()
+    if branch_id:
+        queryset = queryset.filter(branch_id=branch_id)
+    if date_from:
+        queryset = queryset.filter(appointment_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(appointment_date__lte=date_to)
+
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    status_counts = {
+        f'status_{code}': Count('id', filter=Q(status=code))
+        for code, _ in Appointment.STATUS_CHOICES
+    }
+    rows = (
+        queryset.values('doctor_id', 'doctor__first_name', 'doctor__last_name', 'doctor__username')
+        .annotate(
+            count=Count('id'),
+            today_count=Count('id', filter=Q(appointment_date=today)),
+            month_count=Count('id', filter=Q(appointment_date__gte=month_start, appointment_date__lt=next_month)),
+            **status_counts,
+        )
+        .order_by('-count', 'doctor_id')
+    )
+
+    totals = {key: 0 for key in ['count', 'today_count', 'month_count', *status_counts]}
+    by_doctor = []
+    for row in rows:
+        for key in totals:
+            totals[key] += row[key]
+        full_name = f"{row['doctor__first_name']} {row['doctor__last_name']}".strip()
+        by_doctor.append({
+            'doctor_id': row['doctor_id'],
+            'doctor_name': full_name or row['doctor__username'],
+            'count': row['count'],
+            'by_status': {code: row[f'status_{code}'] for code, _ in Appointment.STATUS_CHOICES},
+        })
+
+    return {
+        'total_appointments': totals['count'],
+        'today_appointments': totals['today_count'],
+        'this_month_appointments': totals['month_count'],
+        'appointments_by_status': {
+            label: totals[f'status_{code}'] for code, label in Appointment.STATUS_CHOICES
+        },
+        'appointments_by_doctor': by_doctor,
+    }
+
+
+def cached_appointment_stats(today, branch_id=None, date_from=None, date_to=None):
+    """compute_appointment_stats qua cache, khoá theo phiên bản thống kê và tham số lọc"""
+    key = 'appointments:stats:{}:{}:{}:{}:{}'.format(stats_version(), today, branch_id or '', date_from or '', date_to or '')
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_appointment_stats(today, branch_id=branch_id, date_from=date_from, date_to=date_to)
+        cache.set(key, stats, STATS_CACHE_SECONDS)
+    return stats
@@ -0,0 +1,55 @@
+"""Đồng bộ calendar theo con trỏ updated_since và ETag.
+
+Client lần đầu tải cả cửa sổ lịch và nhận header `X-Sync-Cursor`. Các lần
+sau gửi `updated_since=<cursor>` (và `If-None-Match` với ETag đã nhận): nếu
+cửa sổ không đổi thì trả 304 mà không serialize gì; ngược lại chỉ trả các
+lịch hẹn đã tạo/sửa cùng id các lịch đã xoá hoặc đã chuyển ra khỏi cửa sổ.
+"""
+import hashlib
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils.dateparse import parse_datetime
+
+# Lùi con trỏ một chút để không bỏ sót bản ghi được commit ngay sau khi lấy cursor
+SYNC_CURSOR_OVERLAP = timedelta(seconds=5)
+
+
+def format_cursor(value):
+    """datetime -> chuỗi ISO 8601 UTC dùng làm `updated_since`"""
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def parse_cursor(value):
+    """Chuỗi `updated_since` -> datetime có timezone, None nếu sai định dạng"""
+    try:
+        parsed = parse_datetime(value.replace(' ', '+'))
+    except ValueError:
+        return None
+    if parsed is None or parsed.tzinfo is None:
+        return None
+    return parsed
+
+
+def window_etag(appointments, tombstones, *parts):
+    """ETag của cửa sổ lịch: số dòng, updated_at lớn nhất và lần xoá gần nhất.
+
+    Mọi thao tác tạo/sửa đều đẩy updated_at lớn nhất lên, chuyển lịch ra khỏi
+    cửa sổ làm giảm số dòng, xoá thì thêm tombstone, nên ETag đổi khi và chỉ
+    khi client cần tải lại.
+    """
+    stats = appointments.order_by().aggregate(rows=Count('pk'), latest=Max('updated_at'))
+    latest_deleted = tombstones.order_by().aggregate(latest=Max('deleted_at'))['latest']
+    raw = json.dumps([stats['rows'], stats['latest'], latest_deleted, parts], default=str)
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match có khớp ETag hiện tại không (bỏ qua tiền tố weak W/)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in candidates or f'W/{etag}' in candidates
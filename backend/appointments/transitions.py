@@ -0,0 +1,69 @@
+"""Đổi trạng thái hàng loạt lịch hẹn (chốt cuối ngày, quét khách không đến).
+
+Một lần chuyển trạng thái gồm: khoá các dòng theo thứ tự id tăng dần, một câu
+`UPDATE ... WHERE id IN (...)` và một lần `bulk_create` AppointmentHistory, tất
+cả trong một transaction. Vì mọi thao tác hàng loạt đều khoá theo cùng thứ tự
+id, hai lượt chạy đồng thời không thể deadlock lẫn nhau; thao tác sửa từng lịch
+hẹn chỉ khoá một dòng nên cũng không tạo vòng chờ.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Appointment, AppointmentHistory
+from .signals import announce_bulk_change
+
+# Trạng thái còn mở: lịch quá giờ mà vẫn ở các trạng thái này là khách không đến
+OPEN_STATUSES = ['scheduled', 'confirmed']
+
+
+def apply_status_transition(appointment_ids, new_status, changed_by=None, notes='', from_statuses=None):
+    """Chuyển các lịch hẹn sang `new_status`; trả về list (id, trạng thái cũ) đã đổi.
+
+    Lịch đã ở `new_status`, không còn tồn tại, hoặc (khi có `from_statuses`)
+    không ở một trong các trạng thái đó thì được bỏ qua.
+    """
+    ids = sorted({int(appointment_id) for appointment_id in appointment_ids})
+    if not ids:
+        return []
+
+    with transaction.atomic():
+        locked = Appointment.objects.select_for_update().filter(pk__in=ids).exclude(status=new_status)
+        if from_statuses is not None:
+            locked = locked.filter(status__in=from_statuses)
+        changed = list(locked.order_by('pk').values_list('pk', 'status'))
+        if not changed:
+            return []
+
+        # update() không chạm auto_now, nên tự đặt updated_at cho calendar delta sync
+        Appointment.objects.filter(pk__in=[pk for pk, _ in changed]).update(
+            status=new_status, updated_at=timezone.now(),
+        )
+        AppointmentHistory.objects.bulk_create([
+            AppointmentHistory(
+                appointment_id=pk,
+                changed_by=changed_by,
+                change_type='status_change',
+                old_value=old_status,
+                new_value=new_status,
+                notes=notes,
+            )
+            for pk, old_status in changed
+        ])
+        announce_bulk_change(
+            'status_changed',
+            [pk for pk, _ in changed],
+            extra={pk: {'previous_status': old_status} for pk, old_status in changed},
+        )
+    return changed
+
+
+def overdue_open_appointments(cutoff, since):
+    """Id các lịch còn mở đã kết thúc trước `cutoff` (datetime địa phương), từ ngày `since`"""
+    day, moment = cutoff.date(), cutoff.time()
+    return (
+        Appointment.objects.filter(status__in=OPEN_STATUSES, appointment_date__gte=since, appointment_date__lte=day)
+        .exclude(appointment_date=day, end_time__gt=moment)
+        .exclude(appointment_date=day, end_time__isnull=True, appointment_time__gt=moment)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
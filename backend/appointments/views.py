@@ -5,16 +5,48 @@ from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
 from django.utils import timezone
 from datetime import datetime, date, timedelta
-from .models import Appointment, AppointmentHistory
+from .models import Appointment, AppointmentTombstone
+from .audit import flush_history, record_history
+from .day_sheet import today_sheet, upcoming_sheet
+from .stats import cached_appointment_stats
+from .transitions import apply_status_transition
+from .sync import SYNC_CURSOR_OVERLAP, etag_matches, format_cursor, parse_cursor, window_etag
+from .availability import (SLOT_STEP_MINUTES, STATUS_LABELS, find_conflicts, find_free_slots,
+                           format_minutes, service_names_by_appointment)
 from .serializers import (AppointmentSerializer, AppointmentListSerializer, 
-                         AppointmentHistorySerializer,
+                         AppointmentBulkSerializer, AppointmentHistorySerializer, archived_history_data,
                          AppointmentCalendarSerializer)
-from django.http import HttpResponse
+from customers.models import Branch
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .live import format_sse, get_hub
 import io
-from openpyxl import Workbook
+import json
+import time
+from reports.exporting import iter_rows, xlsx_response
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
+User = get_user_model()
+
+# Longest date range accepted by the free-slot search
+FREE_SLOTS_MAX_DAYS = 31
+
+# Most appointments one bulk status request may change
+BULK_STATUS_MAX_IDS = 500
+
+# Seconds between keep-alive comments on the live board stream
+LIVE_HEARTBEAT_SECONDS = 15
+# Reconnect delay (ms) suggested to EventSource clients
+LIVE_RETRY_MS = 3000
+# Django 4.2 does not notice ASGI client disconnects while streaming, so each
+# stream ends after this long and EventSource reconnects on its own
+LIVE_MAX_STREAM_SECONDS = 300
+
 
 def parse_date_string(date_str):
     """Parse date string from DD/MM/YYYY or YYYY-MM-DD format to date object"""
@@ -34,7 +66,7 @@ def parse_date_string(date_str):
 
 class AppointmentListCreateView(generics.ListCreateAPIView):
     """List and create appointments"""
-    queryset = Appointment.objects.prefetch_related('services').all()
+    queryset = Appointment.objects.select_related('doctor', 'branch', 'created_by', 'consultant').prefetch_related('services').all()
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'doctor', 'branch', 'appointment_date', 'appointment_time']
@@ -69,7 +101,7 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
 
 class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve, update or delete appointment"""
-    queryset = Appointment.objects.prefetch_related('services').all()
+    queryset = Appointment.objects.select_related('doctor', 'branch', 'created_by', 'consultant').prefetch_related('services').all()
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated]
 
@@ -77,10 +109,31 @@ class AppointmentDetailView(generics.RetrieveUpdateDestroyAPIView):
         serializer.save()
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_create_appointments(request):
+    """Create a batch of appointments, optionally repeated every N weeks, all or nothing"""
+    serializer = AppointmentBulkSerializer(data=request.data, context={'request': request})
+    serializer.is_valid(raise_exception=True)
+    appointments = serializer.save()
+    
+    created = Appointment.objects.select_related('doctor', 'branch', 'created_by', 'consultant').prefetch_related('services').filter(
+        pk__in=[appointment.pk for appointment in appointments]
+    ).order_by('appointment_date', 'appointment_time')
+    return Response({
+        'count': len(appointments),
+        'appointments': AppointmentListSerializer(created, many=True).data,
+    }, status=status.HTTP_201_CREATED)
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def appointment_calendar(request):
-    """Get appointments for calendar view"""
+    """Get appointments for calendar view
+
+    Supports conditional polling (ETag / If-None-Match) and delta sync with
+    `updated_since` set to the X-Sync-Cursor of the previous response.
+    """
     start_date = request.GET.get('start_date')
     end_date = request.GET.get('end_date')
     doctor_id = request.GET.get('doctor_id')
@@ -97,55 +150,86 @@ def appointment_calendar(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
     
-    queryset = Appointment.objects.prefetch_related('services').all()
-    
     # If no date filters, default to a 7-day window centered on today to avoid returning too many records
+    window = Q()
+    tombstone_window = Q()
     if start_date or end_date:
         if start_date:
             parsed_start_date = parse_date_string(start_date)
             if parsed_start_date:
-                queryset = queryset.filter(appointment_date__gte=parsed_start_date)
+                window &= Q(appointment_date__gte=parsed_start_date)
         if end_date:
             parsed_end_date = parse_date_string(end_date)
             if parsed_end_date:
-                queryset = queryset.filter(appointment_date__lte=parsed_end_date)
+                window &= Q(appointment_date__lte=parsed_end_date)
     else:
         today = timezone.now().date()
-        queryset = queryset.filter(appointment_date__range=[today, today + timedelta(days=7)])
+        window &= Q(appointment_date__range=[today, today + timedelta(days=7)])
+    tombstone_window &= window
     if doctor_id:
-        queryset = queryset.filter(doctor_id=doctor_id)
+        window &= Q(doctor_id=doctor_id)
+        tombstone_window &= Q(doctor_id=doctor_id)
     if branch_id:
-        queryset = queryset.filter(branch_id=branch_id)
+        window &= Q(branch_id=branch_id)
+        tombstone_window &= Q(branch_id=branch_id)
     
-    serializer = AppointmentCalendarSerializer(queryset, many=True)
-    return Response(serializer.data)
+    updated_since = request.GET.get('updated_since')
+    since = None
+    if updated_since:
+        since = parse_cursor(updated_since)
+        if since is None:
+            return Response(
+                {'error': 'updated_since must be an ISO 8601 datetime with timezone (the X-Sync-Cursor value)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        since -= SYNC_CURSOR_OVERLAP
+    
+    # Cursor is taken before reading so rows written during this request are sent next time
+    cursor = format_cursor(timezone.now())
+    queryset = Appointment.objects.filter(window)
+    tombstones = AppointmentTombstone.objects.filter(tombstone_window)
+    
+    etag = window_etag(queryset, tombstones, str(window))
+    if etag_matches(request.headers.get('If-None-Match'), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    
+    queryset = queryset.select_related('doctor', 'branch', 'consultant').prefetch_related('services')
+    headers = {'ETag': etag, 'X-Sync-Cursor': cursor}
+    if since is None:
+        serializer = AppointmentCalendarSerializer(queryset, many=True)
+        return Response(serializer.data, headers=headers)
+    
+    # Delta: rows changed since the cursor, plus ids deleted or moved out of the window
+    changed = queryset.filter(updated_at__gte=since)
+    moved_out = Appointment.objects.filter(updated_at__gte=since).exclude(window).values_list('id', flat=True)
+    deleted = tombstones.filter(deleted_at__gte=since).values_list('appointment_id', flat=True)
+    return Response({
+        'changed': AppointmentCalendarSerializer(changed, many=True).data,
+        'deleted': sorted(set(deleted) | set(moved_out)),
+        'cursor': cursor,
+    }, headers=headers)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def today_appointments(request):
-    """Get today's appointments"""
-    today = timezone.now().date()
-    appointments = Appointment.objects.prefetch_related('services').filter(
-        appointment_date=today,
-        status__in=['scheduled', 'confirmed', 'arrived', 'in_progress']
-    ).order_by('appointment_time')
-    serializer = AppointmentListSerializer(appointments, many=True)
-    return Response(serializer.data)
+    """Get today's appointments (optionally for one branch) from the cached day sheet"""
+    branch_id = request.GET.get('branch')
+    if branch_id and not branch_id.isdigit():
+        return Response({'error': 'branch must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    content = today_sheet(timezone.localdate(), branch_id=branch_id)
+    return HttpResponse(content, content_type='application/json')
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def upcoming_appointments(request):
-    """Get upcoming appointments"""
-    today = timezone.now().date()
-    appointments = Appointment.objects.prefetch_related('services').filter(
-        appointment_date__gte=today,
-        status__in=['scheduled', 'confirmed', 'arrived', 'in_progress']
-    ).order_by('appointment_date', 'appointment_time')[:10]
-    
-    serializer = AppointmentListSerializer(appointments, many=True)
-    return Response(serializer.data)
+    """Get upcoming appointments (optionally for one branch) from the cached sheet"""
+    branch_id = request.GET.get('branch')
+    if branch_id and not branch_id.isdigit():
+        return Response({'error': 'branch must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    content = upcoming_sheet(timezone.localdate(), branch_id=branch_id)
+    return HttpResponse(content, content_type='application/json')
 
 
 @api_view(['POST'])
@@ -166,13 +250,13 @@ def update_appointment_status(request, pk):
         appointment.status = new_status
         appointment.save()
         
-        # Create history record
-        AppointmentHistory.objects.create(
-            appointment=appointment,
-            changed_by=request.user,
-            change_type='status_change',
+        # History is written in batches by the audit buffer once the change commits
+        record_history(
+            appointment.pk,
+            'status_change',
             old_value=old_status,
             new_value=new_status,
+            changed_by=request.user,
             notes=request.data.get('notes', '')
         )
         
@@ -186,43 +270,72 @@ def update_appointment_status(request, pk):
         )
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def bulk_update_appointment_status(request):
+    """Move many appointments to one status with a single UPDATE and batched history"""
+    ids = request.data.get('ids')
+    new_status = request.data.get('status')
+    
+    if new_status not in [choice[0] for choice in Appointment.STATUS_CHOICES]:
+        return Response(
+            {'error': 'Invalid status'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not isinstance(ids, list) or not ids:
+        return Response({'error': 'ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(ids) > BULK_STATUS_MAX_IDS:
+        return Response(
+            {'error': f'Tối đa {BULK_STATUS_MAX_IDS} lịch hẹn mỗi lần'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        ids = [int(appointment_id) for appointment_id in ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'ids must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    changed = apply_status_transition(ids, new_status, changed_by=request.user, notes=request.data.get('notes', ''))
+    changed_ids = {pk for pk, _ in changed}
+    return Response({
+        'status': new_status,
+        'updated': [{'id': pk, 'old_status': old_status} for pk, old_status in changed],
+        'unchanged': sorted(set(ids) - changed_ids),
+    })
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def appointment_stats(request):
-    """Get appointment statistics"""
-    today = timezone.now().date()
-    this_month = today.replace(day=1)
+    """Appointment counts by status and doctor, optionally for one branch and date range"""
+    branch_id = request.GET.get('branch')
+    date_from = parse_date_string(request.GET.get('date_from'))
+    date_to = parse_date_string(request.GET.get('date_to'))
+    if branch_id and not branch_id.isdigit():
+        return Response({'error': 'branch must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if date_from and date_to and date_to < date_from:
+        return Response(
+            {'error': 'Ngày kết thúc phải lớn hơn hoặc bằng ngày bắt đầu'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    stats = {
-        'total_appointments': Appointment.objects.count(),
-        'today_appointments': Appointment.objects.filter(appointment_date=today).count(),
-        'this_month_appointments': Appointment.objects.filter(
-            appointment_date__gte=this_month
-        ).count(),
-        'appointments_by_status': {
-            status[1]: Appointment.objects.filter(status=status[0]).count()
-            for status in Appointment.STATUS_CHOICES
-        },
-        'appointments_by_doctor': [
-            {
-                'doctor_name': doctor.get_full_name(),
-                'count': Appointment.objects.filter(doctor=doctor).count()
-            }
-            for doctor in request.user.__class__.objects.filter(role='doctor')
-        ]
-    }
+    stats = cached_appointment_stats(
+        timezone.localdate(), branch_id=branch_id, date_from=date_from, date_to=date_to
+    )
     return Response(stats)
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def appointment_history(request, pk):
-    """Get appointment history"""
+    """Get appointment history, optionally including archived months"""
     try:
         appointment = Appointment.objects.get(pk=pk)
-        history = appointment.history.all()
-        serializer = AppointmentHistorySerializer(history, many=True)
-        return Response(serializer.data)
+        flush_history()
+        history = appointment.history.select_related('changed_by')
+        data = AppointmentHistorySerializer(history, many=True).data
+        if request.GET.get('include_archived') in ('1', 'true'):
+            data = list(data) + archived_history_data(appointment.pk)
+        return Response(data)
     except Appointment.DoesNotExist:
         return Response(
             {'error': 'Appointment not found'}, 
@@ -261,43 +374,27 @@ def check_appointment_availability(request):
                     {'error': f'Invalid date/time format: {appointment_date} {appointment_time}. Expected DD/MM/YYYY HH:MM or YYYY-MM-DD HH:MM'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
-        appointment_end_datetime = appointment_datetime + timedelta(minutes=duration_minutes)
-        
-        # Convert appointment_date to YYYY-MM-DD format for Django ORM
-        appointment_date_for_filter = appointment_datetime.date()
         
-        # Check for existing appointments for the same doctor on the same date
-        queryset = Appointment.objects.filter(
-            doctor_id=doctor_id,
-            appointment_date=appointment_date_for_filter
+        # Check for time conflicts against the doctor's interval index for that day
+        conflicts = find_conflicts(
+            doctor_id,
+            appointment_datetime.date(),
+            appointment_datetime.time(),
+            duration_minutes,
+            exclude_id=int(appointment_id) if appointment_id else None,
         )
-        
-        # If checking for update, exclude the current appointment
-        if appointment_id:
-            queryset = queryset.exclude(pk=appointment_id)
-        
-        # Check for time conflicts
-        conflicting_appointments = []
-        for existing_appointment in queryset:
-            existing_datetime = datetime.combine(
-                existing_appointment.appointment_date, 
-                existing_appointment.appointment_time
-            )
-            existing_end_datetime = existing_datetime + timedelta(
-                minutes=existing_appointment.duration_minutes
-            )
-            
-            # Check if there's any overlap
-            if (appointment_datetime < existing_end_datetime and 
-                appointment_end_datetime > existing_datetime):
-                conflicting_appointments.append({
-                    'id': existing_appointment.id,
-                    'time': existing_appointment.appointment_time.strftime('%H:%M'),
-                    'duration': existing_appointment.duration_minutes,
-                    'customer': existing_appointment.customer_name,
-                    'status': existing_appointment.get_status_display(),
-                    'services': [service.name for service in existing_appointment.services.all()]
-                })
+        service_names = service_names_by_appointment([booking.id for booking in conflicts])
+        conflicting_appointments = [
+            {
+                'id': booking.id,
+                'time': format_minutes(booking.start),
+                'duration': booking.end - booking.start,
+                'customer': booking.customer_name,
+                'status': STATUS_LABELS.get(booking.status, booking.status),
+                'services': service_names[booking.id],
+            }
+            for booking in conflicts
+        ]
         
         # Check if appointment is in the past
         from django.utils import timezone
@@ -327,16 +424,156 @@ def check_appointment_availability(request):
         )
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def free_slots(request):
+    """Earliest free slots per doctor for a branch over a date range"""
+    branch_id = request.GET.get('branch')
+    date_from = parse_date_string(request.GET.get('date_from'))
+    date_to = parse_date_string(request.GET.get('date_to')) or date_from
+    
+    if not branch_id or not date_from:
+        return Response(
+            {'error': 'Missing required parameters: branch, date_from'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if date_to < date_from:
+        return Response(
+            {'error': 'Ngày kết thúc phải lớn hơn hoặc bằng ngày bắt đầu'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if (date_to - date_from).days >= FREE_SLOTS_MAX_DAYS:
+        return Response(
+            {'error': f'Khoảng ngày tối đa là {FREE_SLOTS_MAX_DAYS} ngày'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    try:
+        duration_minutes = int(request.GET.get('duration_minutes', 30))
+        limit = min(int(request.GET.get('limit', 5)), 50)
+        step = int(request.GET.get('step', SLOT_STEP_MINUTES))
+        doctor_ids = [int(value) for value in request.GET.get('doctor_ids', '').split(',') if value.strip()]
+    except ValueError:
+        return Response(
+            {'error': 'duration_minutes, limit, step and doctor_ids must be integers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if duration_minutes <= 0 or limit <= 0 or step <= 0:
+        return Response(
+            {'error': 'duration_minutes, limit and step must be positive'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    branch = Branch.objects.filter(pk=branch_id).values('id', 'name').first()
+    if branch is None:
+        return Response({'error': 'Branch not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    # Doctors are not tied to a branch, so default to every active doctor
+    doctors = User.objects.filter(groups__name='doctor', is_active=True)
+    if doctor_ids:
+        doctors = doctors.filter(pk__in=doctor_ids)
+    doctors = list(doctors.order_by('first_name', 'last_name', 'id').distinct())
+    
+    slots = find_free_slots(
+        [doctor.pk for doctor in doctors], date_from, date_to, duration_minutes,
+        limit=limit, step=step, now=timezone.localtime(),
+    )
+    
+    return Response({
+        'branch': branch,
+        'date_from': date_from.strftime('%d/%m/%Y'),
+        'date_to': date_to.strftime('%d/%m/%Y'),
+        'duration_minutes': duration_minutes,
+        'doctors': [
+            {
+                'doctor_id': doctor.pk,
+                'doctor_name': doctor.get_full_name() or doctor.username,
+                'slots': [
+                    {
+                        'date': day.strftime('%d/%m/%Y'),
+                        'time': format_minutes(start),
+                        'end_time': format_minutes(start + duration_minutes),
+                    }
+                    for day, start in slots[doctor.pk]
+                ],
+            }
+            for doctor in doctors
+        ],
+    })
+
+
+def _live_board_user(request):
+    """Người dùng từ JWT trong header Authorization hoặc ?token= (EventSource không gửi được header)"""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header else request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        user = authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, TokenError):
+        return None
+    return user if user.is_active else None
+
+
+def _live_board_snapshot(branch_id):
+    """Lịch hẹn đang mở hôm nay của chi nhánh (bảng ngày đã cache), gửi kèm sự kiện `ready`"""
+    return json.loads(today_sheet(timezone.localdate(), branch_id=branch_id))
+
+
+async def live_board(request, branch_id):
+    """Server-sent events stream of appointment changes for one branch (ASGI only)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'error': 'Bảng lịch hẹn trực tiếp cần chạy server qua ASGI'},
+            status=501
+        )
+
+    user = await sync_to_async(_live_board_user)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided or are invalid'}, status=401)
+    if not await Branch.objects.filter(pk=branch_id).aexists():
+        return JsonResponse({'error': 'Branch not found'}, status=404)
+
+    async def stream():
+        hub = get_hub()
+        # Subscribe before taking the snapshot so no change falls in between
+        subscription = hub.subscribe(branch_id)
+        try:
+            snapshot = await sync_to_async(_live_board_snapshot)(branch_id)
+            yield f'retry: {LIVE_RETRY_MS}\n\n'
+            yield f'event: ready\ndata: {json.dumps({"branch": branch_id, "appointments": snapshot}, ensure_ascii=False, default=str)}\n\n'
+            deadline = time.monotonic() + LIVE_MAX_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                event = await subscription.next_event(LIVE_HEARTBEAT_SECONDS)
+                # Comment line keeps proxies from closing an idle connection
+                yield format_sse(event) if event is not None else ': ping\n\n'
+        finally:
+            hub.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_appointments_excel(request):
     """Export appointments to Excel honoring basic filters"""
+    return render_appointments_excel(request.GET)
+
+
+def render_appointments_excel(params):
+    """Excel lịch hẹn theo bộ lọc `params` (status, doctor, branch, date_from, date_to)"""
     queryset = Appointment.objects.prefetch_related('services').all()
-    status_param = request.GET.get('status')
-    doctor = request.GET.get('doctor')
-    branch = request.GET.get('branch')
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
+    status_param = params.get('status')
+    doctor = params.get('doctor')
+    branch = params.get('branch')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
     
     # Validate date range: date_to must be greater than or equal to date_from
     if date_from and date_to:
@@ -364,43 +601,34 @@ def export_appointments_excel(request):
         if parsed_date_to:
             queryset = queryset.filter(appointment_date__lte=parsed_date_to)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Appointments'
     headers = ['ID', 'Khách hàng', 'Bác sĩ', 'Dịch vụ', 'Chi nhánh', 'Ngày', 'Giờ', 'Trạng thái']
-    ws.append(headers)
-    for a in queryset.select_related('customer', 'doctor', 'branch'):
-        ws.append([
-            a.id,
-            a.customer_name,
-            a.doctor.get_full_name(),
-            ", ".join([s.name for s in a.services.all()]),
-            a.branch.name,
-            a.appointment_date.strftime('%Y-%m-%d'),
-            a.appointment_time.strftime('%H:%M'),
-            a.get_status_display(),
-        ])
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    response = HttpResponse(
-        output.read(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = 'attachment; filename=appointments.xlsx'
-    return response
+    rows = iter_rows(queryset.select_related('doctor', 'branch').order_by('id'), lambda a: [
+        a.id,
+        a.customer_name,
+        a.doctor.get_full_name(),
+        ", ".join([s.name for s in a.services.all()]),
+        a.branch.name,
+        a.appointment_date.strftime('%Y-%m-%d'),
+        a.appointment_time.strftime('%H:%M'),
+        a.get_status_display(),
+    ])
+    return xlsx_response('appointments.xlsx', [('Appointments', headers, rows)])
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_appointments_pdf(request):
+    return render_appointments_pdf(request.GET)
+
+
+def render_appointments_pdf(params):
+    """PDF lịch hẹn theo cùng bộ lọc với bản Excel"""
     queryset = Appointment.objects.prefetch_related('services').all()
-    status_param = request.GET.get('status')
-    doctor = request.GET.get('doctor')
-    branch = request.GET.get('branch')
-    date_from = request.GET.get('date_from')
-    date_to = request.GET.get('date_to')
+    status_param = params.get('status')
+    doctor = params.get('doctor')
+    branch = params.get('branch')
+    date_from = params.get('date_from')
+    date_to = params.get('date_to')
     
     # Validate date range: date_to must be greater than or equal to date_from
     if date_from and date_to:
@@ -443,7 +671,7 @@ def export_appointments_pdf(request):
     p.drawString(50, y, ' | '.join(headers))
     y -= 15
     p.setFont('Helvetica', 10)
-    for a in queryset.select_related('customer', 'doctor', 'branch'):
+    for a in queryset.select_related('doctor', 'branch'):
         row = [
             a.appointment_date.strftime('%Y-%m-%d'),
             a.appointment_time.strftime('%H:%M'),
@@ -0,0 +1,134 @@
+"""Phát hiện khách hàng trùng lặp.
+
+So sánh mọi cặp là không khả thi, nên chỉ so các khách hàng chung một khối
+(blocking key):
+
+- `phone`: cùng SĐT dạng E.164 (`phone_e164`);
+- `name_birth_year`: cùng họ tên đã bỏ dấu (`name_key`) và năm sinh.
+
+Mỗi khối được CSDL tìm bằng một truy vấn dùng window function (COUNT() OVER
+PARTITION BY khoá), sắp theo khoá rồi đọc dần bằng `iterator()`: bộ nhớ chỉ
+phải giữ một khối tại một thời điểm. Khối quá lớn (tên rất phổ biến, SĐT tổng
+đài) bị bỏ qua để số cặp không tăng theo bình phương.
+
+Mỗi cặp trong khối được chấm điểm; cặp đạt ngưỡng thành gợi ý gộp, giữ lại hồ
+sơ được tạo trước.
+"""
+from difflib import SequenceMatcher
+from itertools import combinations, groupby
+
+from django.db.models import Count, F, Window
+from django.db.models.functions import ExtractYear
+
+from .models import Customer
+
+DEFAULT_MIN_SCORE = 0.6
+DEFAULT_MAX_BLOCK_SIZE = 50
+
+BLOCKS = {
+    'phone': ('phone_e164',),
+    'name_birth_year': ('name_key', 'birth_year'),
+}
+
+CANDIDATE_FIELDS = ('pk', 'first_name', 'last_name', 'name_key', 'phone', 'phone_e164', 'email',
+                    'date_of_birth', 'branch_id', 'created_at')
+
+# Trọng số điểm; cùng SĐT nhưng khác tên (người nhà dùng chung số) không đủ ngưỡng
+WEIGHT_PHONE = 0.4
+WEIGHT_NAME = 0.35
+WEIGHT_BIRTH_DATE = 0.25
+WEIGHT_BIRTH_YEAR = 0.05
+WEIGHT_EMAIL = 0.15
+
+
+def _block_queryset(block):
+    keys = BLOCKS[block]
+    queryset = Customer.objects.annotate(birth_year=ExtractYear('date_of_birth')).exclude(**{keys[0]: ''})
+    return keys, queryset
+
+
+def iter_blocks(block, max_block_size=DEFAULT_MAX_BLOCK_SIZE, chunk_size=2000):
+    """Các khối (list dict khách hàng) có từ 2 tới max_block_size thành viên, đọc dần từ CSDL"""
+    keys, queryset = _block_queryset(block)
+    rows = (
+        queryset.annotate(block_size=Window(Count('pk'), partition_by=[F(key) for key in keys]))
+        .filter(block_size__gt=1, block_size__lte=max_block_size)
+        .order_by(*keys, 'pk')
+        .values(*CANDIDATE_FIELDS, 'birth_year')
+        .iterator(chunk_size=chunk_size)
+    )
+    for _, members in groupby(rows, key=lambda row: tuple(row[key] for key in keys)):
+        yield list(members)
+
+
+def oversized_block_keys(block, max_block_size=DEFAULT_MAX_BLOCK_SIZE):
+    """Khoá của các khối bị bỏ qua vì có nhiều hơn max_block_size khách hàng"""
+    keys, queryset = _block_queryset(block)
+    return [
+        tuple(row[key] for key in keys)
+        for row in queryset.values(*keys).annotate(size=Count('pk')).filter(size__gt=max_block_size)
+    ]
+
+
+def score_pair(first, second):
+    """(điểm 0..1, lý do) cho khả năng hai khách hàng là một người"""
+    score = 0.0
+    reasons = []
+    if first['phone_e164'] and first['phone_e164'] == second['phone_e164']:
+        score += WEIGHT_PHONE
+        reasons.append('same_phone')
+    if first['name_key'] and second['name_key']:
+        ratio = SequenceMatcher(None, first['name_key'], second['name_key']).ratio()
+        score += WEIGHT_NAME * ratio
+        if ratio == 1:
+            reasons.append('same_name')
+        elif ratio >= 0.8:
+            reasons.append('similar_name')
+    if first['date_of_birth'] == second['date_of_birth']:
+        score += WEIGHT_BIRTH_DATE
+        reasons.append('same_birth_date')
+    elif first['birth_year'] == second['birth_year']:
+        score += WEIGHT_BIRTH_YEAR
+        reasons.append('same_birth_year')
+    if first['email'] and first['email'].lower() == (second['email'] or '').lower():
+        score += WEIGHT_EMAIL
+        reasons.append('same_email')
+    return round(min(score, 1.0), 3), reasons
+
+
+def _summary(row):
+    return {
+        'id': row['pk'],
+        'full_name': f"{row['last_name']} {row['first_name']}",
+        'phone': row['phone'],
+        'email': row['email'],
+        'date_of_birth': row['date_of_birth'].strftime('%d/%m/%Y') if row['date_of_birth'] else None,
+        'branch': row['branch_id'],
+    }
+
+
+def merge_suggestion(block, first, second, score, reasons):
+    """Gợi ý gộp: giữ hồ sơ được tạo trước, gộp hồ sơ còn lại vào"""
+    keep, merge = sorted((first, second), key=lambda row: (row['created_at'], row['pk']))
+    return {
+        'block': block,
+        'score': score,
+        'reasons': reasons,
+        'keep': _summary(keep),
+        'merge': _summary(merge),
+    }
+
+
+def find_duplicate_customers(min_score=DEFAULT_MIN_SCORE, max_block_size=DEFAULT_MAX_BLOCK_SIZE, chunk_size=2000):
+    """Sinh dần các gợi ý gộp khách hàng có điểm >= min_score, theo từng khối"""
+    skipped_phones = {key[0] for key in oversized_block_keys('phone', max_block_size)}
+    for block in BLOCKS:
+        for members in iter_blocks(block, max_block_size, chunk_size):
+            for first, second in combinations(members, 2):
+                # Cặp cùng SĐT đã được xét ở khối phone (trừ khi khối đó quá lớn)
+                same_phone = first['phone_e164'] and first['phone_e164'] == second['phone_e164']
+                if block != 'phone' and same_phone and first['phone_e164'] not in skipped_phones:
+                    continue
+                score, reasons = score_pair(first, second)
+                if score >= min_score:
+                    yield merge_suggestion(block, first, second, score, reasons)
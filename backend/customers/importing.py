@@ -0,0 +1,303 @@
+"""Nhập khách hàng hàng loạt từ file Excel (.xlsx) hoặc CSV.
+
+Đi qua CustomerSerializer từng dòng tốn vài truy vấn mỗi khách hàng (tra tỉnh,
+phường, kiểm tra trùng SĐT, kiểm tra dịch vụ). Ở đây:
+
+- file được đọc dần (openpyxl read-only / csv reader), không nạp cả file;
+- mã tỉnh, phường lấy từ danh mục trong bộ nhớ (locations/registry.py); mã
+  dịch vụ và SĐT đã có được nạp một lần thành dict/set;
+- dòng hợp lệ được gom lại và ghi bằng `bulk_create` theo lô, kèm dịch vụ đã
+  dùng và từ khoá tìm kiếm; `Customer.save()` không chạy nên các cột chỉ mục
+  được tính bằng `refresh_index_fields()`;
+- dòng lỗi được ghi vào báo cáo lỗi (số dòng, cột, nội dung lỗi).
+"""
+import csv
+import io
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from locations.registry import get_registry, normalize_province_code
+
+from .models import Customer, CustomerSearchToken, Service
+from .phones import normalize_phone
+from .search import normalize_text, search_tokens, uses_trigram_index
+
+IMPORT_BATCH_SIZE = 500
+
+# Tiêu đề cột (đã bỏ dấu, chữ thường) -> trường
+HEADER_ALIASES = {
+    'last_name': 'last_name', 'ho': 'last_name', 'ho dem': 'last_name',
+    'first_name': 'first_name', 'ten': 'first_name',
+    'phone': 'phone', 'sdt': 'phone', 'so dien thoai': 'phone',
+    'email': 'email',
+    'gender': 'gender', 'gioi tinh': 'gender',
+    'date_of_birth': 'date_of_birth', 'ngay sinh': 'date_of_birth',
+    'province': 'province', 'ma tinh': 'province', 'tinh/thanh': 'province',
+    'ward': 'ward', 'ma phuong': 'ward', 'phuong/xa': 'ward',
+    'street': 'street', 'dia chi': 'street', 'so nha, ten duong': 'street',
+    'medical_history': 'medical_history', 'tien su benh': 'medical_history',
+    'allergies': 'allergies', 'di ung': 'allergies',
+    'notes': 'notes', 'ghi chu': 'notes',
+    'status': 'status', 'trang thai': 'status',
+    'services': 'services', 'dich vu': 'services', 'ma dich vu': 'services',
+}
+REQUIRED_COLUMNS = ('last_name', 'first_name', 'phone', 'gender', 'date_of_birth')
+
+GENDER_VALUES = {
+    'male': 'male', 'nam': 'male', 'm': 'male',
+    'female': 'female', 'nu': 'female', 'f': 'female',
+    'other': 'other', 'khac': 'other',
+}
+STATUS_VALUES = {
+    **{key: key for key, _ in Customer.STATUS_CHOICES},
+    **{normalize_text(label): key for key, label in Customer.STATUS_CHOICES},
+}
+DATE_FORMATS = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y')
+
+ERROR_REPORT_HEADERS = ['Dòng', 'Cột', 'Giá trị', 'Lỗi']
+
+
+class ImportFileError(ValueError):
+    """File không đọc được hoặc thiếu cột bắt buộc"""
+
+
+def iter_file_rows(file, filename):
+    """(số dòng, list giá trị) cho từng dòng của file .xlsx/.csv, kể cả dòng tiêu đề"""
+    if filename.lower().endswith('.xlsx'):
+        from openpyxl import load_workbook
+
+        try:
+            workbook = load_workbook(file, read_only=True, data_only=True)
+        except Exception as exc:
+            raise ImportFileError(f'Không đọc được file Excel: {exc}')
+        try:
+            for number, values in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+                yield number, list(values)
+        finally:
+            workbook.close()
+    elif filename.lower().endswith('.csv'):
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        try:
+            for number, values in enumerate(csv.reader(text, dialect), start=1):
+                yield number, values
+        finally:
+            text.detach()
+    else:
+        raise ImportFileError('Chỉ hỗ trợ file .xlsx hoặc .csv')
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _phone_text(value):
+    """SĐT dạng chữ; Excel lưu SĐT dạng số làm mất số 0 đầu"""
+    text = _text(value)
+    if isinstance(value, (int, float)) and not text.startswith(('0', '84')):
+        text = f'0{text}'
+    return text
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _text(value)
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+class CustomerImporter:
+    """Nhập khách hàng vào một chi nhánh; lỗi từng dòng được gom vào `errors` hoặc ghi thẳng ra `report`"""
+
+    def __init__(self, branch, batch_size=IMPORT_BATCH_SIZE, dry_run=False, report=None):
+        self.branch = branch
+        self.batch_size = max(1, batch_size)
+        self.dry_run = dry_run
+        self.report = csv.writer(report) if report is not None else None
+        if self.report:
+            self.report.writerow(ERROR_REPORT_HEADERS)
+        self.errors = []
+        self.error_count = 0
+        self.created = 0
+        self.rows = 0
+        self._pending = []
+        self._with_tokens = not uses_trigram_index()
+
+        # Nạp một lần: mã dịch vụ -> id, SĐT đã có; tỉnh/phường tra trong danh mục của tiến trình
+        self.locations = get_registry()
+        self.services = dict(Service.objects.filter(is_active=True).values_list('code', 'id'))
+        self.phones = {
+            normalize_phone(phone) or phone
+            for phone in Customer.objects.values_list('phone', flat=True).iterator(chunk_size=5000)
+        }
+
+    def run(self, rows):
+        """Nhập các dòng từ `iter_file_rows`; dòng đầu tiên là tiêu đề"""
+        columns = None
+        for number, values in rows:
+            if columns is None:
+                columns = self._columns(values)
+                continue
+            if not any(_text(value) for value in values):
+                continue
+            self.rows += 1
+            record = {field: values[index] if index < len(values) else None for field, index in columns.items()}
+            self._add(number, record)
+        if columns is None:
+            raise ImportFileError('File không có dữ liệu')
+        self._flush()
+        return self
+
+    def _columns(self, header):
+        columns = {}
+        for index, title in enumerate(header):
+            field = HEADER_ALIASES.get(normalize_text(_text(title)))
+            if field and field not in columns:
+                columns[field] = index
+        missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+        if missing:
+            raise ImportFileError(f'Thiếu cột bắt buộc: {", ".join(missing)}')
+        return columns
+
+    def _error(self, number, field, value, message):
+        self.error_count += 1
+        row = [number, field, _text(value), message]
+        if self.report:
+            self.report.writerow(row)
+        else:
+            self.errors.append(dict(zip(['row', 'field', 'value', 'message'], row)))
+
+    def _add(self, number, record):
+        errors = []
+        values = {}
+        for field, max_length in (('last_name', 100), ('first_name', 100), ('street', 255)):
+            values[field] = _text(record.get(field))
+            if len(values[field]) > max_length:
+                errors.append((field, f'Dài quá {max_length} ký tự'))
+        for field in ('last_name', 'first_name'):
+            if not values[field]:
+                errors.append((field, 'Bắt buộc'))
+
+        phone = _phone_text(record.get('phone'))
+        phone_e164 = normalize_phone(phone)
+        if not phone:
+            errors.append(('phone', 'Bắt buộc'))
+        elif len(phone) > 15 or not phone_e164:
+            errors.append(('phone', 'Số điện thoại không hợp lệ'))
+        elif phone_e164 in self.phones:
+            errors.append(('phone', 'Số điện thoại đã tồn tại'))
+
+        email = _text(record.get('email'))
+        if email:
+            try:
+                validate_email(email)
+            except ValidationError:
+                errors.append(('email', 'Email không hợp lệ'))
+
+        gender = GENDER_VALUES.get(normalize_text(_text(record.get('gender'))))
+        if not gender:
+            errors.append(('gender', 'Giới tính phải là Nam, Nữ hoặc Khác'))
+        date_of_birth = _parse_date(record.get('date_of_birth'))
+        if not date_of_birth:
+            errors.append(('date_of_birth', 'Ngày sinh phải có dạng dd/mm/yyyy'))
+
+        province = normalize_province_code(_text(record.get('province')))
+        ward = _text(record.get('ward'))
+        if province and not self.locations.province(province):
+            errors.append(('province', 'Mã tỉnh/thành không tồn tại'))
+        if ward:
+            ward_info = self.locations.ward(ward)
+            if not ward_info:
+                errors.append(('ward', 'Mã phường/xã không tồn tại'))
+            elif province and ward_info.province_code != province:
+                errors.append(('ward', 'Phường/xã không thuộc tỉnh/thành đã chọn'))
+            else:
+                province = ward_info.province_code
+
+        status = 'active'
+        if _text(record.get('status')):
+            status = STATUS_VALUES.get(normalize_text(_text(record.get('status'))))
+            if not status:
+                errors.append(('status', 'Trạng thái không hợp lệ'))
+
+        service_codes = [code.strip() for code in _text(record.get('services')).replace(';', ',').split(',')
+                         if code.strip()]
+        unknown = [code for code in service_codes if code not in self.services]
+        if unknown:
+            errors.append(('services', f'Mã dịch vụ không tồn tại: {", ".join(unknown)}'))
+
+        if errors:
+            for field, message in errors:
+                self._error(number, field, record.get(field), message)
+            return
+
+        # SĐT trùng trong chính file cũng bị chặn ở các dòng sau
+        self.phones.add(phone_e164)
+        customer = Customer(
+            last_name=values['last_name'],
+            first_name=values['first_name'],
+            phone=phone,
+            email=email or None,
+            gender=gender,
+            date_of_birth=date_of_birth,
+            province_id=province or None,
+            ward_id=ward or None,
+            street=values['street'] or None,
+            medical_history=_text(record.get('medical_history')) or None,
+            allergies=_text(record.get('allergies')) or None,
+            notes=_text(record.get('notes')) or None,
+            branch=self.branch,
+            status=status,
+        )
+        customer.refresh_index_fields()
+        self._pending.append((number, customer, [self.services[code] for code in dict.fromkeys(service_codes)]))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        if not pending or self.dry_run:
+            self.created += len(pending)
+            return
+        try:
+            with transaction.atomic():
+                self._save([customer for _, customer, _ in pending], pending)
+        except IntegrityError:
+            # Có khách hàng trùng SĐT được tạo cùng lúc: lưu lại từng dòng để chỉ bỏ dòng lỗi
+            for number, customer, service_ids in pending:
+                customer.pk = None
+                try:
+                    with transaction.atomic():
+                        self._save([customer], [(number, customer, service_ids)])
+                except IntegrityError:
+                    self._error(number, 'phone', customer.phone, 'Số điện thoại đã tồn tại')
+
+    def _save(self, customers, pending):
+        created = Customer.objects.bulk_create(customers)
+        Customer.services_used.through.objects.bulk_create([
+            Customer.services_used.through(customer_id=customer.pk, service_id=service_id)
+            for customer, (_, _, service_ids) in zip(created, pending)
+            for service_id in service_ids
+        ])
+        if self._with_tokens:
+            CustomerSearchToken.objects.bulk_create(search_tokens(created))
+        self.created += len(created)
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from appointments.models import Appointment
+from customers.models import Customer
+from customers.phones import phone_index_values
+
+
+class Command(BaseCommand):
+    help = 'Điền cột SĐT dạng E.164 và chữ số viết ngược cho khách hàng và lịch hẹn cũ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Số bản ghi xử lý mỗi lượt (mặc định 1000)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Chỉ đếm số bản ghi sẽ được cập nhật mà không ghi',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - Không có thay đổi nào được thực hiện'))
+
+        customers = self.backfill(Customer, 'phone', 'phone_e164', 'phone_reversed', batch_size, dry_run)
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật SĐT chuẩn hoá cho {customers} khách hàng'))
+        appointments = self.backfill(
+            Appointment, 'customer_phone', 'customer_phone_e164', 'customer_phone_reversed', batch_size, dry_run,
+        )
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật SĐT chuẩn hoá cho {appointments} lịch hẹn'))
+
+    def backfill(self, model, phone_field, e164_field, reversed_field, batch_size, dry_run):
+        last_pk = 0
+        updated = 0
+        while True:
+            # Phân trang theo pk, chỉ đọc SĐT và hai cột chỉ mục của batch_size dòng
+            rows = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk')
+                .only('pk', phone_field, e164_field, reversed_field)[:batch_size]
+            )
+            if not rows:
+                return updated
+            last_pk = rows[-1].pk
+
+            changed = []
+            for row in rows:
+                values = phone_index_values(getattr(row, phone_field))
+                if values != (getattr(row, e164_field), getattr(row, reversed_field)):
+                    setattr(row, e164_field, values[0])
+                    setattr(row, reversed_field, values[1])
+                    changed.append(row)
+            if changed and not dry_run:
+                # bulk_update không chạm updated_at: dữ liệu hiển thị không đổi nên client không cần đồng bộ lại
+                with transaction.atomic():
+                    model.objects.bulk_update(changed, [e164_field, reversed_field])
+            updated += len(changed)
+            self.stdout.write(f'  {model._meta.verbose_name}: đã xử lý tới #{last_pk}')
@@ -0,0 +1,58 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand
+
+from customers.duplicates import (BLOCKS, DEFAULT_MAX_BLOCK_SIZE, DEFAULT_MIN_SCORE,
+                                  find_duplicate_customers, oversized_block_keys)
+
+CSV_HEADERS = ['score', 'block', 'reasons', 'keep_id', 'keep_name', 'keep_phone',
+               'merge_id', 'merge_name', 'merge_phone']
+
+
+class Command(BaseCommand):
+    help = 'Tìm khách hàng trùng lặp theo SĐT chuẩn hoá và họ tên + năm sinh, in ra gợi ý gộp'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-score', type=float, default=DEFAULT_MIN_SCORE,
+                            help=f'Điểm tối thiểu để gợi ý gộp, 0..1 (mặc định {DEFAULT_MIN_SCORE})')
+        parser.add_argument('--max-block-size', type=int, default=DEFAULT_MAX_BLOCK_SIZE,
+                            help=f'Bỏ qua khối có nhiều hơn số khách hàng này (mặc định {DEFAULT_MAX_BLOCK_SIZE})')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Số dòng đọc từ CSDL mỗi lượt (mặc định 2000)')
+        parser.add_argument('--format', choices=['text', 'csv', 'jsonl'], default='text',
+                            help='Định dạng kết quả (mặc định text)')
+
+    def handle(self, *args, **options):
+        max_block_size = max(2, options['max_block_size'])
+        output_format = options['format']
+        writer = csv.writer(self.stdout) if output_format == 'csv' else None
+        if writer:
+            writer.writerow(CSV_HEADERS)
+
+        found = 0
+        # Gợi ý được in ngay khi tìm thấy, không giữ lại trong bộ nhớ
+        for suggestion in find_duplicate_customers(options['min_score'], max_block_size,
+                                                   max(1, options['batch_size'])):
+            found += 1
+            keep, merge = suggestion['keep'], suggestion['merge']
+            if writer:
+                writer.writerow([suggestion['score'], suggestion['block'], ' '.join(suggestion['reasons']),
+                                 keep['id'], keep['full_name'], keep['phone'],
+                                 merge['id'], merge['full_name'], merge['phone']])
+            elif output_format == 'jsonl':
+                self.stdout.write(json.dumps(suggestion, ensure_ascii=False))
+            else:
+                self.stdout.write(
+                    f"{suggestion['score']:.2f}  giữ #{keep['id']} {keep['full_name']} ({keep['phone']})"
+                    f"  <-  gộp #{merge['id']} {merge['full_name']} ({merge['phone']})"
+                    f"  [{', '.join(suggestion['reasons'])}]"
+                )
+
+        # Với csv/jsonl, tổng kết in ra stderr để stdout chỉ chứa dữ liệu
+        out = self.stdout if output_format == 'text' else self.stderr
+        for block in BLOCKS:
+            skipped = len(oversized_block_keys(block, max_block_size))
+            if skipped:
+                out.write(self.style.WARNING(f'Bỏ qua {skipped} khối {block} có hơn {max_block_size} khách hàng'))
+        out.write(self.style.SUCCESS(f'Tìm thấy {found} cặp khách hàng có thể trùng'))
@@ -0,0 +1,50 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from customers.importing import IMPORT_BATCH_SIZE, CustomerImporter, ImportFileError, iter_file_rows
+from customers.models import Branch
+
+
+class Command(BaseCommand):
+    help = 'Nhập khách hàng hàng loạt từ file .xlsx/.csv vào một chi nhánh, ghi báo cáo lỗi từng dòng'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Đường dẫn file .xlsx hoặc .csv')
+        parser.add_argument('--branch', type=int, required=True, help='Id chi nhánh nhận khách hàng')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+                            help=f'Số khách hàng ghi mỗi lượt (mặc định {IMPORT_BATCH_SIZE})')
+        parser.add_argument('--errors', help='File CSV báo cáo lỗi (mặc định <file>.errors.csv)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Chỉ kiểm tra dữ liệu và ghi báo cáo lỗi, không tạo khách hàng',
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Không tìm thấy file {path}')
+        try:
+            branch = Branch.objects.get(pk=options['branch'])
+        except Branch.DoesNotExist:
+            raise CommandError(f"Không tìm thấy chi nhánh #{options['branch']}")
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - Không có thay đổi nào được thực hiện'))
+
+        report_path = Path(options['errors'] or f'{path}.errors.csv')
+        with path.open('rb') as source, report_path.open('w', encoding='utf-8-sig', newline='') as report:
+            importer = CustomerImporter(branch, options['batch_size'], options['dry_run'], report=report)
+            try:
+                importer.run(iter_file_rows(source, path.name))
+            except ImportFileError as exc:
+                raise CommandError(str(exc))
+
+        action = 'Sẽ tạo' if options['dry_run'] else 'Đã tạo'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {importer.created}/{importer.rows} khách hàng cho chi nhánh {branch.name}'
+        ))
+        if importer.error_count:
+            self.stdout.write(self.style.WARNING(f'{importer.error_count} lỗi, xem {report_path}'))
+        else:
+            report_path.unlink()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from customers.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Tính lại tài liệu tìm kiếm (và bảng từ khoá trên SQLite) cho toàn bộ khách hàng'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Số khách hàng xử lý mỗi lượt (mặc định 1000)')
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật chỉ mục tìm kiếm cho {total} khách hàng'))
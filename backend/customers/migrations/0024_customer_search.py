@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS customer_search_trgm_idx '
+        'ON customers_customer USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS customer_search_trgm_idx')
+
+
+def build_search_index(apps, schema_editor):
+    from customers.search import rebuild_search_index
+
+    rebuild_search_index(
+        apps.get_model('customers', 'Customer'),
+        apps.get_model('customers', 'CustomerSearchToken'),
+        using=schema_editor.connection.alias,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0023_remove_duration_minutes_from_service'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='search_document',
+            field=models.CharField(blank=True, default='', editable=False, max_length=512),
+        ),
+        migrations.CreateModel(
+            name='CustomerSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='customers.customer')),
+            ],
+            options={
+                'verbose_name': 'Từ khoá tìm kiếm khách hàng',
+                'verbose_name_plural': 'Từ khoá tìm kiếm khách hàng',
+                'indexes': [models.Index(fields=['token', 'customer'], name='customer_search_token_idx')],
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
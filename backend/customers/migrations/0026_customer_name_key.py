@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:59
+
+from django.db import migrations, models
+
+
+def fill_name_keys(apps, schema_editor):
+    from customers.search import build_name_key
+
+    Customer = apps.get_model('customers', 'Customer')
+    customers = Customer.objects.using(schema_editor.connection.alias)
+    last_pk = 0
+    while True:
+        batch = list(customers.filter(pk__gt=last_pk).order_by('pk').only('pk', 'first_name', 'last_name')[:1000])
+        if not batch:
+            return
+        last_pk = batch[-1].pk
+        for customer in batch:
+            customer.name_key = build_name_key(customer)
+        customers.bulk_update(batch, ['name_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0025_customer_phone_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='name_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=201),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+    ]
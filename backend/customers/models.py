@@ -66,9 +66,20 @@ class Customer(models.Model):
     services_used = models.ManyToManyField('Service', blank=True, related_name='customers', verbose_name="Dịch vụ sử dụng")
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active', verbose_name="Trạng thái")
     
+    # Họ tên, SĐT, email đã bỏ dấu và chữ thường, dùng cho tìm kiếm (customers/search.py)
+    search_document = models.CharField(max_length=512, blank=True, default='', editable=False)
+    # "Họ Tên" đã bỏ dấu, khoá gom nhóm khi tìm khách hàng trùng (customers/duplicates.py)
+    name_key = models.CharField(max_length=201, blank=True, default='', editable=False, db_index=True)
+    # SĐT dạng E.164 và chữ số viết ngược, dùng tra cứu theo đuôi số (customers/phones.py)
+    phone_e164 = models.CharField(max_length=16, blank=True, default='', editable=False, db_index=True)
+    phone_reversed = models.CharField(max_length=15, blank=True, default='', editable=False, db_index=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    SEARCH_FIELDS = ('first_name', 'last_name', 'phone', 'email')
+    INDEX_FIELDS = ('search_document', 'name_key', 'phone_e164', 'phone_reversed')
+
     class Meta:
         verbose_name = "Khách hàng"
         verbose_name_plural = "Khách hàng"
@@ -77,6 +88,29 @@ class Customer(models.Model):
     def __str__(self):
         return f"{self.last_name} {self.first_name}"
 
+    def save(self, *args, **kwargs):
+        from .search import index_customer
+
+        # Chỉ tính lại tài liệu tìm kiếm khi lưu cả bản ghi hoặc có trường liên quan
+        update_fields = kwargs.get('update_fields')
+        reindex = update_fields is None or bool(set(update_fields) & set(self.SEARCH_FIELDS))
+        if reindex:
+            self.refresh_index_fields()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.INDEX_FIELDS}
+        super().save(*args, **kwargs)
+        if reindex:
+            index_customer(self, using=kwargs.get('using'))
+
+    def refresh_index_fields(self):
+        """Tính lại các cột chỉ mục (tìm kiếm, khoá trùng, SĐT chuẩn hoá); bulk_create phải tự gọi"""
+        from .phones import phone_index_values
+        from .search import build_name_key, build_search_document
+
+        self.search_document = build_search_document(self)
+        self.name_key = build_name_key(self)
+        self.phone_e164, self.phone_reversed = phone_index_values(self.phone)
+
     @property
     def full_name(self):
         return f"{self.last_name} {self.first_name}"
@@ -119,3 +153,18 @@ class Service(models.Model):
     def __str__(self):
         return f"{self.name} - Cấp {self.level_number} - {self.price:,} VNĐ"
 
+
+class CustomerSearchToken(models.Model):
+    """Từ khoá tìm kiếm của khách hàng, dùng khi CSDL không có pg_trgm (SQLite)"""
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='search_tokens')
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        verbose_name = "Từ khoá tìm kiếm khách hàng"
+        verbose_name_plural = "Từ khoá tìm kiếm khách hàng"
+        indexes = [
+            models.Index(fields=['token', 'customer'], name='customer_search_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.customer_id}"
@@ -0,0 +1,85 @@
+"""Chuẩn hoá số điện thoại và tra cứu theo đuôi số khi lễ tân nghe máy.
+
+Số điện thoại được lưu thô ("+84 912...", "0912...", "0912-..."), nên ngoài cột
+gốc mỗi bản ghi còn hai cột có index:
+
+- `*_e164`: dạng E.164 ("+84912345678"), để so khớp nguyên số;
+- `*_reversed`: chữ số của dạng E.164 viết ngược ("87654321948"). "Kết thúc
+  bằng 5678" trở thành "bắt đầu bằng 8765", tìm theo khoảng
+  [8765, 8765 + ':') nên dùng được B-tree index trên mọi CSDL thay vì quét
+  `icontains` cả bảng.
+"""
+import re
+
+# Số không có mã quốc gia được hiểu là số Việt Nam
+DEFAULT_COUNTRY_CODE = '84'
+# E.164 tối đa 15 chữ số
+PHONE_MAX_DIGITS = 15
+# Ít nhất 4 số cuối mới tra cứu, tránh trả về quá nhiều khách
+SUFFIX_MIN_DIGITS = 4
+# ':' đứng ngay sau '9' trong bảng mã, làm cận trên cho khoảng tiền tố
+DIGITS_END = ':'
+
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
+
+def normalize_phone(value):
+    """Dạng E.164 của số điện thoại; '' nếu không có chữ số hoặc quá dài"""
+    if not value:
+        return ''
+    value = str(value).strip()
+    digits = NON_DIGIT_PATTERN.sub('', value)
+    if not digits:
+        return ''
+    if value.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    elif digits.startswith(DEFAULT_COUNTRY_CODE) and len(digits) >= 11:
+        pass
+    elif digits.startswith('0'):
+        digits = DEFAULT_COUNTRY_CODE + digits[1:]
+    else:
+        digits = DEFAULT_COUNTRY_CODE + digits
+    if not digits or len(digits) > PHONE_MAX_DIGITS:
+        return ''
+    return f'+{digits}'
+
+
+def reverse_digits(e164):
+    """Chữ số của số E.164 viết ngược, dùng cho cột *_reversed"""
+    return e164.lstrip('+')[::-1]
+
+
+def phone_index_values(value):
+    """(e164, reversed) cho một số điện thoại thô"""
+    e164 = normalize_phone(value)
+    return e164, reverse_digits(e164)
+
+
+def lookup_key(query):
+    """Tiền tố cần tìm trong cột *_reversed cho chuỗi lễ tân nhập; None nếu quá ngắn.
+
+    Số đầy đủ (có '+', hoặc bắt đầu bằng 0/84 và đủ dài) được chuẩn hoá trước,
+    còn lại được coi là các số cuối: "0123" là đuôi số, không phải "+84123".
+    """
+    query = (query or '').strip()
+    digits = NON_DIGIT_PATTERN.sub('', query)
+    if len(digits) < SUFFIX_MIN_DIGITS:
+        return None
+    full_number = (
+        query.startswith('+')
+        or digits.startswith('00')
+        or (digits.startswith('0') and len(digits) >= 10)
+        or (digits.startswith(DEFAULT_COUNTRY_CODE) and len(digits) >= 11)
+    )
+    if full_number:
+        digits = normalize_phone(query).lstrip('+')
+        if not digits:
+            return None
+    return digits[::-1]
+
+
+def suffix_filter(field, key):
+    """Điều kiện "cột *_reversed bắt đầu bằng key" dưới dạng khoảng, dùng được index"""
+    return {f'{field}__gte': key, f'{field}__lt': key + DIGITS_END}
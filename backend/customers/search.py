@@ -0,0 +1,140 @@
+"""Tìm kiếm khách hàng không phân biệt dấu tiếng Việt.
+
+Mỗi khách hàng có `search_document`: họ tên, số điện thoại và email đã bỏ dấu,
+chuyển chữ thường ("Nguyễn Văn Đức" -> "nguyen van duc"), được tính lại trong
+`Customer.save()`. Truy vấn được chuẩn hoá giống hệt rồi tách thành từ; khách
+hàng phải khớp mọi từ (theo tiền tố).
+
+- PostgreSQL: `search_document LIKE '%từ%'` dùng GIN index pg_trgm
+  (`customer_search_trgm_idx`), xếp hạng bằng độ tương đồng trigram.
+- CSDL khác (SQLite khi dev): bảng CustomerSearchToken lưu từng từ của tài
+  liệu; tìm theo khoảng [từ, từ + U+10FFFF) để dùng được B-tree index, xếp
+  hạng theo số từ khớp trọn vẹn.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import Count, Q
+from rest_framework import filters
+
+from .models import Customer, CustomerSearchToken
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+TOKEN_MAX_LENGTH = 64
+PREFIX_END = '\U0010ffff'
+
+
+def normalize_text(value):
+    """Bỏ dấu tiếng Việt (kể cả đ/Đ), chữ thường, gộp khoảng trắng"""
+    if not value:
+        return ''
+    value = str(value).replace('đ', 'd').replace('Đ', 'D')
+    value = unicodedata.normalize('NFD', value)
+    value = ''.join(char for char in value if unicodedata.category(char) != 'Mn')
+    return ' '.join(value.lower().split())
+
+
+def tokenize(value):
+    return [token[:TOKEN_MAX_LENGTH] for token in TOKEN_PATTERN.findall(normalize_text(value))]
+
+
+def build_search_document(customer):
+    return normalize_text(' '.join(
+        part for part in [customer.last_name, customer.first_name, customer.phone, customer.email] if part
+    ))
+
+
+def build_name_key(customer):
+    return normalize_text(f'{customer.last_name or ""} {customer.first_name or ""}')
+
+
+def uses_trigram_index(using=None):
+    from django.db import connections
+
+    return (connections[using] if using else connection).vendor == 'postgresql'
+
+
+def document_tokens(document):
+    """Các từ (không trùng) của search_document, theo thứ tự xuất hiện"""
+    return list(dict.fromkeys(tokenize(document)))
+
+
+def index_customer(customer, using=None):
+    """Ghi lại bảng từ khoá của một khách hàng (chỉ khi không dùng trigram index)"""
+    if uses_trigram_index(using):
+        return
+    manager = CustomerSearchToken.objects.using(using) if using else CustomerSearchToken.objects
+    manager.filter(customer_id=customer.pk).delete()
+    manager.bulk_create(search_tokens([customer]))
+
+
+def search_tokens(customers, token_model=CustomerSearchToken):
+    """Các dòng từ khoá (chưa lưu) cho những khách hàng đã có pk và search_document"""
+    return [
+        token_model(customer_id=customer.pk, token=token)
+        for customer in customers
+        for token in document_tokens(customer.search_document)
+    ]
+
+
+def find_customers(query, queryset=None, ranked=True):
+    """Khách hàng khớp mọi từ của `query` (theo tiền tố, không phân biệt dấu); có cột `rank` khi ranked"""
+    queryset = Customer.objects.all() if queryset is None else queryset
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return queryset.none()
+
+    if uses_trigram_index(queryset.db):
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        for token in tokens:
+            queryset = queryset.filter(search_document__contains=token)
+        if ranked:
+            queryset = queryset.annotate(rank=TrigramSimilarity('search_document', ' '.join(tokens)))
+        return queryset
+
+    for token in tokens:
+        queryset = queryset.filter(pk__in=CustomerSearchToken.objects.filter(
+            token__gte=token, token__lt=token + PREFIX_END,
+        ).values('customer_id'))
+    if ranked:
+        queryset = queryset.annotate(rank=Count(
+            'search_tokens', filter=Q(search_tokens__token__in=tokens), distinct=True,
+        ))
+    return queryset
+
+
+def rebuild_search_index(customer_model=Customer, token_model=CustomerSearchToken, using='default', batch_size=1000):
+    """Tính lại search_document (và bảng từ khoá nếu cần) cho mọi khách hàng, theo từng lô.
+
+    Nhận model làm tham số để migration dùng được với model lịch sử.
+    """
+    with_tokens = not uses_trigram_index(using)
+    last_pk = 0
+    total = 0
+    while True:
+        customers = list(
+            customer_model.objects.using(using).filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'first_name', 'last_name', 'phone', 'email', 'search_document')[:batch_size]
+        )
+        if not customers:
+            return total
+        last_pk = customers[-1].pk
+        for customer in customers:
+            customer.search_document = build_search_document(customer)
+        customer_model.objects.using(using).bulk_update(customers, ['search_document'])
+        if with_tokens:
+            token_model.objects.using(using).filter(customer_id__in=[customer.pk for customer in customers]).delete()
+            token_model.objects.using(using).bulk_create(search_tokens(customers, token_model))
+        total += len(customers)
+
+
+class CustomerSearchFilter(filters.SearchFilter):
+    """SearchFilter của DRF (?search=) chạy trên chỉ mục tìm kiếm thay vì icontains từng cột"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not query.strip():
+            return queryset
+        return find_customers(query, queryset=queryset, ranked=False)
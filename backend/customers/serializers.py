@@ -1,7 +1,44 @@
 from rest_framework import serializers
+from locations.registry import get_registry
 from .models import Branch, Customer, Service
 
 
+class LocationCodeField(serializers.Field):
+    """Mã tỉnh/phường, kiểm tra bằng danh mục trong bộ nhớ; mã không tồn tại được lưu là null"""
+
+    def __init__(self, kind, **kwargs):
+        self.kind = kind
+        kwargs.setdefault('required', False)
+        kwargs.setdefault('allow_null', True)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        registry = get_registry()
+        location = registry.province(data) if self.kind == 'province' else registry.ward(data)
+        return location.code if location else None
+
+    def to_representation(self, value):
+        return value
+
+
+class LocationNamesMixin:
+    """province_code/ward_code/province_name/ward_name từ danh mục trong bộ nhớ, không truy vấn theo từng dòng"""
+
+    def get_province_code(self, obj):
+        province = get_registry().province(obj.province_id)
+        return province.code if province else None
+
+    def get_ward_code(self, obj):
+        ward = get_registry().ward(obj.ward_id)
+        return ward.code if ward else None
+
+    def get_province_name(self, obj):
+        return get_registry().province_name(obj.province_id)
+
+    def get_ward_name(self, obj):
+        return get_registry().ward_name(obj.ward_id)
+
+
 class BranchSerializer(serializers.ModelSerializer):
     """Serializer for Branch model"""
     manager_name = serializers.CharField(source='manager.get_full_name', read_only=True)
@@ -25,7 +62,7 @@ class ServiceSerializer(serializers.ModelSerializer):
         read_only_fields = ['created_at', 'updated_at']
 
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(LocationNamesMixin, serializers.ModelSerializer):
     """Serializer for creating and updating customers"""
     services_used = ServiceSerializer(many=True, read_only=True)
     services_used_ids = serializers.PrimaryKeyRelatedField(
@@ -37,6 +74,8 @@ class CustomerSerializer(serializers.ModelSerializer):
         write_only=True
     )
     branch_name = serializers.CharField(source='branch.name', read_only=True)
+    province = LocationCodeField('province', source='province_id')
+    ward = LocationCodeField('ward', source='ward_id')
     province_code = serializers.SerializerMethodField()
     ward_code = serializers.SerializerMethodField()
     province_name = serializers.SerializerMethodField()
@@ -54,33 +93,6 @@ class CustomerSerializer(serializers.ModelSerializer):
                  'province_name', 'ward_name', 'status', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
     
-    def to_internal_value(self, data):
-        """Override to handle province and ward codes"""
-        # Convert province and ward codes to IDs
-        if 'province' in data and data['province']:
-            try:
-                from locations.models import Province
-                # Normalize province code: handle values like '1' -> '01'
-                prov_code = str(data['province']).strip()
-                if prov_code.isdigit() and len(prov_code) == 1:
-                    prov_code = prov_code.zfill(2)
-                province = Province.objects.get(code=prov_code)
-                data['province'] = province.pk
-            except:
-                data['province'] = None
-        
-        if 'ward' in data and data['ward']:
-            try:
-                from locations.models import Ward
-                # Normalize ward code (defensive strip only; keep exact if given)
-                ward_code = str(data['ward']).strip()
-                ward = Ward.objects.get(code=ward_code)
-                data['ward'] = ward.pk
-            except:
-                data['ward'] = None
-
-        return super().to_internal_value(data)
-
     def to_representation(self, instance):
         """Override to ensure services_used is included in response"""
         data = super().to_representation(instance)
@@ -132,45 +144,9 @@ class CustomerSerializer(serializers.ModelSerializer):
         except Exception as e:
             print(f"Validation error: {e}")
             raise
-    
-    def get_province_code(self, obj):
-        try:
-            if obj.province:
-                return obj.province.code
-            return None
-        except Exception as e:
-            print(f"Error getting province_code for {obj.full_name}: {e}")
-            return None
-    
-    def get_ward_code(self, obj):
-        try:
-            if obj.ward:
-                return obj.ward.code
-            return None
-        except Exception as e:
-            print(f"Error getting ward_code for {obj.full_name}: {e}")
-            return None
-    
-    def get_province_name(self, obj):
-        try:
-            if obj.province:
-                return obj.province.name
-            return None
-        except Exception as e:
-            print(f"Error getting province_name for {obj.full_name}: {e}")
-            return None
-    
-    def get_ward_name(self, obj):
-        try:
-            if obj.ward:
-                return obj.ward.name
-            return None
-        except Exception as e:
-            print(f"Error getting ward_name for {obj.full_name}: {e}")
-            return None
 
 
-class CustomerListSerializer(serializers.ModelSerializer):
+class CustomerListSerializer(LocationNamesMixin, serializers.ModelSerializer):
     """Simplified serializer for customer list views"""
     full_name = serializers.ReadOnlyField()
     branch_name = serializers.CharField(source='branch.name', read_only=True)
@@ -188,37 +164,15 @@ class CustomerListSerializer(serializers.ModelSerializer):
                  'gender', 'date_of_birth', 'age', 'province_code', 'ward_code', 
                  'street', 'province_name', 'ward_name',
                  'branch', 'branch_name', 'status', 'created_at']
-    
-    def get_province_code(self, obj):
-        try:
-            return obj.province.code if obj.province else None
-        except Exception:
-            return None
-    
-    def get_ward_code(self, obj):
-        try:
-            return obj.ward.code if obj.ward else None
-        except Exception:
-            return None
-    
-    def get_province_name(self, obj):
-        try:
-            return obj.province.name if obj.province else None
-        except Exception:
-            return None
-    
-    def get_ward_name(self, obj):
-        try:
-            return obj.ward.name if obj.ward else None
-        except Exception:
-            return None
 
 
-class CustomerDetailSerializer(serializers.ModelSerializer):
+class CustomerDetailSerializer(LocationNamesMixin, serializers.ModelSerializer):
     """Detailed serializer for customer detail views"""
     full_name = serializers.ReadOnlyField()
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     branch_address = serializers.CharField(source='branch.address', read_only=True)
+    province = LocationCodeField('province', source='province_id')
+    ward = LocationCodeField('ward', source='ward_id')
     province_name = serializers.SerializerMethodField()
     ward_name = serializers.SerializerMethodField()
     province_code = serializers.SerializerMethodField()
@@ -238,27 +192,3 @@ class CustomerDetailSerializer(serializers.ModelSerializer):
                  'branch', 'branch_name', 'branch_address', 'services_used', 'status',
                  'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
-    
-    def get_province_name(self, obj):
-        try:
-            return obj.province.name if obj.province else None
-        except Exception:
-            return None
-    
-    def get_ward_name(self, obj):
-        try:
-            return obj.ward.name if obj.ward else None
-        except Exception:
-            return None
-    
-    def get_province_code(self, obj):
-        try:
-            return obj.province.code if obj.province else None
-        except Exception:
-            return None
-    
-    def get_ward_code(self, obj):
-        try:
-            return obj.ward.code if obj.ward else None
-        except Exception:
-            return None
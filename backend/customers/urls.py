@@ -15,6 +15,9 @@ urlpatterns = [
     path('customers/<int:pk>/', views.CustomerDetailView.as_view(), name='customer-detail'),
     path('customers/stats/', views.customer_stats, name='customer-stats'),
     path('customers/search/', views.search_customers, name='search-customers'),
+    path('customers/import/', views.import_customers, name='import-customers'),
+    path('customers/duplicates/', views.duplicate_customers, name='duplicate-customers'),
+    path('customers/lookup-by-phone/', views.lookup_customers_by_phone, name='lookup-customers-by-phone'),
     path('customers/export/xlsx/', views.export_customers_excel, name='export-customers-excel'),
     path('customers/export/pdf/', views.export_customers_pdf, name='export-customers-pdf'),
     path('customers/debug/', views.debug_customers, name='debug-customers'),
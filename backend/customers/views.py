@@ -6,11 +6,19 @@ from django.db.models import Count, Q
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 from .models import Customer, Service, Branch
+from .duplicates import DEFAULT_MAX_BLOCK_SIZE, DEFAULT_MIN_SCORE, find_duplicate_customers
+from .importing import CustomerImporter, ImportFileError, iter_file_rows
+from .phones import lookup_key, suffix_filter, SUFFIX_MIN_DIGITS
+from .search import CustomerSearchFilter, find_customers
 from .serializers import (CustomerSerializer, CustomerListSerializer, CustomerDetailSerializer,
                          ServiceSerializer, BranchSerializer)
 from django.http import HttpResponse
 import io
-from openpyxl import Workbook
+from appointments.models import Appointment
+from appointments.serializers import AppointmentListSerializer
+from users.views import IsAdminOrManager
+from itertools import islice
+from reports.exporting import iter_rows, xlsx_response
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
@@ -58,9 +66,8 @@ class CustomerListCreateView(generics.ListCreateAPIView):
     """List and create customers"""
     queryset = Customer.objects.select_related('branch').prefetch_related('services_used').all()
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, CustomerSearchFilter, filters.OrderingFilter]
     filterset_fields = ['gender', 'branch', 'created_at']
-    search_fields = ['first_name', 'last_name', 'phone', 'email']
     ordering_fields = ['first_name', 'last_name', 'created_at']
     ordering = ['-created_at']
     
@@ -106,68 +113,137 @@ def customer_stats(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def search_customers(request):
-    """Search customers by query"""
+    """Autocomplete customers by name, phone or email, ignoring Vietnamese diacritics"""
     query = request.GET.get('q', '')
     if not query:
         return Response({'customers': []})
     
-    customers = Customer.objects.filter(
-        Q(first_name__icontains=query) |
-        Q(last_name__icontains=query) |
-        Q(phone__icontains=query) |
-        Q(email__icontains=query)
+    customers = find_customers(query).select_related('branch').prefetch_related('services_used').order_by(
+        '-rank', 'last_name', 'first_name', 'id'
     )[:10]
     
     serializer = CustomerListSerializer(customers, many=True)
     return Response({'customers': serializer.data})
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def lookup_customers_by_phone(request):
+    """Caller identification: customers and appointments whose phone ends with ?phone= (or equals a full number)"""
+    key = lookup_key(request.GET.get('phone', ''))
+    if key is None:
+        return Response(
+            {'error': f'phone must contain at least {SUFFIX_MIN_DIGITS} digits'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Khoảng trên cột chữ số viết ngược: một lần dò B-tree index cho mỗi bảng
+    customers = (
+        Customer.objects.filter(**suffix_filter('phone_reversed', key))
+        .select_related('branch').prefetch_related('services_used')
+        .order_by('phone_reversed', 'id')[:10]
+    )
+    appointments = (
+        Appointment.objects.filter(**suffix_filter('customer_phone_reversed', key))
+        .select_related('doctor', 'branch', 'created_by', 'consultant').prefetch_related('services')
+        .order_by('-appointment_date', '-appointment_time')[:10]
+    )
+    return Response({
+        'customers': CustomerListSerializer(customers, many=True).data,
+        'appointments': AppointmentListSerializer(appointments, many=True).data,
+    })
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminOrManager])
+def import_customers(request):
+    """Bulk import customers from an uploaded .xlsx/.csv file into one branch"""
+    upload = request.FILES.get('file')
+    if not upload:
+        return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        branch = Branch.objects.get(pk=request.data.get('branch'))
+    except (Branch.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'branch must be an existing branch id'}, status=status.HTTP_400_BAD_REQUEST)
+    dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+
+    importer = CustomerImporter(branch, dry_run=dry_run)
+    try:
+        importer.run(iter_file_rows(upload, upload.name))
+    except ImportFileError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'rows': importer.rows,
+        'created': importer.created,
+        'dry_run': dry_run,
+        'error_count': importer.error_count,
+        'errors': importer.errors,
+    }, status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrManager])
+def duplicate_customers(request):
+    """Merge suggestions for likely duplicate customers (admin/manager only)"""
+    try:
+        min_score = float(request.GET.get('min_score', DEFAULT_MIN_SCORE))
+        limit = min(int(request.GET.get('limit', 100)), 1000)
+    except ValueError:
+        return Response({'error': 'min_score must be a number and limit an integer'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    # Trình sinh gợi ý dừng ngay khi đủ limit + 1 cặp, không quét hết bảng
+    suggestions = list(islice(find_duplicate_customers(min_score, DEFAULT_MAX_BLOCK_SIZE), max(limit, 1) + 1))
+    return Response({
+        'suggestions': suggestions[:limit],
+        'truncated': len(suggestions) > limit,
+    })
+
+
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_customers_excel(request):
     """Export customers to Excel"""
+    return render_customers_excel(request.GET)
+
+
+def render_customers_excel(params):
+    """Excel danh sách khách hàng theo bộ lọc `params`"""
     queryset = Customer.objects.all()
-    branch = request.GET.get('branch')
-    gender = request.GET.get('gender')
+    branch = params.get('branch')
+    gender = params.get('gender')
     
     if branch:
         queryset = queryset.filter(branch_id=branch)
     if gender:
         queryset = queryset.filter(gender=gender)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Customers'
     headers = ['ID', 'Họ tên', 'SĐT', 'Email', 'Giới tính', 'Tuổi', 'Chi nhánh', 'Ngày tạo']
-    ws.append(headers)
-    
-    for customer in queryset.select_related('branch'):
-        ws.append([
-            customer.id,
-            customer.full_name,
-            customer.phone,
-            customer.email or '',
-            customer.get_gender_display(),
-            customer.age,
-            customer.branch.name,
-            customer.created_at.strftime('%Y-%m-%d'),
-        ])
-    
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    response = HttpResponse(output.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=customers.xlsx'
-    return response
+    rows = iter_rows(queryset.select_related('branch').order_by('id'), lambda customer: [
+        customer.id,
+        customer.full_name,
+        customer.phone,
+        customer.email or '',
+        customer.get_gender_display(),
+        customer.age,
+        customer.branch.name,
+        customer.created_at.strftime('%Y-%m-%d'),
+    ])
+    return xlsx_response('customers.xlsx', [('Customers', headers, rows)])
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_customers_pdf(request):
     """Export customers to PDF"""
+    return render_customers_pdf(request.GET)
+
+
+def render_customers_pdf(params):
+    """PDF danh sách khách hàng theo bộ lọc `params`"""
     queryset = Customer.objects.all()
-    branch = request.GET.get('branch')
-    gender = request.GET.get('gender')
+    branch = params.get('branch')
+    gender = params.get('gender')
     
     if branch:
         queryset = queryset.filter(branch_id=branch)
@@ -46,7 +46,7 @@ INSTALLED_APPS = [
     
     # Local apps
     'customers.apps.CustomersConfig',
-    'appointments',
+    'appointments.apps.AppointmentsConfig',
     'financials.apps.FinancialsConfig',
     'reports',
     'users',
@@ -144,6 +144,18 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Background exports (reports.ExportJob) are written to MEDIA_ROOT/exports/ and removed after this many hours
+EXPORT_RETENTION_HOURS = env('EXPORT_RETENTION_HOURS', default=24, cast=int)
+
+# Pub/sub hub for the live appointment board (appointments/live.py). The
+# in-process hub only reaches SSE clients of the same ASGI process.
+APPOINTMENT_LIVE_HUB = env('APPOINTMENT_LIVE_HUB', default='appointments.live.InProcessHub')
+
+# Appointment history is buffered and written with bulk_create once this many
+# entries are pending or after this many seconds (appointments/audit.py)
+APPOINTMENT_AUDIT_FLUSH_SIZE = env('APPOINTMENT_AUDIT_FLUSH_SIZE', default=50, cast=int)
+APPOINTMENT_AUDIT_FLUSH_SECONDS = env('APPOINTMENT_AUDIT_FLUSH_SECONDS', default=2.0, cast=float)
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -173,6 +185,9 @@ CORS_ALLOWED_ORIGINS = env('CORS_ALLOWED_ORIGINS', default='http://localhost:300
 
 CORS_ALLOW_CREDENTIALS = True
 
+# Response headers the frontend reads (calendar delta sync, report cache)
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Sync-Cursor', 'X-Report-Cache']
+
 # JWT settings
 from datetime import timedelta
 
@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import Payment, Expense
+from .models import Payment, Expense, PaymentLine
+
+
+class PaymentLineInline(admin.TabularInline):
+    model = PaymentLine
+    extra = 0
+    can_delete = False
+    fields = ('service', 'quantity', 'unit_price', 'allocated_amount')
+    readonly_fields = ('service', 'quantity', 'unit_price', 'allocated_amount')
 
 
 @admin.register(Payment)
@@ -10,6 +18,7 @@ class PaymentAdmin(admin.ModelAdmin):
     ordering = ('-created_at',)
     readonly_fields = ('created_at', 'updated_at')
     filter_horizontal = ('services',)
+    inlines = [PaymentLineInline]
     
     def get_services(self, obj):
         return ', '.join([service.name for service in obj.services.all()])
@@ -0,0 +1,141 @@
+"""Phân bổ doanh thu của Payment cho từng dịch vụ.
+
+Một Payment có thể gồm nhiều Service; số tiền được chia cho từng dịch vụ theo
+tỷ lệ giá. Toàn bộ (payment, service, price) được lấy bằng một truy vấn duy
+nhất và phân bổ trong một lượt bằng số nguyên VNĐ, nên tổng các phần luôn
+khớp đúng với Payment.amount.
+
+Kết quả phân bổ được ghi sẵn vào PaymentLine khi Payment hoặc danh sách dịch
+vụ của nó thay đổi, nên báo cáo theo dịch vụ chỉ cần SUM ... GROUP BY.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from .models import Payment, PaymentLine
+
+
+def split_amount(amount, weights):
+    """Chia `amount` (VNĐ, số nguyên) theo `weights` (số nguyên).
+
+    Dùng phương pháp phần dư lớn nhất: mỗi phần lấy phần nguyên, số đồng còn
+    thiếu được cộng lần lượt cho các phần có phần dư lớn nhất. Trả về list
+    cùng độ dài với `weights`; nếu tổng trọng số bằng 0 thì không phân bổ.
+    """
+    total = sum(weights)
+    if total <= 0:
+        return [0] * len(weights)
+
+    shares = []
+    remainders = []
+    for index, weight in enumerate(weights):
+        share, remainder = divmod(amount * weight, total)
+        shares.append(share)
+        remainders.append((remainder, index))
+
+    leftover = amount - sum(shares)
+    remainders.sort(key=lambda item: (-item[0], item[1]))
+    for _, index in remainders[:leftover]:
+        shares[index] += 1
+    return shares
+
+
+def fetch_payment_service_rows(payments):
+    """Lấy (payment_id, amount, service_id, price) cho các payment trong một truy vấn"""
+    through = Payment.services.through
+    return (
+        through.objects
+        .filter(payment__in=payments)
+        .values_list('payment_id', 'payment__amount', 'service_id', 'service__price')
+        .order_by('payment_id', 'service_id')
+    )
+
+
+def allocate_payment_rows(rows):
+    """Phân bổ các dòng (payment_id, amount, service_id, price) đã sắp theo payment_id.
+
+    Trả về list (payment_id, service_id, allocated_amount).
+    """
+    allocations = []
+    for payment_id, payment_rows in groupby(rows, key=itemgetter(0)):
+        payment_rows = list(payment_rows)
+        amount = int(payment_rows[0][1] or 0)
+        weights = [int(round(price or 0)) for _, _, _, price in payment_rows]
+        shares = split_amount(amount, weights)
+        for (_, _, service_id, _), share in zip(payment_rows, shares):
+            allocations.append((payment_id, service_id, share))
+    return allocations
+
+
+def sync_payment_lines(payment_ids, refresh_prices=False):
+    """Ghi lại PaymentLine cho các payment theo danh sách dịch vụ hiện tại.
+
+    Đơn giá của dòng đã có được giữ nguyên (trừ khi `refresh_prices`), dịch vụ
+    mới lấy giá hiện tại, dòng của dịch vụ đã bị gỡ thì bị xoá. Trả về số
+    dòng sau khi đồng bộ.
+    """
+    payment_ids = list(payment_ids)
+    if not payment_ids:
+        return 0
+
+    with transaction.atomic():
+        existing = {
+            (line.payment_id, line.service_id): line
+            for line in PaymentLine.objects.select_for_update().filter(payment_id__in=payment_ids)
+        }
+        rows = []
+        for payment_id, amount, service_id, price in fetch_payment_service_rows(
+            Payment.objects.filter(id__in=payment_ids)
+        ):
+            line = existing.get((payment_id, service_id))
+            if line is not None and not refresh_prices:
+                price = line.unit_price * line.quantity
+            rows.append((payment_id, amount, service_id, price))
+
+        to_create = []
+        to_update = []
+        prices = {(payment_id, service_id): price for payment_id, _, service_id, price in rows}
+        for payment_id, service_id, share in allocate_payment_rows(rows):
+            line = existing.pop((payment_id, service_id), None)
+            if line is None:
+                to_create.append(PaymentLine(
+                    payment_id=payment_id,
+                    service_id=service_id,
+                    unit_price=prices[(payment_id, service_id)],
+                    allocated_amount=share,
+                ))
+                continue
+            if refresh_prices:
+                line.unit_price = prices[(payment_id, service_id)]
+            line.allocated_amount = share
+            to_update.append(line)
+
+        if existing:
+            PaymentLine.objects.filter(id__in=[line.id for line in existing.values()]).delete()
+        if to_update:
+            PaymentLine.objects.bulk_update(to_update, ['unit_price', 'allocated_amount'])
+        if to_create:
+            PaymentLine.objects.bulk_create(to_create)
+
+    return len(to_create) + len(to_update)
+
+
+def service_revenue_totals(payments):
+    """Tổng doanh thu đã phân bổ theo dịch vụ cho queryset `payments`.
+
+    Đọc trực tiếp từ PaymentLine. Trả về dict
+    service_id -> {'amount': int, 'payment_count': int}.
+    """
+    totals = (
+        PaymentLine.objects
+        .filter(payment__in=payments)
+        .values('service_id')
+        .annotate(amount=Sum('allocated_amount'), payment_count=Count('payment_id'))
+        .order_by()
+    )
+    return {
+        row['service_id']: {'amount': int(row['amount'] or 0), 'payment_count': row['payment_count']}
+        for row in totals
+    }
@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from financials.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Tính lại bảng tổng hợp thu chi theo ngày/chi nhánh (DailyBranchFinancials)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='from_date', help='Từ ngày (YYYY-MM-DD), mặc định toàn bộ lịch sử')
+        parser.add_argument('--to', dest='to_date', help='Đến ngày (YYYY-MM-DD), mặc định không giới hạn')
+
+    def handle(self, *args, **options):
+        start_date = self._parse_date(options['from_date'], '--from')
+        end_date = self._parse_date(options['to_date'], '--to')
+        if start_date and end_date and end_date < start_date:
+            raise CommandError('--to phải lớn hơn hoặc bằng --from')
+
+        cells = rebuild_rollups(start_date, end_date)
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã tính lại {cells} ô tổng hợp ({start_date or "đầu"} → {end_date or "nay"})'
+        ))
+
+    def _parse_date(self, value, option):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{option}: định dạng ngày không hợp lệ, cần YYYY-MM-DD')
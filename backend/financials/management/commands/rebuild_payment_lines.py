@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from financials.models import Payment
+from financials.allocation import sync_payment_lines
+
+
+class Command(BaseCommand):
+    help = 'Tạo lại PaymentLine (số tiền phân bổ theo dịch vụ) cho toàn bộ lịch sử thanh toán'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Số Payment xử lý trong mỗi transaction (mặc định 500)',
+        )
+        parser.add_argument(
+            '--refresh-prices', action='store_true', default=False,
+            help='Ghi đè đơn giá đã lưu bằng giá dịch vụ hiện tại',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        refresh_prices = options['refresh_prices']
+
+        last_id = 0
+        processed = 0
+        lines = 0
+        while True:
+            payment_ids = list(
+                Payment.objects.filter(id__gt=last_id)
+                .order_by('id')
+                .values_list('id', flat=True)[:chunk_size]
+            )
+            if not payment_ids:
+                break
+
+            lines += sync_payment_lines(payment_ids, refresh_prices=refresh_prices)
+            processed += len(payment_ids)
+            last_id = payment_ids[-1]
+            self.stdout.write(f'  Đã xử lý {processed} Payment (tới id {last_id})')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn thành: {processed} Payment, {lines} PaymentLine'
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0023_remove_duration_minutes_from_service'),
+        ('financials', '0001_initial_squashed_0007_remove_expense_created_by_remove_payment_appointment_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='Số lượng')),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Đơn giá')),
+                ('allocated_amount', models.DecimalField(decimal_places=0, default=0, max_digits=10, verbose_name='Số tiền phân bổ')),
+                ('payment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='financials.payment', verbose_name='Thanh toán')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_lines', to='customers.service', verbose_name='Dịch vụ')),
+            ],
+            options={
+                'verbose_name': 'Dòng thanh toán',
+                'verbose_name_plural': 'Dòng thanh toán',
+                'indexes': [models.Index(fields=['service', 'payment'], name='fin_paymentline_service_idx')],
+                'unique_together': {('payment', 'service')},
+            },
+        ),
+    ]
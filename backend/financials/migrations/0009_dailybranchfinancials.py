@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0023_remove_duration_minutes_from_service'),
+        ('financials', '0008_paymentline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBranchFinancials',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('revenue', models.DecimalField(decimal_places=0, default=0, max_digits=14, verbose_name='Doanh thu')),
+                ('expense', models.DecimalField(decimal_places=0, default=0, max_digits=14, verbose_name='Chi phí')),
+                ('payment_count', models.PositiveIntegerField(default=0, verbose_name='Số thanh toán')),
+                ('expense_count', models.PositiveIntegerField(default=0, verbose_name='Số khoản chi')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('branch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_financials', to='customers.branch', verbose_name='Chi nhánh')),
+            ],
+            options={
+                'verbose_name': 'Tổng hợp tài chính theo ngày',
+                'verbose_name_plural': 'Tổng hợp tài chính theo ngày',
+                'ordering': ['-date', 'branch'],
+                'unique_together': {('date', 'branch')},
+            },
+        ),
+    ]
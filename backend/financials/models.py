@@ -76,3 +76,48 @@ class Expense(models.Model):
         return f"{self.title} - {self.amount:,} VNĐ"
 
 
+
+
+class PaymentLine(models.Model):
+    """Dòng dịch vụ của thanh toán (số tiền đã phân bổ)"""
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='lines',
+                                verbose_name="Thanh toán")
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='payment_lines',
+                                verbose_name="Dịch vụ")
+    quantity = models.PositiveIntegerField(default=1, verbose_name="Số lượng")
+    # Giá dịch vụ tại thời điểm ghi nhận, không đổi khi Service.price thay đổi
+    unit_price = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Đơn giá")
+    allocated_amount = models.DecimalField(max_digits=10, decimal_places=0, default=0,
+                                           verbose_name="Số tiền phân bổ")
+    
+    class Meta:
+        verbose_name = "Dòng thanh toán"
+        verbose_name_plural = "Dòng thanh toán"
+        unique_together = ['payment', 'service']
+        indexes = [
+            models.Index(fields=['service', 'payment'], name='fin_paymentline_service_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.payment_id} - {self.service_id} - {self.allocated_amount:,} VNĐ"
+
+
+class DailyBranchFinancials(models.Model):
+    """Tổng hợp thu chi theo ngày và chi nhánh"""
+    date = models.DateField(verbose_name="Ngày")
+    branch = models.ForeignKey(Branch, on_delete=models.CASCADE, related_name='daily_financials',
+                               verbose_name="Chi nhánh")
+    revenue = models.DecimalField(max_digits=14, decimal_places=0, default=0, verbose_name="Doanh thu")
+    expense = models.DecimalField(max_digits=14, decimal_places=0, default=0, verbose_name="Chi phí")
+    payment_count = models.PositiveIntegerField(default=0, verbose_name="Số thanh toán")
+    expense_count = models.PositiveIntegerField(default=0, verbose_name="Số khoản chi")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Tổng hợp tài chính theo ngày"
+        verbose_name_plural = "Tổng hợp tài chính theo ngày"
+        ordering = ['-date', 'branch']
+        unique_together = ['date', 'branch']
+    
+    def __str__(self):
+        return f"{self.date} - {self.branch_id}: {self.revenue:,} / {self.expense:,} VNĐ"
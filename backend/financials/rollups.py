@@ -0,0 +1,142 @@
+"""Bảng tổng hợp thu chi theo ngày và chi nhánh (DailyBranchFinancials).
+
+Mỗi lần Payment/Expense được lưu hoặc xoá, chênh lệch được cộng dồn vào đúng
+ô (ngày, chi nhánh) bằng biểu thức F(), nên các endpoint tổng hợp chỉ cần
+SUM trên bảng nhỏ này thay vì quét toàn bộ Payment và Expense.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyBranchFinancials, Expense, Payment
+
+
+def payment_rollup_key(created_at, branch_id, amount):
+    """Ô tổng hợp của một Payment: (ngày theo giờ địa phương, chi nhánh, số tiền)"""
+    if created_at is None or branch_id is None:
+        return None
+    return (timezone.localtime(created_at).date(), branch_id, amount or 0)
+
+
+def expense_rollup_key(expense_date, branch_id, amount):
+    """Ô tổng hợp của một Expense: (ngày chi, chi nhánh, số tiền)"""
+    if expense_date is None or branch_id is None:
+        return None
+    return (expense_date, branch_id, amount or 0)
+
+
+def apply_delta(day, branch_id, revenue=0, expense=0, payment_count=0, expense_count=0):
+    """Cộng chênh lệch vào ô (day, branch_id), tạo ô nếu chưa có"""
+    with transaction.atomic():
+        row, _ = DailyBranchFinancials.objects.get_or_create(date=day, branch_id=branch_id)
+        DailyBranchFinancials.objects.filter(pk=row.pk).update(
+            revenue=F('revenue') + revenue,
+            expense=F('expense') + expense,
+            payment_count=F('payment_count') + payment_count,
+            expense_count=F('expense_count') + expense_count,
+            updated_at=timezone.now(),
+        )
+
+
+def record_payment_change(old_key, new_key):
+    """Chuyển một Payment từ ô `old_key` sang `new_key` (None = không tồn tại)"""
+    if old_key == new_key:
+        return
+    with transaction.atomic():
+        if old_key is not None:
+            day, branch_id, amount = old_key
+            apply_delta(day, branch_id, revenue=-amount, payment_count=-1)
+        if new_key is not None:
+            day, branch_id, amount = new_key
+            apply_delta(day, branch_id, revenue=amount, payment_count=1)
+
+
+def record_expense_change(old_key, new_key):
+    """Chuyển một Expense từ ô `old_key` sang `new_key` (None = không tồn tại)"""
+    if old_key == new_key:
+        return
+    with transaction.atomic():
+        if old_key is not None:
+            day, branch_id, amount = old_key
+            apply_delta(day, branch_id, expense=-amount, expense_count=-1)
+        if new_key is not None:
+            day, branch_id, amount = new_key
+            apply_delta(day, branch_id, expense=amount, expense_count=1)
+
+
+def rebuild_rollups(start_date=None, end_date=None):
+    """Tính lại toàn bộ ô trong khoảng ngày (bao gồm hai đầu) từ Payment và Expense.
+
+    Trả về số ô đã ghi.
+    """
+    rollups = DailyBranchFinancials.objects.all()
+    payments = Payment.objects.all()
+    expenses = Expense.objects.all()
+    if start_date:
+        rollups = rollups.filter(date__gte=start_date)
+        payments = payments.filter(created_at__date__gte=start_date)
+        expenses = expenses.filter(expense_date__gte=start_date)
+    if end_date:
+        rollups = rollups.filter(date__lte=end_date)
+        payments = payments.filter(created_at__date__lte=end_date)
+        expenses = expenses.filter(expense_date__lte=end_date)
+
+    cells = {}
+    payment_totals = (
+        payments.annotate(day=TruncDate('created_at'))
+        .values('day', 'branch_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    for row in payment_totals:
+        cell = cells.setdefault((row['day'], row['branch_id']), DailyBranchFinancials(
+            date=row['day'], branch_id=row['branch_id']
+        ))
+        cell.revenue = row['total'] or 0
+        cell.payment_count = row['count']
+
+    expense_totals = (
+        expenses.values('expense_date', 'branch_id')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    for row in expense_totals:
+        cell = cells.setdefault((row['expense_date'], row['branch_id']), DailyBranchFinancials(
+            date=row['expense_date'], branch_id=row['branch_id']
+        ))
+        cell.expense = row['total'] or 0
+        cell.expense_count = row['count']
+
+    with transaction.atomic():
+        rollups.delete()
+        DailyBranchFinancials.objects.bulk_create(cells.values(), batch_size=1000)
+    return len(cells)
+
+
+def summarize(start_date=None, end_date=None, branch_id=None, **periods):
+    """Tổng doanh thu/chi phí từ bảng tổng hợp trong một truy vấn.
+
+    `periods` là các mốc bổ sung dạng name=since_date; mỗi mốc thêm
+    `<name>_revenue` và `<name>_expenses` tính từ ngày đó trở đi.
+    """
+    rollups = DailyBranchFinancials.objects.all()
+    if start_date:
+        rollups = rollups.filter(date__gte=start_date)
+    if end_date:
+        rollups = rollups.filter(date__lte=end_date)
+    if branch_id:
+        rollups = rollups.filter(branch_id=branch_id)
+
+    aggregates = {
+        'total_revenue': Sum('revenue'),
+        'total_expenses': Sum('expense'),
+        'payment_count': Sum('payment_count'),
+        'expense_count': Sum('expense_count'),
+    }
+    for name, since in periods.items():
+        aggregates[f'{name}_revenue'] = Sum('revenue', filter=Q(date__gte=since))
+        aggregates[f'{name}_expenses'] = Sum('expense', filter=Q(date__gte=since))
+
+    totals = rollups.aggregate(**aggregates)
+    return {key: value or 0 for key, value in totals.items()}
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from appointments.models import Appointment
-from financials.models import Payment
+from financials.models import Payment, Expense
+from financials.allocation import sync_payment_lines
+from financials.rollups import (payment_rollup_key, expense_rollup_key,
+                                record_payment_change, record_expense_change)
 from customers.models import Customer
 from django.utils import timezone
 
@@ -88,3 +91,78 @@ def sync_customer_status_on_payment_save(sender, instance, created, **kwargs):
 @receiver(post_delete, sender=Payment)
 def sync_customer_status_on_payment_delete(sender, instance, **kwargs):
     _sync_customer_status_from_payments(instance.customer)
+
+
+@receiver(post_save, sender=Payment)
+def sync_payment_lines_on_payment_save(sender, instance, **kwargs):
+    """Phân bổ lại số tiền cho các dòng khi Payment thay đổi"""
+    sync_payment_lines([instance.pk])
+
+
+@receiver(m2m_changed, sender=Payment.services.through)
+def sync_payment_lines_on_services_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Cập nhật PaymentLine khi danh sách dịch vụ của Payment thay đổi"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            sync_payment_lines([instance.pk])
+        return
+
+    # Thay đổi từ phía Service: pk_set là id của các Payment bị ảnh hưởng
+    if action == 'pre_clear':
+        instance._cleared_payment_ids = list(instance.payment_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        sync_payment_lines(getattr(instance, '_cleared_payment_ids', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        sync_payment_lines(pk_set)
+
+
+@receiver(pre_save, sender=Payment)
+def remember_payment_rollup_key(sender, instance, **kwargs):
+    """Ghi nhớ ô tổng hợp cũ trước khi Payment được cập nhật"""
+    instance._rollup_old_key = None
+    if instance.pk and not instance._state.adding:
+        old = Payment.objects.filter(pk=instance.pk).values_list('created_at', 'branch_id', 'amount').first()
+        if old:
+            instance._rollup_old_key = payment_rollup_key(*old)
+
+
+@receiver(post_save, sender=Payment)
+def update_rollup_on_payment_save(sender, instance, **kwargs):
+    record_payment_change(
+        getattr(instance, '_rollup_old_key', None),
+        payment_rollup_key(instance.created_at, instance.branch_id, instance.amount),
+    )
+
+
+@receiver(post_delete, sender=Payment)
+def update_rollup_on_payment_delete(sender, instance, **kwargs):
+    record_payment_change(
+        payment_rollup_key(instance.created_at, instance.branch_id, instance.amount),
+        None,
+    )
+
+
+@receiver(pre_save, sender=Expense)
+def remember_expense_rollup_key(sender, instance, **kwargs):
+    """Ghi nhớ ô tổng hợp cũ trước khi Expense được cập nhật"""
+    instance._rollup_old_key = None
+    if instance.pk and not instance._state.adding:
+        old = Expense.objects.filter(pk=instance.pk).values_list('expense_date', 'branch_id', 'amount').first()
+        if old:
+            instance._rollup_old_key = expense_rollup_key(*old)
+
+
+@receiver(post_save, sender=Expense)
+def update_rollup_on_expense_save(sender, instance, **kwargs):
+    record_expense_change(
+        getattr(instance, '_rollup_old_key', None),
+        expense_rollup_key(instance.expense_date, instance.branch_id, instance.amount),
+    )
+
+
+@receiver(post_delete, sender=Expense)
+def update_rollup_on_expense_delete(sender, instance, **kwargs):
+    record_expense_change(
+        expense_rollup_key(instance.expense_date, instance.branch_id, instance.amount),
+        None,
+    )
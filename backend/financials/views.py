@@ -7,11 +7,13 @@ from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime, date, timedelta
 from .models import Payment, Expense
+from .allocation import service_revenue_totals
+from .rollups import summarize
 from .serializers import (PaymentSerializer, PaymentListSerializer,
                          ExpenseSerializer, ExpenseListSerializer, FinancialSummarySerializer)
 from django.http import HttpResponse
 import io
-from openpyxl import Workbook
+from reports.exporting import iter_rows, xlsx_response
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
@@ -100,16 +102,14 @@ def financial_summary(request):
     if isinstance(end_date, str):
         end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    # Calculate revenue
-    # Since payments are now simple (no partial payments), revenue = sum of all payment amounts
-    payments_qs = Payment.objects.all()
-    if not filter_all:
-        payments_qs = payments_qs.filter(created_at__date__range=[start_date, end_date])
+    # Revenue and expenses come from the daily branch rollup instead of scanning Payment/Expense
+    if filter_all:
+        totals = summarize()
+    else:
+        totals = summarize(start_date, end_date)
     
     # Total revenue = sum of all payment amounts
-    total_revenue = payments_qs.aggregate(
-        total=Coalesce(Sum('amount'), Value(0, output_field=DecimalField()))
-    )['total'] or 0
+    total_revenue = totals['total_revenue']
     
     # Total quoted amount (same as revenue since no partial payments)
     total_quoted_amount = total_revenue
@@ -117,11 +117,7 @@ def financial_summary(request):
     # No pending payments since all payments are complete
     pending_payments = 0
     
-    # Calculate expenses
-    expenses_qs = Expense.objects.all()
-    if not filter_all:
-        expenses_qs = expenses_qs.filter(expense_date__range=[start_date, end_date])
-    total_expenses = expenses_qs.aggregate(total=Coalesce(Sum('amount'), Value(0, output_field=DecimalField())))['total'] or 0
+    total_expenses = totals['total_expenses']
     
     # Additional stats for dashboard
     from customers.models import Customer
@@ -168,37 +164,18 @@ def revenue_by_service(request):
     
     from customers.models import Service
     
-    # Optimize query with select_related and prefetch_related
-    services = Service.objects.all().only('id', 'name', 'price')
-    revenue_data = []
+    # Allocated amounts are materialized in PaymentLine, so this is a single GROUP BY
+    payments = Payment.objects.filter(created_at__date__range=[start_date, end_date])
+    allocation = service_revenue_totals(payments)
     
-    for service in services:
-        # Optimize payment query with prefetch_related
-        payments_with_service = Payment.objects.filter(
-            services=service,
-            created_at__date__range=[start_date, end_date]
-        ).select_related('customer', 'branch').prefetch_related('services')
-        
-        total_service_amount = 0
-        paid_service_amount = 0
-        
-        for payment in payments_with_service:
-            # Calculate service ratio more efficiently
-            payment_services = payment.services.all()
-            total_service_price = sum(s.price for s in payment_services)
-            
-            if total_service_price > 0:
-                service_ratio = service.price / total_service_price
-                service_amount = payment.amount * service_ratio
-                
-                total_service_amount += service_amount
-                paid_service_amount += service_amount
-        
+    revenue_data = []
+    for service in Service.objects.all().only('id', 'name'):
+        service_amount = allocation.get(service.id, {}).get('amount', 0)
         revenue_data.append({
             'service_name': service.name,
-            'total_amount': total_service_amount,
-            'paid_amount': paid_service_amount,
-            'pending_amount': total_service_amount - paid_service_amount
+            'total_amount': service_amount,
+            'paid_amount': service_amount,
+            'pending_amount': 0
         })
     
     return Response(revenue_data)
@@ -271,25 +248,17 @@ def financial_stats(request):
     today = timezone.now().date()
     this_month = today.replace(day=1)
     
+    totals = summarize(this_month=this_month)
+    
     stats = {
         # Total quoted amounts and expenses overall
-        'total_revenue': Payment.objects.aggregate(
-            total=Coalesce(Sum('amount'), Value(0, output_field=DecimalField()))
-        )['total'] or 0,
-        'total_expenses': Expense.objects.aggregate(
-            total=Coalesce(Sum('amount'), Value(0, output_field=DecimalField()))
-        )['total'] or 0,
+        'total_revenue': totals['total_revenue'],
+        'total_expenses': totals['total_expenses'],
         # Cash-based revenue this month
-        'this_month_revenue': Payment.objects.filter(
-            created_at__date__gte=this_month
-        ).aggregate(total=Coalesce(Sum('amount'), Value(0, output_field=DecimalField())))['total'] or 0,
-        'this_month_expenses': Expense.objects.filter(
-            expense_date__gte=this_month
-        ).aggregate(total=Coalesce(Sum('amount'), Value(0, output_field=DecimalField())))['total'] or 0,
+        'this_month_revenue': totals['this_month_revenue'],
+        'this_month_expenses': totals['this_month_expenses'],
         'pending_payments': 0,  # No pending payments since all are complete
-        'paid_payments': Payment.objects.filter(
-            created_at__date__gte=this_month
-        ).aggregate(total=Coalesce(Sum('amount'), Value(0, output_field=DecimalField())))['total'] or 0,
+        'paid_payments': totals['this_month_revenue'],
     }
     
     return Response(stats)
@@ -298,11 +267,16 @@ def financial_stats(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_payments_excel(request):
+    return render_payments_excel(request.GET)
+
+
+def render_payments_excel(params):
+    """Excel thu chi (sheet thanh toán và chi phí) theo chi nhánh và khoảng ngày"""
     # Filter payments
     payments_queryset = Payment.objects.all()
-    branch = request.GET.get('branch')
-    start_date = request.GET.get('start_date')
-    end_date = request.GET.get('end_date')
+    branch = params.get('branch')
+    start_date = params.get('start_date')
+    end_date = params.get('end_date')
     
     if branch:
         payments_queryset = payments_queryset.filter(branch_id=branch)
@@ -316,20 +290,15 @@ def export_payments_excel(request):
     if start_date and end_date:
         expenses_queryset = expenses_queryset.filter(expense_date__range=[start_date, end_date])
 
-    wb = Workbook()
-    
     # Payments sheet
-    ws_payments = wb.active
-    ws_payments.title = 'Thanh toán'
     headers_payments = ['ID', 'ID Khách hàng', 'Khách hàng', 'Dịch vụ', 'Chi nhánh', 'Tổng tiền', 'Đã trả', 'Còn lại', 'Trạng thái', 'Phương thức', 'Ngày tạo']
-    ws_payments.append(headers_payments)
-    for p in payments_queryset.select_related('customer', 'branch').prefetch_related('services'):
-        services_names = ', '.join([service.name for service in p.services.all()])
-        ws_payments.append([
+    payment_rows = iter_rows(
+        payments_queryset.select_related('customer', 'branch').prefetch_related('services').order_by('id'),
+        lambda p: [
             p.id,
             p.customer.id,
             p.customer.full_name,
-            services_names,
+            ', '.join([service.name for service in p.services.all()]),
             p.branch.name,
             int(p.amount),
             int(p.amount),  # paid_amount = amount since all payments are complete
@@ -337,14 +306,14 @@ def export_payments_excel(request):
             'Hoàn thành',  # status is always complete
             p.get_payment_method_display(),
             p.created_at.strftime('%d/%m/%Y'),
-        ])
+        ],
+    )
     
     # Expenses sheet
-    ws_expenses = wb.create_sheet(title='Chi phí')
     headers_expenses = ['ID', 'Tiêu đề', 'Mô tả', 'Danh mục', 'Số tiền', 'Chi nhánh', 'Ngày chi', 'Ngày tạo']
-    ws_expenses.append(headers_expenses)
-    for e in expenses_queryset.select_related('branch'):
-        ws_expenses.append([
+    expense_rows = iter_rows(
+        expenses_queryset.select_related('branch').order_by('id'),
+        lambda e: [
             e.id,
             e.title,
             e.description or '',  # Thêm mô tả, để trống nếu không có
@@ -353,21 +322,25 @@ def export_payments_excel(request):
             e.branch.name,
             e.expense_date.strftime('%d/%m/%Y'),
             e.created_at.strftime('%d/%m/%Y'),
-        ])
+        ],
+    )
     
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    response = HttpResponse(output.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=financial_report.xlsx'
-    return response
+    return xlsx_response('financial_report.xlsx', [
+        ('Thanh toán', headers_payments, payment_rows),
+        ('Chi phí', headers_expenses, expense_rows),
+    ])
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_payments_pdf(request):
+    return render_payments_pdf(request.GET)
+
+
+def render_payments_pdf(params):
+    """PDF danh sách thanh toán theo chi nhánh"""
     queryset = Payment.objects.all()
-    branch = request.GET.get('branch')
+    branch = params.get('branch')
     if branch:
         queryset = queryset.filter(branch_id=branch)
 
@@ -401,34 +374,29 @@ def export_payments_pdf(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_expenses_excel(request):
+    return render_expenses_excel(request.GET)
+
+
+def render_expenses_excel(params):
+    """Excel chi phí theo chi nhánh và danh mục"""
     queryset = Expense.objects.all()
-    branch = request.GET.get('branch')
-    category = request.GET.get('category')
+    branch = params.get('branch')
+    category = params.get('category')
     if branch:
         queryset = queryset.filter(branch_id=branch)
     if category:
         queryset = queryset.filter(category=category)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Expenses'
     headers = ['ID', 'Tiêu đề', 'Danh mục', 'Số tiền', 'Chi nhánh', 'Ngày chi']
-    ws.append(headers)
-    for e in queryset.select_related('branch'):
-        ws.append([
-            e.id,
-            e.title,
-            e.category,
-            int(e.amount),
-            e.branch.name,
-            e.expense_date.strftime('%Y-%m-%d'),
-        ])
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    response = HttpResponse(output.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=expenses.xlsx'
-    return response
+    rows = iter_rows(queryset.select_related('branch').order_by('id'), lambda e: [
+        e.id,
+        e.title,
+        e.category,
+        int(e.amount),
+        e.branch.name,
+        e.expense_date.strftime('%Y-%m-%d'),
+    ])
+    return xlsx_response('expenses.xlsx', [('Expenses', headers, rows)])
 
 
 @api_view(['POST'])
@@ -513,9 +481,14 @@ def merge_payments(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_expenses_pdf(request):
+    return render_expenses_pdf(request.GET)
+
+
+def render_expenses_pdf(params):
+    """PDF chi phí theo chi nhánh và danh mục"""
     queryset = Expense.objects.all()
-    branch = request.GET.get('branch')
-    category = request.GET.get('category')
+    branch = params.get('branch')
+    category = params.get('category')
     if branch:
         queryset = queryset.filter(branch_id=branch)
     if category:
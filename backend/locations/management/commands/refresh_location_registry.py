@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from locations.registry import refresh_registry
+
+
+class Command(BaseCommand):
+    help = 'Nạp lại danh mục tỉnh/phường trong bộ nhớ của mọi tiến trình (sau khi sửa bảng location trực tiếp)'
+
+    def handle(self, *args, **options):
+        registry = refresh_registry()
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã làm mới danh mục: {len(registry.provinces)} tỉnh/thành, {len(registry.wards)} phường/xã'
+        ))
@@ -0,0 +1,112 @@
+"""Bộ nhớ đệm danh mục tỉnh/thành và phường/xã trong tiến trình.
+
+Province/Ward là dữ liệu tham chiếu chỉ đọc (bảng managed=False), nhưng
+serializer khách hàng từng tra chúng bằng một truy vấn cho mỗi lần ghi và mỗi
+dòng danh sách. `get_registry()` nạp cả hai bảng một lần cho mỗi tiến trình
+thành một `LocationRegistry` bất biến; tra mã/tên sau đó không tốn truy vấn.
+
+Làm mới: signal của Province/Ward (và lệnh `refresh_location_registry`) tăng
+"phiên bản" danh mục trong cache rồi nạp lại ở tiến trình hiện tại. Các tiến
+trình khác so phiên bản tối đa mỗi REGISTRY_CHECK_SECONDS giây và tự nạp lại
+khi phiên bản đổi (cần cache dùng chung, ví dụ Redis, khi chạy nhiều tiến trình).
+"""
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.core.cache import cache
+
+from .models import Province, Ward
+
+REGISTRY_VERSION_KEY = 'locations:registry:version'
+REGISTRY_CHECK_SECONDS = 30
+
+ProvinceInfo = namedtuple('ProvinceInfo', ['code', 'name', 'full_name'])
+WardInfo = namedtuple('WardInfo', ['code', 'name', 'full_name', 'province_code'])
+
+
+def normalize_province_code(code):
+    """Mã tỉnh dạng chuẩn: '1' -> '01'"""
+    code = str(code).strip() if code is not None else ''
+    if code.isdigit() and len(code) == 1:
+        code = code.zfill(2)
+    return code
+
+
+class LocationRegistry:
+    """Danh mục tỉnh/phường bất biến, tra theo mã"""
+
+    def __init__(self, provinces, wards, version=None):
+        self.provinces = MappingProxyType({province.code: province for province in provinces})
+        self.wards = MappingProxyType({ward.code: ward for ward in wards})
+        self.version = version
+
+    @classmethod
+    def load(cls, version=None):
+        return cls(
+            [ProvinceInfo(*row) for row in Province.objects.values_list('code', 'name', 'full_name')],
+            [WardInfo(*row) for row in Ward.objects.values_list('code', 'name', 'full_name', 'province_id')],
+            version,
+        )
+
+    def province(self, code):
+        """ProvinceInfo theo mã (chấp nhận '1' cho '01'), None nếu không có"""
+        if not code:
+            return None
+        return self.provinces.get(normalize_province_code(code))
+
+    def ward(self, code):
+        if not code:
+            return None
+        return self.wards.get(str(code).strip())
+
+    def province_name(self, code):
+        province = self.province(code)
+        return province.name if province else None
+
+    def ward_name(self, code):
+        ward = self.ward(code)
+        return ward.name if ward else None
+
+
+_registry = None
+_checked_at = float('-inf')
+_lock = threading.Lock()
+
+
+def registry_version():
+    # Giá trị khởi tạo theo thời gian: nếu khoá bị xoá khỏi cache, phiên bản mới luôn khác phiên bản cũ
+    return cache.get_or_set(REGISTRY_VERSION_KEY, lambda: int(time.time()), timeout=None)
+
+
+def get_registry():
+    """Danh mục của tiến trình; nạp lần đầu và khi phiên bản trong cache đổi"""
+    global _registry, _checked_at
+    registry = _registry
+    now = time.monotonic()
+    if registry is not None and now - _checked_at < REGISTRY_CHECK_SECONDS:
+        return registry
+    with _lock:
+        if _registry is None or now - _checked_at >= REGISTRY_CHECK_SECONDS:
+            version = registry_version()
+            if _registry is None or _registry.version != version:
+                _registry = LocationRegistry.load(version)
+            _checked_at = now
+        return _registry
+
+
+def invalidate_registry():
+    """Tăng phiên bản danh mục; mọi tiến trình (kể cả tiến trình này) nạp lại ở lần tra tiếp theo"""
+    global _checked_at
+    try:
+        cache.incr(REGISTRY_VERSION_KEY)
+    except ValueError:
+        cache.set(REGISTRY_VERSION_KEY, int(time.time()), timeout=None)
+    _checked_at = float('-inf')
+
+
+def refresh_registry():
+    """Làm mất hiệu lực danh mục rồi nạp lại ngay ở tiến trình này"""
+    invalidate_registry()
+    return get_registry()
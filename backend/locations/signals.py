@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from locations.models import Province, Ward
+from locations.registry import invalidate_registry
+
+
+@receiver(post_save, sender=Province)
+@receiver(post_delete, sender=Province)
+@receiver(post_save, sender=Ward)
+@receiver(post_delete, sender=Ward)
+def expire_location_registry(sender, **kwargs):
+    """Danh mục tỉnh/phường đang nạp trong các tiến trình không còn đúng sau khi ghi/xoá"""
+    transaction.on_commit(invalidate_registry)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ReportTemplate, GeneratedReport, DashboardWidget
+from .models import ReportTemplate, GeneratedReport, DashboardWidget, ExportJob
 
 
 @admin.register(ReportTemplate)
@@ -20,6 +20,14 @@ class GeneratedReportAdmin(admin.ModelAdmin):
     readonly_fields = ('generated_at',)
 
 
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'resource', 'file_format', 'status', 'progress', 'created_by', 'created_at', 'expires_at')
+    list_filter = ('resource', 'file_format', 'status', 'created_at')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'file_size')
+
+
 @admin.register(DashboardWidget)
 class DashboardWidgetAdmin(admin.ModelAdmin):
     list_display = ('name', 'widget_type', 'position', 'is_active', 'created_by', 'created_at')
@@ -0,0 +1,74 @@
+"""Cache kết quả báo cáo theo tham số và phiên bản dữ liệu.
+
+Khoá cache gồm loại báo cáo, khoảng ngày, chi nhánh/bác sĩ/dịch vụ, group_by
+và "phiên bản" của từng bảng nguồn (số dòng + updated_at lớn nhất, hoặc id
+lớn nhất với bảng không có updated_at). Dữ liệu không đổi thì khoá không đổi,
+nên báo cáo trùng được trả lại từ GeneratedReport đã có thay vì tính lại.
+"""
+import hashlib
+import json
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max
+
+from appointments.models import Appointment
+from customers.models import Branch, Customer, Service
+from financials.models import Expense, Payment, PaymentLine
+
+from .models import GeneratedReport
+
+User = get_user_model()
+
+AppointmentService = Appointment.services.through
+
+# Bảng nguồn của từng loại báo cáo. Bảng có `date_lookup` chỉ tính phiên bản
+# trong khoảng ngày của báo cáo; bảng danh mục (tên dịch vụ, chi nhánh, bác sĩ)
+# tính trên toàn bảng.
+VERSION_SOURCES = {
+    'revenue': [(Payment, 'created_at__date'), (PaymentLine, 'payment__created_at__date'),
+                (Service, None), (Branch, None)],
+    'expense': [(Expense, 'created_at__date'), (Branch, None)],
+    'appointment': [(Appointment, 'created_at__date'), (User, None), (Branch, None)],
+    'customer': [(Customer, 'created_at__date'), (Branch, None)],
+    'service': [(Payment, 'created_at__date'), (PaymentLine, 'payment__created_at__date'),
+                (Appointment, 'created_at__date'), (AppointmentService, 'appointment__created_at__date'),
+                (Service, None)],
+    'doctor': [(Appointment, 'created_at__date'), (AppointmentService, 'appointment__created_at__date'),
+               (Service, None), (User, None)],
+    'branch': [(Customer, 'created_at__date'), (Appointment, 'created_at__date'),
+               (Payment, 'created_at__date'), (Expense, 'created_at__date'), (Branch, None)],
+}
+
+
+def table_version(model, date_lookup, start_date, end_date):
+    """(số dòng, updated_at hoặc id lớn nhất) của bảng trong khoảng ngày"""
+    queryset = model.objects.all()
+    if date_lookup:
+        queryset = queryset.filter(**{f'{date_lookup}__range': [start_date, end_date]})
+    marker = 'updated_at' if any(f.name == 'updated_at' for f in model._meta.fields) else 'pk'
+    version = queryset.order_by().aggregate(rows=Count('pk'), marker=Max(marker))
+    marker_value = version['marker']
+    return [version['rows'], marker_value.isoformat() if hasattr(marker_value, 'isoformat') else marker_value]
+
+
+def report_cache_key(report_type, start_date, end_date, parameters):
+    """Khoá cache (sha256 hex) cho một báo cáo với dữ liệu hiện tại"""
+    versions = {
+        model._meta.label: table_version(model, date_lookup, start_date, end_date)
+        for model, date_lookup in VERSION_SOURCES.get(report_type, [])
+    }
+    payload = {
+        'report_type': report_type,
+        'start_date': str(start_date),
+        'end_date': str(end_date),
+        'parameters': {key: parameters.get(key) for key in sorted(parameters)},
+        'versions': versions,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def find_cached_report(cache_key):
+    """Báo cáo đã hoàn thành gần nhất có cùng khoá cache, hoặc None"""
+    if not cache_key:
+        return None
+    return GeneratedReport.objects.filter(cache_key=cache_key, status='completed').order_by('-generated_at').first()
@@ -0,0 +1,132 @@
+"""Xử lý ExportJob: render file export nền vào MEDIA_ROOT/exports/.
+
+Mỗi loại export dùng lại đúng hàm render của endpoint export tương ứng
+(`render_*` trong views của từng app), nên file tải về giống hệt khi gọi
+endpoint trực tiếp với cùng tham số. Worker `run_export_worker` chạy các job
+này trong thread pool riêng để web worker không bị giữ hàng chục giây.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ExportJob
+
+EXPORT_RENDERERS = {
+    ('appointments', 'xlsx'): 'appointments.views.render_appointments_excel',
+    ('appointments', 'pdf'): 'appointments.views.render_appointments_pdf',
+    ('customers', 'xlsx'): 'customers.views.render_customers_excel',
+    ('customers', 'pdf'): 'customers.views.render_customers_pdf',
+    ('payments', 'xlsx'): 'financials.views.render_payments_excel',
+    ('payments', 'pdf'): 'financials.views.render_payments_pdf',
+    ('expenses', 'xlsx'): 'financials.views.render_expenses_excel',
+    ('expenses', 'pdf'): 'financials.views.render_expenses_pdf',
+    ('generated_report', 'xlsx'): 'reports.views.render_generated_report_excel',
+    ('generated_report', 'pdf'): 'reports.views.render_generated_report_pdf',
+}
+
+FILENAME_PATTERN = re.compile(r'filename="?([^";]+)"?')
+
+
+def export_filename(job, response):
+    """Tên file lấy từ Content-Disposition của response, thêm id job để không trùng"""
+    match = FILENAME_PATTERN.search(response.get('Content-Disposition', ''))
+    filename = match.group(1) if match else f'export.{job.file_format}'
+    return f'{job.pk}_{filename}'
+
+
+def response_file(response):
+    """Nội dung response dưới dạng File để lưu vào storage mà không đọc hết vào bộ nhớ"""
+    stream = getattr(response, 'file_to_stream', None)
+    if stream is not None:
+        stream.seek(0)
+        return File(stream)
+    return ContentFile(response.content)
+
+
+def response_error(response):
+    """Thông báo lỗi của response 4xx/5xx từ hàm render"""
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict) and data.get('error'):
+        return str(data['error'])
+    return f'HTTP {response.status_code}'
+
+
+def claim_export(job_id):
+    """Chuyển job từ pending sang running; False nếu worker khác đã nhận"""
+    return ExportJob.objects.filter(pk=job_id, status='pending').update(
+        status='running', progress=10, started_at=timezone.now(), error=None,
+    ) == 1
+
+
+def run_export_job(job_id):
+    """Render file cho một job đã được nhận và ghi trạng thái, đường dẫn file, hạn lưu"""
+    close_old_connections()
+    try:
+        if not claim_export(job_id):
+            return
+        job = ExportJob.objects.get(pk=job_id)
+        try:
+            renderer = import_string(EXPORT_RENDERERS[(job.resource, job.file_format)])
+            response = renderer(job.parameters or {})
+            if response.status_code >= 400:
+                raise ValueError(response_error(response))
+            ExportJob.objects.filter(pk=job_id).update(progress=70)
+            try:
+                job.file.save(export_filename(job, response), response_file(response), save=False)
+            finally:
+                response.close()
+        except Exception as e:
+            finished = timezone.now()
+            ExportJob.objects.filter(pk=job_id).update(
+                status='failed',
+                error=str(e) or e.__class__.__name__,
+                finished_at=finished,
+                expires_at=finished + timedelta(hours=settings.EXPORT_RETENTION_HOURS),
+            )
+            return
+
+        finished = timezone.now()
+        job.file_size = job.file.size
+        job.status = 'completed'
+        job.progress = 100
+        job.finished_at = finished
+        job.expires_at = finished + timedelta(hours=settings.EXPORT_RETENTION_HOURS)
+        job.save(update_fields=['file', 'file_size', 'status', 'progress', 'finished_at', 'expires_at'])
+    finally:
+        close_old_connections()
+
+
+def pending_export_ids(limit, exclude=()):
+    """Id các job đang chờ, cũ nhất trước"""
+    return list(
+        ExportJob.objects.filter(status='pending')
+        .exclude(pk__in=list(exclude))
+        .order_by('created_at')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def requeue_stale_exports(older_than):
+    """Đưa các job running quá lâu (worker bị dừng giữa chừng) về pending"""
+    cutoff = timezone.now() - older_than
+    return ExportJob.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='pending', progress=0, started_at=None,
+    )
+
+
+def delete_expired_exports(now=None):
+    """Xoá file và bản ghi của các job đã hết hạn; trả về số job đã xoá"""
+    now = now or timezone.now()
+    deleted = 0
+    for job in ExportJob.objects.filter(expires_at__lt=now).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
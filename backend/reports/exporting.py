@@ -0,0 +1,46 @@
+"""Xuất Excel dạng streaming dùng chung cho các endpoint export.
+
+Workbook được tạo ở chế độ write-only của openpyxl: mỗi dòng được ghi ngay
+xuống file tạm của sheet thay vì giữ cả bảng ô trong bộ nhớ. Dữ liệu đọc từ
+`queryset.iterator(chunk_size=...)`, file kết quả nằm trong một
+SpooledTemporaryFile (tràn ra đĩa khi lớn) và được gửi đi theo từng khối
+bằng FileResponse, nên bộ nhớ không tăng theo số dòng.
+"""
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_CHUNK_SIZE = 2000
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+def iter_rows(queryset, build_row, chunk_size=EXPORT_CHUNK_SIZE):
+    """Duyệt queryset theo từng lô và trả về từng dòng `build_row(obj)`"""
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield build_row(obj)
+
+
+def write_xlsx(output, sheets):
+    """Ghi các sheet (title, headers, rows) vào file `output` đang mở.
+
+    `rows` có thể là generator; các dòng được ghi lần lượt và không được giữ lại.
+    """
+    wb = Workbook(write_only=True)
+    for title, headers, rows in sheets:
+        ws = wb.create_sheet(title=title)
+        if headers:
+            ws.append(headers)
+        for row in rows:
+            ws.append(row)
+    wb.save(output)
+    return output
+
+
+def xlsx_response(filename, sheets):
+    """FileResponse tải về file Excel `filename` gồm các sheet đã cho"""
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    write_xlsx(output, sheets)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
@@ -0,0 +1,76 @@
+"""Xử lý báo cáo nền cho GeneratedReport ở trạng thái `pending`.
+
+Endpoint `generate/` với mode='job' chỉ tạo bản ghi pending; lệnh
+`run_report_worker` lấy các bản ghi này và tính toán bằng một thread pool
+trong cùng tiến trình, không cần broker bên ngoài.
+"""
+import time
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import GeneratedReport
+
+
+def claim_report(report_id):
+    """Chuyển báo cáo từ pending sang running; False nếu worker khác đã nhận"""
+    return GeneratedReport.objects.filter(pk=report_id, status='pending').update(
+        status='running', progress=10, started_at=timezone.now(), error=None,
+    ) == 1
+
+
+def run_report_job(report_id):
+    """Tính một báo cáo đã được nhận và ghi kết quả, trạng thái, thời gian xử lý"""
+    from .cache import report_cache_key
+    from .views import build_report
+
+    close_old_connections()
+    try:
+        if not claim_report(report_id):
+            return
+        report = GeneratedReport.objects.get(pk=report_id)
+        started = time.perf_counter()
+        try:
+            # Khoá tính tại thời điểm chạy, ứng với dữ liệu mà báo cáo thực sự đọc
+            cache_key = report_cache_key(report.report_type, report.start_date,
+                                         report.end_date, report.parameters or {})
+            data, summary = build_report(report.report_type, report.start_date,
+                                         report.end_date, report.parameters or {})
+        except Exception as e:
+            GeneratedReport.objects.filter(pk=report_id).update(
+                status='failed',
+                error=str(e),
+                finished_at=timezone.now(),
+                duration_ms=int((time.perf_counter() - started) * 1000),
+            )
+            return
+
+        report.data = data
+        report.summary = summary
+        report.cache_key = cache_key
+        report.status = 'completed'
+        report.progress = 100
+        report.finished_at = timezone.now()
+        report.duration_ms = int((time.perf_counter() - started) * 1000)
+        report.save(update_fields=['data', 'summary', 'cache_key', 'status', 'progress',
+                                   'finished_at', 'duration_ms'])
+    finally:
+        close_old_connections()
+
+
+def pending_report_ids(limit, exclude=()):
+    """Id các báo cáo đang chờ, cũ nhất trước"""
+    return list(
+        GeneratedReport.objects.filter(status='pending')
+        .exclude(pk__in=list(exclude))
+        .order_by('generated_at')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def requeue_stale_reports(older_than):
+    """Đưa các báo cáo running quá lâu (worker bị dừng giữa chừng) về pending"""
+    cutoff = timezone.now() - older_than
+    return GeneratedReport.objects.filter(status='running', started_at__lt=cutoff).update(
+        status='pending', progress=0, started_at=None,
+    )
@@ -0,0 +1,60 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from reports.export_jobs import (delete_expired_exports, pending_export_ids,
+                                 requeue_stale_exports, run_export_job)
+
+
+class Command(BaseCommand):
+    help = 'Chạy worker render file export nền (ExportJob.status = pending) và dọn các file đã hết hạn'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Số thread xử lý song song (mặc định 2)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Số giây giữa hai lần kiểm tra hàng đợi (mặc định 2)')
+        parser.add_argument('--stale-after', type=int, default=30,
+                            help='Số phút trước khi job running bị coi là treo và đưa lại hàng đợi')
+        parser.add_argument('--cleanup-interval', type=int, default=600,
+                            help='Số giây giữa hai lần xoá file export hết hạn (mặc định 600)')
+        parser.add_argument('--once', action='store_true', default=False,
+                            help='Xử lý hết hàng đợi hiện tại rồi thoát')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+
+        requeued = requeue_stale_exports(timedelta(minutes=options['stale_after']))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Đưa lại {requeued} job export bị treo vào hàng đợi'))
+
+        self.stdout.write(f'Export worker đang chạy với {workers} thread')
+        in_flight = {}
+        last_cleanup = None
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    if last_cleanup is None or time.monotonic() - last_cleanup >= options['cleanup_interval']:
+                        deleted = delete_expired_exports()
+                        if deleted:
+                            self.stdout.write(f'  Đã xoá {deleted} file export hết hạn')
+                        last_cleanup = time.monotonic()
+
+                    for job_id, future in list(in_flight.items()):
+                        if future.done():
+                            del in_flight[job_id]
+                            self.stdout.write(f'  Export {job_id} đã xử lý xong')
+
+                    free_slots = workers - len(in_flight)
+                    queued = pending_export_ids(free_slots, exclude=in_flight.keys()) if free_slots > 0 else []
+                    for job_id in queued:
+                        in_flight[job_id] = pool.submit(run_export_job, job_id)
+
+                    if options['once'] and not queued and not in_flight:
+                        break
+                    time.sleep(poll_interval if not queued else 0.1)
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('Đang dừng worker, chờ các export đang xử lý...'))
+
+        self.stdout.write(self.style.SUCCESS('Export worker đã dừng'))
@@ -0,0 +1,50 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from reports.jobs import pending_report_ids, requeue_stale_reports, run_report_job
+
+
+class Command(BaseCommand):
+    help = 'Chạy worker xử lý các báo cáo được tạo ở chế độ job (GeneratedReport.status = pending)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Số thread xử lý song song (mặc định 2)')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Số giây giữa hai lần kiểm tra hàng đợi (mặc định 2)')
+        parser.add_argument('--stale-after', type=int, default=30,
+                            help='Số phút trước khi báo cáo running bị coi là treo và đưa lại hàng đợi')
+        parser.add_argument('--once', action='store_true', default=False,
+                            help='Xử lý hết hàng đợi hiện tại rồi thoát')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+
+        requeued = requeue_stale_reports(timedelta(minutes=options['stale_after']))
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Đưa lại {requeued} báo cáo bị treo vào hàng đợi'))
+
+        self.stdout.write(f'Report worker đang chạy với {workers} thread')
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    for report_id, future in list(in_flight.items()):
+                        if future.done():
+                            del in_flight[report_id]
+                            self.stdout.write(f'  Báo cáo {report_id} đã xử lý xong')
+
+                    free_slots = workers - len(in_flight)
+                    queued = pending_report_ids(free_slots, exclude=in_flight.keys()) if free_slots > 0 else []
+                    for report_id in queued:
+                        in_flight[report_id] = pool.submit(run_report_job, report_id)
+
+                    if options['once'] and not queued and not in_flight:
+                        break
+                    time.sleep(poll_interval if not queued else 0.1)
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('Đang dừng worker, chờ các báo cáo đang xử lý...'))
+
+        self.stdout.write(self.style.SUCCESS('Report worker đã dừng'))
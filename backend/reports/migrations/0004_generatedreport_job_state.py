@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:25
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0003_generatedreport_template_nullable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedreport',
+            name='duration_ms',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Thời gian xử lý (ms)'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='error',
+            field=models.TextField(blank=True, null=True, verbose_name='Lỗi'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Hoàn thành lúc'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='parameters',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Tham số'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=100, verbose_name='Tiến độ (%)'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='report_type',
+            field=models.CharField(blank=True, choices=[('revenue', 'Báo cáo doanh thu'), ('expense', 'Báo cáo chi phí'), ('appointment', 'Báo cáo lịch hẹn'), ('customer', 'Báo cáo khách hàng'), ('service', 'Báo cáo dịch vụ'), ('doctor', 'Báo cáo bác sĩ'), ('branch', 'Báo cáo chi nhánh')], default='', max_length=20, verbose_name='Loại báo cáo'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu xử lý'),
+        ),
+        migrations.AddField(
+            model_name='generatedreport',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Đang chờ'), ('running', 'Đang xử lý'), ('completed', 'Hoàn thành'), ('failed', 'Lỗi')], default='completed', max_length=20, verbose_name='Trạng thái'),
+        ),
+        migrations.AlterField(
+            model_name='generatedreport',
+            name='data',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dữ liệu báo cáo'),
+        ),
+        migrations.AlterField(
+            model_name='generatedreport',
+            name='summary',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Tóm tắt'),
+        ),
+        migrations.AddIndex(
+            model_name='generatedreport',
+            index=models.Index(fields=['status', 'generated_at'], name='reports_gen_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0004_generatedreport_job_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generatedreport',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='Khoá cache'),
+        ),
+    ]
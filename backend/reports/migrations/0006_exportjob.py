@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-16 22:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('reports', '0005_generatedreport_cache_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(choices=[('appointments', 'Lịch hẹn'), ('customers', 'Khách hàng'), ('payments', 'Thanh toán'), ('expenses', 'Chi phí'), ('generated_report', 'Báo cáo đã tạo')], max_length=30, verbose_name='Dữ liệu')),
+                ('file_format', models.CharField(choices=[('xlsx', 'Excel'), ('pdf', 'PDF')], max_length=10, verbose_name='Định dạng')),
+                ('parameters', models.JSONField(blank=True, default=dict, verbose_name='Tham số')),
+                ('status', models.CharField(choices=[('pending', 'Đang chờ'), ('running', 'Đang xử lý'), ('completed', 'Hoàn thành'), ('failed', 'Lỗi')], default='pending', max_length=20, verbose_name='Trạng thái')),
+                ('progress', models.PositiveSmallIntegerField(default=0, verbose_name='Tiến độ (%)')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Lỗi')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu xử lý')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Hoàn thành lúc')),
+                ('file', models.FileField(blank=True, upload_to='exports/', verbose_name='File')),
+                ('file_size', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Dung lượng (byte)')),
+                ('expires_at', models.DateTimeField(blank=True, null=True, verbose_name='Hết hạn lúc')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Tạo bởi')),
+            ],
+            options={
+                'verbose_name': 'File export',
+                'verbose_name_plural': 'File export',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='reports_export_status_idx'), models.Index(fields=['expires_at'], name='reports_export_expires_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth import get_user_model
 from customers.models import Branch, Service
 from financials.models import Payment, Expense
@@ -40,7 +41,14 @@ class ReportTemplate(models.Model):
 
 class GeneratedReport(models.Model):
     """Báo cáo đã tạo"""
-    template = models.ForeignKey(ReportTemplate, on_delete=models.CASCADE, 
+    STATUS_CHOICES = [
+        ('pending', 'Đang chờ'),
+        ('running', 'Đang xử lý'),
+        ('completed', 'Hoàn thành'),
+        ('failed', 'Lỗi'),
+    ]
+    
+    template = models.ForeignKey(ReportTemplate, on_delete=models.CASCADE, null=True, blank=True,
                                verbose_name="Mẫu báo cáo")
     title = models.CharField(max_length=200, verbose_name="Tiêu đề")
     description = models.TextField(blank=True, null=True, verbose_name="Mô tả")
@@ -49,9 +57,26 @@ class GeneratedReport(models.Model):
     start_date = models.DateField(verbose_name="Từ ngày")
     end_date = models.DateField(verbose_name="Đến ngày")
     
+    # Tham số báo cáo (dùng khi tạo báo cáo nền)
+    report_type = models.CharField(max_length=20, choices=ReportTemplate.REPORT_TYPE_CHOICES,
+                                   blank=True, default='', verbose_name="Loại báo cáo")
+    parameters = models.JSONField(default=dict, blank=True, verbose_name="Tham số")
+    # Khoá cache: tham số báo cáo + phiên bản dữ liệu nguồn (xem reports/cache.py)
+    cache_key = models.CharField(max_length=64, blank=True, default='', db_index=True,
+                                 verbose_name="Khoá cache")
+    
     # Dữ liệu báo cáo
-    data = models.JSONField(default=dict, verbose_name="Dữ liệu báo cáo")
-    summary = models.JSONField(default=dict, verbose_name="Tóm tắt")
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Dữ liệu báo cáo")
+    summary = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Tóm tắt")
+    
+    # Trạng thái xử lý
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='completed',
+                              verbose_name="Trạng thái")
+    progress = models.PositiveSmallIntegerField(default=100, verbose_name="Tiến độ (%)")
+    error = models.TextField(blank=True, null=True, verbose_name="Lỗi")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Bắt đầu xử lý")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Hoàn thành lúc")
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name="Thời gian xử lý (ms)")
     
     # Thông tin hệ thống
     generated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, 
@@ -62,11 +87,64 @@ class GeneratedReport(models.Model):
         verbose_name = "Báo cáo đã tạo"
         verbose_name_plural = "Báo cáo đã tạo"
         ordering = ['-generated_at']
+        indexes = [
+            models.Index(fields=['status', 'generated_at'], name='reports_gen_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.title} - {self.start_date} đến {self.end_date}"
 
 
+class ExportJob(models.Model):
+    """File export chạy nền (Excel/PDF), lưu trong MEDIA_ROOT/exports/"""
+    RESOURCE_CHOICES = [
+        ('appointments', 'Lịch hẹn'),
+        ('customers', 'Khách hàng'),
+        ('payments', 'Thanh toán'),
+        ('expenses', 'Chi phí'),
+        ('generated_report', 'Báo cáo đã tạo'),
+    ]
+    FORMAT_CHOICES = [
+        ('xlsx', 'Excel'),
+        ('pdf', 'PDF'),
+    ]
+    
+    resource = models.CharField(max_length=30, choices=RESOURCE_CHOICES, verbose_name="Dữ liệu")
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name="Định dạng")
+    # Cùng tham số lọc với endpoint export tương ứng (branch, date_from, ... hoặc report_id)
+    parameters = models.JSONField(default=dict, blank=True, verbose_name="Tham số")
+    
+    # Trạng thái xử lý
+    status = models.CharField(max_length=20, choices=GeneratedReport.STATUS_CHOICES, default='pending',
+                              verbose_name="Trạng thái")
+    progress = models.PositiveSmallIntegerField(default=0, verbose_name="Tiến độ (%)")
+    error = models.TextField(blank=True, null=True, verbose_name="Lỗi")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Bắt đầu xử lý")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Hoàn thành lúc")
+    
+    # File kết quả
+    file = models.FileField(upload_to='exports/', blank=True, verbose_name="File")
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, verbose_name="Dung lượng (byte)")
+    expires_at = models.DateTimeField(null=True, blank=True, verbose_name="Hết hạn lúc")
+    
+    # Thông tin hệ thống
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True,
+                                   verbose_name="Tạo bởi")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "File export"
+        verbose_name_plural = "File export"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='reports_export_status_idx'),
+            models.Index(fields=['expires_at'], name='reports_export_expires_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_resource_display()} ({self.file_format}) - {self.get_status_display()}"
+
+
 class DashboardWidget(models.Model):
     """Widget cho dashboard"""
     WIDGET_TYPE_CHOICES = [
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import ReportTemplate, GeneratedReport, DashboardWidget
+from django.urls import reverse
+from .models import ReportTemplate, GeneratedReport, DashboardWidget, ExportJob
 
 
 class ReportTemplateSerializer(serializers.ModelSerializer):
@@ -20,13 +21,52 @@ class GeneratedReportSerializer(serializers.ModelSerializer):
     start_date = serializers.DateField(format='%d/%m/%Y')
     end_date = serializers.DateField(format='%d/%m/%Y')
     generated_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M', read_only=True)
+    started_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M:%S', read_only=True)
+    finished_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M:%S', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
     
     class Meta:
         model = GeneratedReport
         fields = ['id', 'template', 'template_name', 'title', 'description', 
-                 'start_date', 'end_date', 'data', 'summary', 'generated_by', 
-                 'generated_by_name', 'generated_at']
-        read_only_fields = ['generated_at']
+                 'start_date', 'end_date', 'report_type', 'parameters', 'data', 'summary',
+                 'status', 'status_display', 'progress', 'error', 'started_at', 'finished_at',
+                 'duration_ms', 'generated_by', 'generated_by_name', 'generated_at']
+        read_only_fields = ['generated_at', 'status', 'progress', 'error', 'started_at',
+                            'finished_at', 'duration_ms']
+
+
+class ExportJobSerializer(serializers.ModelSerializer):
+    created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
+    created_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M', read_only=True)
+    started_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M:%S', read_only=True)
+    finished_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M:%S', read_only=True)
+    expires_at = serializers.DateTimeField(format='%d/%m/%Y %H:%M', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ExportJob
+        fields = ['id', 'resource', 'file_format', 'parameters', 'status', 'status_display', 'progress',
+                 'error', 'file_size', 'download_url', 'started_at', 'finished_at', 'expires_at',
+                 'created_by', 'created_by_name', 'created_at']
+        read_only_fields = ['status', 'progress', 'error', 'file_size', 'created_by']
+    
+    def get_download_url(self, obj):
+        if obj.status != 'completed' or not obj.file:
+            return None
+        url = reverse('export-job-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+    
+    def validate_parameters(self, value):
+        if not isinstance(value, dict):
+            raise serializers.ValidationError('Tham số phải là một object')
+        return value
+    
+    def validate(self, attrs):
+        if attrs.get('resource') == 'generated_report' and not attrs.get('parameters', {}).get('report_id'):
+            raise serializers.ValidationError({'parameters': 'Cần report_id để export báo cáo đã tạo'})
+        return attrs
 
 
 class DashboardWidgetSerializer(serializers.ModelSerializer):
@@ -51,3 +91,7 @@ class ReportDataSerializer(serializers.Serializer):
     service_id = serializers.IntegerField(required=False, allow_null=True)
     group_by = serializers.CharField(required=False, allow_null=True)
     filters = serializers.JSONField(required=False, default=dict)
+    # 'job' queues the report for the background worker instead of computing it in the request
+    mode = serializers.ChoiceField(choices=['sync', 'job'], required=False, default='sync')
+    # False forces a fresh computation even if an identical report is cached
+    use_cache = serializers.BooleanField(required=False, default=True)
@@ -13,6 +13,11 @@ urlpatterns = [
     path('generated/<int:pk>/export/xlsx/', views.export_generated_report_excel, name='export-generated-report-excel'),
     path('generated/<int:pk>/export/pdf/', views.export_generated_report_pdf, name='export-generated-report-pdf'),
     
+    # Background exports
+    path('exports/', views.ExportJobListCreateView.as_view(), name='export-job-list-create'),
+    path('exports/<int:pk>/', views.ExportJobDetailView.as_view(), name='export-job-detail'),
+    path('exports/<int:pk>/download/', views.download_export_job, name='export-job-download'),
+    
     # Dashboard Widgets
     path('widgets/', views.DashboardWidgetListCreateView.as_view(), name='dashboard-widget-list-create'),
     path('widgets/<int:pk>/', views.DashboardWidgetDetailView.as_view(), name='dashboard-widget-detail'),
@@ -2,21 +2,26 @@ from rest_framework import generics, status, permissions, filters
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import connection
 from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import datetime, date, timedelta
-from .models import ReportTemplate, GeneratedReport, DashboardWidget
+from .models import ReportTemplate, GeneratedReport, DashboardWidget, ExportJob
+from .cache import report_cache_key, find_cached_report
 from .serializers import (ReportTemplateSerializer, GeneratedReportSerializer, 
-                         DashboardWidgetSerializer, ReportDataSerializer)
+                         DashboardWidgetSerializer, ReportDataSerializer, ExportJobSerializer)
 from customers.models import Customer, Service, Branch
 from appointments.models import Appointment
 from appointments.serializers import AppointmentListSerializer
 from financials.models import Payment, Expense
+from financials.allocation import service_revenue_totals
+from financials.rollups import summarize
 from financials.serializers import PaymentListSerializer
 from users.models import User
-from django.http import HttpResponse
+from django.http import HttpResponse, FileResponse
 import io
-from openpyxl import Workbook
+import time
+from .exporting import xlsx_response
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
 
@@ -46,7 +51,7 @@ class GeneratedReportListCreateView(generics.ListCreateAPIView):
     serializer_class = GeneratedReportSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['template__report_type', 'start_date', 'end_date']
+    filterset_fields = ['template__report_type', 'report_type', 'status', 'start_date', 'end_date']
     search_fields = ['title', 'description']
     ordering_fields = ['generated_at', 'start_date', 'end_date']
     ordering = ['-generated_at']
@@ -59,6 +64,54 @@ class GeneratedReportDetailView(generics.RetrieveDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
+class ExportJobListCreateView(generics.ListCreateAPIView):
+    """List export jobs and queue a new one for the export worker (run_export_worker)"""
+    queryset = ExportJob.objects.select_related('created_by')
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = ['resource', 'file_format', 'status', 'created_by']
+    ordering_fields = ['created_at', 'finished_at']
+    ordering = ['-created_at']
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(created_by=request.user, status='pending', progress=0)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+
+class ExportJobDetailView(generics.RetrieveDestroyAPIView):
+    """Retrieve an export job (status, progress, download URL) or delete it with its file"""
+    queryset = ExportJob.objects.select_related('created_by')
+    serializer_class = ExportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def perform_destroy(self, instance):
+        if instance.file:
+            instance.file.delete(save=False)
+        instance.delete()
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_export_job(request, pk):
+    """Download the file rendered by a completed export job"""
+    try:
+        job = ExportJob.objects.get(pk=pk)
+    except ExportJob.DoesNotExist:
+        return Response({'error': 'Export not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if job.status != 'completed' or not job.file:
+        return Response({'error': 'File export chưa sẵn sàng', 'status': job.status},
+                        status=status.HTTP_409_CONFLICT)
+    if job.expires_at and job.expires_at < timezone.now():
+        return Response({'error': 'File export đã hết hạn'}, status=status.HTTP_410_GONE)
+    
+    filename = job.file.name.rsplit('/', 1)[-1].split('_', 1)[-1]
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename)
+
+
 class DashboardWidgetListCreateView(generics.ListCreateAPIView):
     """List and create dashboard widgets"""
     queryset = DashboardWidget.objects.all()
@@ -78,6 +131,17 @@ class DashboardWidgetDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
 
+class QueryCounter:
+    """Execute wrapper counting the SQL queries run while generating a report"""
+    
+    def __init__(self):
+        self.count = 0
+    
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def generate_report(request):
@@ -98,10 +162,66 @@ def generate_report(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    branch_id = data.get('branch_id')
-    doctor_id = data.get('doctor_id')
-    service_id = data.get('service_id')
-    group_by = data.get('group_by')
+    parameters = {
+        'branch_id': data.get('branch_id'),
+        'doctor_id': data.get('doctor_id'),
+        'service_id': data.get('service_id'),
+        'group_by': data.get('group_by'),
+    }
+    report_fields = {
+        'template': None,  # Can be linked to template if needed
+        'title': f"{report_type.title()} Report - {start_date} to {end_date}",
+        'description': f"Generated report for {report_type} from {start_date} to {end_date}",
+        'start_date': start_date,
+        'end_date': end_date,
+        'report_type': report_type,
+        'parameters': parameters,
+        'generated_by': request.user,
+    }
+    
+    # Same parameters and unchanged source data: return the stored result
+    cache_key = report_cache_key(report_type, start_date, end_date, parameters)
+    report_fields['cache_key'] = cache_key
+    if data.get('use_cache', True):
+        cached_report = find_cached_report(cache_key)
+        if cached_report is not None:
+            response = Response(GeneratedReportSerializer(cached_report).data)
+            response['X-Report-Cache'] = 'hit'
+            return response
+    
+    # Job mode: queue the report for the worker (run_report_worker) and return immediately
+    if data.get('mode') == 'job':
+        queued_report = GeneratedReport.objects.filter(
+            cache_key=cache_key, status__in=['pending', 'running']
+        ).order_by('-generated_at').first()
+        if queued_report is None:
+            queued_report = GeneratedReport.objects.create(status='pending', progress=0, **report_fields)
+        return Response(GeneratedReportSerializer(queued_report).data, status=status.HTTP_202_ACCEPTED)
+    
+    report_data, summary = build_report(report_type, start_date, end_date, parameters)
+    
+    # Create generated report record
+    generated_report = GeneratedReport.objects.create(
+        data=report_data,
+        summary=summary,
+        duration_ms=int(summary['meta']['elapsed_ms']),
+        **report_fields
+    )
+    
+    response = Response(GeneratedReportSerializer(generated_report).data)
+    response['X-Report-Cache'] = 'miss'
+    return response
+
+
+def build_report(report_type, start_date, end_date, parameters):
+    """Compute report data and summary for the given parameters
+
+    Shared by the synchronous endpoint and the background report worker.
+    """
+    branch_id = parameters.get('branch_id')
+    doctor_id = parameters.get('doctor_id')
+    service_id = parameters.get('service_id')
+    group_by = parameters.get('group_by')
     
     # Build base queryset
     base_filters = Q(created_at__date__range=[start_date, end_date])
@@ -113,35 +233,31 @@ def generate_report(request):
         base_filters &= Q(service_id=service_id)
     
     report_data = {}
+    query_counter = QueryCounter()
+    started = time.perf_counter()
     
-    if report_type == 'revenue':
-        report_data = generate_revenue_report(base_filters, group_by)
-    elif report_type == 'expense':
-        report_data = generate_expense_report(base_filters, group_by)
-    elif report_type == 'appointment':
-        report_data = generate_appointment_report(base_filters, group_by)
-    elif report_type == 'customer':
-        report_data = generate_customer_report(base_filters, group_by)
-    elif report_type == 'service':
-        report_data = generate_service_report(base_filters, group_by)
-    elif report_type == 'doctor':
-        report_data = generate_doctor_report(base_filters, group_by)
-    elif report_type == 'branch':
-        report_data = generate_branch_report(base_filters, group_by)
-    
-    # Create generated report record
-    generated_report = GeneratedReport.objects.create(
-        template=None,  # Can be linked to template if needed
-        title=f"{report_type.title()} Report - {start_date} to {end_date}",
-        description=f"Generated report for {report_type} from {start_date} to {end_date}",
-        start_date=start_date,
-        end_date=end_date,
-        data=report_data,
-        summary=generate_summary(report_data),
-        generated_by=request.user
-    )
+    with connection.execute_wrapper(query_counter):
+        if report_type == 'revenue':
+            report_data = generate_revenue_report(base_filters, group_by)
+        elif report_type == 'expense':
+            report_data = generate_expense_report(base_filters, group_by)
+        elif report_type == 'appointment':
+            report_data = generate_appointment_report(base_filters, group_by)
+        elif report_type == 'customer':
+            report_data = generate_customer_report(base_filters, group_by)
+        elif report_type == 'service':
+            report_data = generate_service_report(base_filters, group_by)
+        elif report_type == 'doctor':
+            report_data = generate_doctor_report(base_filters, group_by)
+        elif report_type == 'branch':
+            report_data = generate_branch_report(base_filters, group_by)
     
-    return Response(GeneratedReportSerializer(generated_report).data)
+    summary = generate_summary(report_data)
+    summary['meta'] = {
+        'query_count': query_counter.count,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+    }
+    return report_data, summary
 
 
 def generate_revenue_report(filters, group_by):
@@ -149,37 +265,17 @@ def generate_revenue_report(filters, group_by):
     payments = Payment.objects.filter(filters)
     
     if group_by == 'service':
-        # Sửa logic để tính chính xác theo từng service
-        from customers.models import Service
-        services = Service.objects.all()
+        # Doanh thu đã phân bổ sẵn trong PaymentLine
+        allocation = service_revenue_totals(payments)
         data = []
         
-        for service in services:
-            payments_with_service = payments.filter(services=service).prefetch_related('services')
-            
-            total_service_amount = 0
-            paid_service_amount = 0
-            
-            for payment in payments_with_service:
-                # Tính tỷ lệ của service này trong payment dựa trên giá của từng service
-                payment_services = payment.services.all()
-                total_service_price = sum(s.price for s in payment_services)
-                
-                if total_service_price > 0:
-                    # Tính tỷ lệ của service này trong payment
-                    service_ratio = service.price / total_service_price
-                    
-                    # Tính số tiền tương ứng với service này
-                    service_amount = payment.amount * service_ratio
-                    
-                    total_service_amount += service_amount
-                    paid_service_amount += service_amount  # All payments are complete now
-            
+        for service in Service.objects.all().only('id', 'name'):
+            service_allocation = allocation.get(service.id, {'amount': 0, 'payment_count': 0})
             data.append({
                 'service__name': service.name,
-                'total_amount': total_service_amount,
-                'paid_amount': paid_service_amount,
-                'count': payments_with_service.count()
+                'total_amount': service_allocation['amount'],
+                'paid_amount': service_allocation['amount'],  # All payments are complete now
+                'count': service_allocation['payment_count']
             })
         
         data.sort(key=lambda x: x['total_amount'], reverse=True)
@@ -262,80 +358,104 @@ def generate_customer_report(filters, group_by):
 
 def generate_service_report(filters, group_by):
     """Generate service report"""
-    from customers.models import Service
-    services = Service.objects.all()
+    allocation = service_revenue_totals(Payment.objects.filter(filters))
+    appointment_counts = dict(
+        Appointment.services.through.objects
+        .filter(appointment__in=Appointment.objects.filter(filters))
+        .values('service_id')
+        .annotate(count=Count('appointment_id'))
+        .values_list('service_id', 'count')
+    )
     data = []
     
-    for service in services:
-        # Sửa logic để tính chính xác theo từng service
-        appointments = Appointment.objects.filter(services=service, **filters)
-        payments_with_service = Payment.objects.filter(services=service, **filters).prefetch_related('services')
-        
-        total_service_amount = 0
-        paid_service_amount = 0
-        
-        for payment in payments_with_service:
-            # Tính tỷ lệ của service này trong payment dựa trên giá của từng service
-            payment_services = payment.services.all()
-            total_service_price = sum(s.price for s in payment_services)
-            
-            if total_service_price > 0:
-                # Tính tỷ lệ của service này trong payment
-                service_ratio = service.price / total_service_price
-                
-                # Tính số tiền tương ứng với service này
-                service_amount = payment.amount * service_ratio
-                
-                total_service_amount += service_amount
-                paid_service_amount += service_amount  # All payments are complete now
-        
+    for service in Service.objects.all().only('id', 'name'):
+        service_amount = allocation.get(service.id, {}).get('amount', 0)
         data.append({
             'service_name': service.name,
-            'appointment_count': appointments.count(),
-            'total_revenue': total_service_amount,
-            'paid_revenue': paid_service_amount
+            'appointment_count': appointment_counts.get(service.id, 0),
+            'total_revenue': service_amount,
+            'paid_revenue': service_amount  # All payments are complete now
         })
     
     return data
 
 
 def generate_doctor_report(filters, group_by):
-    """Generate doctor report"""
-    doctors = User.objects.filter(role='doctor')
-    data = []
+    """Generate doctor report
+
+    Doctors are resolved through the `doctor` group. Payments are not linked
+    to appointments, so a doctor's revenue is the service value of their
+    completed appointments. Runs three queries regardless of doctor count.
+    """
+    doctors = User.objects.filter(groups__name='doctor').distinct().only('id', 'first_name', 'last_name')
+    appointments = Appointment.objects.filter(filters)
     
+    appointment_stats = {
+        row['doctor_id']: row
+        for row in appointments.values('doctor_id').annotate(
+            count=Count('id'),
+            completed=Count('id', filter=Q(status='completed')),
+            no_show=Count('id', filter=Q(status='no_show')),
+        ).order_by()
+    }
+    revenue_by_doctor = dict(
+        Appointment.services.through.objects
+        .filter(appointment__in=appointments.filter(status='completed'))
+        .values('appointment__doctor_id')
+        .annotate(total=Sum('service__price'))
+        .order_by()
+        .values_list('appointment__doctor_id', 'total')
+    )
+    
+    data = []
+    empty = {'count': 0, 'completed': 0, 'no_show': 0}
     for doctor in doctors:
-        appointments = Appointment.objects.filter(doctor=doctor, **filters)
-        payments = Payment.objects.filter(appointment__doctor=doctor, **filters)
-        
+        stats = appointment_stats.get(doctor.id, empty)
+        count = stats['count']
+        revenue = int(revenue_by_doctor.get(doctor.id) or 0)
         data.append({
             'doctor_name': doctor.get_full_name(),
-            'appointment_count': appointments.count(),
-            'total_revenue': payments.aggregate(total=Sum('amount'))['total'] or 0,
-            'paid_revenue': payments.aggregate(total=Sum('amount'))['total'] or 0  # paid_amount = amount since all payments are complete
+            'appointment_count': count,
+            'completed_count': stats['completed'],
+            'no_show_count': stats['no_show'],
+            'completed_rate': round(stats['completed'] / count, 4) if count else 0,
+            'no_show_rate': round(stats['no_show'] / count, 4) if count else 0,
+            'total_revenue': revenue,
+            'paid_revenue': revenue  # paid_amount = amount since all payments are complete
         })
     
+    data.sort(key=lambda x: x['total_revenue'], reverse=True)
     return data
 
 
+def _group_by_branch(queryset, **aggregates):
+    """Run one GROUP BY branch_id query and index the rows by branch id"""
+    rows = queryset.values('branch_id').annotate(**aggregates).order_by()
+    return {row['branch_id']: row for row in rows}
+
+
 def generate_branch_report(filters, group_by):
-    """Generate branch report"""
-    branches = Branch.objects.all()
-    data = []
+    """Generate branch report
+
+    One grouped query per source table, merged in Python, so the number of
+    queries does not depend on the number of branches.
+    """
+    customers = _group_by_branch(Customer.objects.filter(filters), count=Count('id'))
+    appointments = _group_by_branch(Appointment.objects.filter(filters), count=Count('id'))
+    payments = _group_by_branch(Payment.objects.filter(filters), total=Sum('amount'))
+    expenses = _group_by_branch(Expense.objects.filter(filters), total=Sum('amount'))
     
-    for branch in branches:
-        customers = Customer.objects.filter(branch=branch, **filters)
-        appointments = Appointment.objects.filter(branch=branch, **filters)
-        payments = Payment.objects.filter(branch=branch, **filters)
-        expenses = Expense.objects.filter(branch=branch, **filters)
-        
+    data = []
+    empty = {}
+    for branch in Branch.objects.all().only('id', 'name'):
+        revenue = payments.get(branch.id, empty).get('total') or 0
         data.append({
             'branch_name': branch.name,
-            'customer_count': customers.count(),
-            'appointment_count': appointments.count(),
-            'total_revenue': payments.aggregate(total=Sum('amount'))['total'] or 0,
-            'paid_revenue': payments.aggregate(total=Sum('amount'))['total'] or 0,  # paid_amount = amount since all payments are complete
-            'total_expenses': expenses.aggregate(total=Sum('amount'))['total'] or 0
+            'customer_count': customers.get(branch.id, empty).get('count', 0),
+            'appointment_count': appointments.get(branch.id, empty).get('count', 0),
+            'total_revenue': int(revenue),
+            'paid_revenue': int(revenue),  # paid_amount = amount since all payments are complete
+            'total_expenses': int(expenses.get(branch.id, empty).get('total') or 0)
         })
     
     return data
@@ -372,25 +492,22 @@ def dashboard_data(request):
     """Get dashboard data"""
     today = timezone.now().date()
     this_month = today.replace(day=1)
+    month_totals = summarize(start_date=this_month)
     
     # Basic stats
     stats = {
         'total_customers': Customer.objects.count(),
         'total_appointments': Appointment.objects.count(),
         'today_appointments': Appointment.objects.filter(appointment_date=today).count(),
-        'this_month_revenue': Payment.objects.filter(
-            created_at__date__gte=this_month
-        ).aggregate(total=Sum('amount'))['total'] or 0,
-        'this_month_expenses': Expense.objects.filter(
-            expense_date__gte=this_month
-        ).aggregate(total=Sum('amount'))['total'] or 0,
+        'this_month_revenue': month_totals['total_revenue'],
+        'this_month_expenses': month_totals['total_expenses'],
         'pending_payments': Payment.objects.filter(
             status__in=['pending', 'partial']
         ).count(),
     }
     
     # Recent activities
-    recent_appointments = Appointment.objects.filter(
+    recent_appointments = Appointment.objects.select_related('doctor', 'branch', 'created_by', 'consultant').prefetch_related('services').filter(
         appointment_date__gte=today
     ).order_by('appointment_date', 'appointment_time')[:5]
     
@@ -409,43 +526,47 @@ def dashboard_data(request):
 @permission_classes([permissions.IsAuthenticated])
 def export_generated_report_excel(request, pk):
     try:
-        report = GeneratedReport.objects.get(pk=pk)
+        return render_generated_report_excel({'report_id': pk})
     except GeneratedReport.DoesNotExist:
         return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = 'Report'
-    ws.append([report.title])
-    ws.append([f"Từ ngày", str(report.start_date), "Đến ngày", str(report.end_date)])
-    ws.append([])
+
+def render_generated_report_excel(params):
+    """Excel of the generated report `params['report_id']`"""
+    report = GeneratedReport.objects.get(pk=params['report_id'])
+    return xlsx_response(f'report_{report.pk}.xlsx', [('Report', None, generated_report_rows(report))])
+
+
+def generated_report_rows(report):
+    """Rows of a generated report sheet: title, date range, then the data table"""
+    yield [report.title]
+    yield ["Từ ngày", str(report.start_date), "Đến ngày", str(report.end_date)]
+    yield []
 
     if isinstance(report.data, list) and report.data:
         # Write headers from keys
         headers = list(report.data[0].keys())
-        ws.append(headers)
+        yield headers
         for item in report.data:
-            ws.append([item.get(h, '') for h in headers])
+            yield [item.get(h, '') for h in headers]
     else:
-        ws.append(['data'])
-        ws.append([str(report.data)])
-
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    response = HttpResponse(output.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename=report_{pk}.xlsx'
-    return response
+        yield ['data']
+        yield [str(report.data)]
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def export_generated_report_pdf(request, pk):
     try:
-        report = GeneratedReport.objects.get(pk=pk)
+        return render_generated_report_pdf({'report_id': pk})
     except GeneratedReport.DoesNotExist:
         return Response({'error': 'Report not found'}, status=status.HTTP_404_NOT_FOUND)
 
+
+def render_generated_report_pdf(params):
+    """PDF of the generated report `params['report_id']`"""
+    report = GeneratedReport.objects.get(pk=params['report_id'])
+    pk = report.pk
     buffer = io.BytesIO()
     p = canvas.Canvas(buffer, pagesize=A4)
     width, height = A4
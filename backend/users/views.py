@@ -9,7 +9,7 @@ from .models import User
 from .serializers import UserSerializer, UserListSerializer, DoctorSerializer, ProfileSerializer, ChangePasswordSerializer
 from customers.models import Customer
 from appointments.models import Appointment
-from financials.models import Payment, Expense
+from financials.rollups import summarize
 
 
 class IsAdminOrManager(permissions.BasePermission):
@@ -150,13 +150,9 @@ def dashboard_stats(request):
     today_appointments = Appointment.objects.filter(appointment_date=today).count()
     
     # Financial stats
-    this_month_revenue = Payment.objects.filter(
-        created_at__date__gte=this_month_start
-    ).aggregate(total=Sum('amount'))['total'] or 0
-    
-    this_month_expenses = Expense.objects.filter(
-        expense_date__gte=this_month_start
-    ).aggregate(total=Sum('amount'))['total'] or 0
+    month_totals = summarize(start_date=this_month_start)
+    this_month_revenue = month_totals['total_revenue']
+    this_month_expenses = month_totals['total_expenses']
     
     # Pending payments (no pending payments since all are complete)
     pending_payments = 0
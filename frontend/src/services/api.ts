@@ -10,6 +10,7 @@ import {
   Expense,
   ReportTemplate,
   GeneratedReport,
+  ExportJob,
   LoginRequest,
   LoginResponse,
   ApiResponse,
@@ -275,6 +276,27 @@ class ApiService {
     return response.data;
   }
 
+  async importCustomers(file: File, branch: number, dryRun = false): Promise<{ rows: number; created: number; dry_run: boolean; error_count: number; errors: { row: number; field: string; value: string; message: string }[] }> {
+    const formData = new FormData();
+    formData.append('file', file);
+    formData.append('branch', String(branch));
+    formData.append('dry_run', String(dryRun));
+    const response = await this.api.post('/customers/customers/import/', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+  }
+
+  async getDuplicateCustomers(params?: { min_score?: number; limit?: number }): Promise<{ suggestions: any[]; truncated: boolean }> {
+    const response: AxiosResponse<{ suggestions: any[]; truncated: boolean }> = await this.api.get('/customers/customers/duplicates/', { params });
+    return response.data;
+  }
+
+  async lookupCustomersByPhone(phone: string): Promise<{ customers: Customer[]; appointments: Appointment[] }> {
+    const response: AxiosResponse<{ customers: Customer[]; appointments: Appointment[] }> = await this.api.get('/customers/customers/lookup-by-phone/', { params: { phone } });
+    return response.data;
+  }
+
   async exportCustomersXlsx(params?: Record<string, any>): Promise<void> {
     const response = await this.api.get(`/customers/customers/export/xlsx/`, { params, responseType: 'blob' });
     this.downloadBlob(response.data, 'customers.xlsx');
@@ -301,6 +323,14 @@ class ApiService {
     return response.data;
   }
 
+  async bulkCreateAppointments(
+    appointments: AppointmentFormData[],
+    recurrence?: { every_weeks: number; occurrences: number }
+  ): Promise<{ count: number; appointments: Appointment[] }> {
+    const response = await this.api.post('/appointments/appointments/bulk/', { appointments, recurrence });
+    return response.data;
+  }
+
   async updateAppointment(id: number, appointment: AppointmentFormData & { status?: Appointment['status'] }): Promise<Appointment> {
     const response: AxiosResponse<Appointment> = await this.api.patch(`/appointments/appointments/${id}/`, appointment);
     return response.data;
@@ -325,11 +355,69 @@ class ApiService {
     return response.data;
   }
 
+  // Incremental calendar polling: pass the state returned by the previous call to receive only changes
+  async syncAppointmentCalendar(
+    params: Record<string, any>,
+    state?: { etag: string; cursor: string; appointments: Appointment[] }
+  ): Promise<{ etag: string; cursor: string; appointments: Appointment[] }> {
+    const response = await this.api.get('/appointments/appointments/calendar/', {
+      params: state ? { ...params, updated_since: state.cursor } : params,
+      headers: state ? { 'If-None-Match': state.etag } : undefined,
+      validateStatus: (code) => (code >= 200 && code < 300) || code === 304,
+    });
+    if (response.status === 304 && state) {
+      return state;
+    }
+    const etag = response.headers['etag'];
+    const cursor = response.headers['x-sync-cursor'];
+    if (!state) {
+      return { etag, cursor, appointments: response.data };
+    }
+    const { changed, deleted } = response.data as { changed: Appointment[]; deleted: number[] };
+    const replaced = new Set<number>([...deleted, ...changed.map(item => item.id)]);
+    return {
+      etag,
+      cursor,
+      appointments: [...state.appointments.filter(item => !replaced.has(item.id)), ...changed],
+    };
+  }
+
+  subscribeLiveBoard(
+    branchId: number,
+    handlers: {
+      onReady?: (appointments: Appointment[]) => void;
+      onEvent: (type: 'created' | 'updated' | 'status_changed' | 'deleted', appointment: Appointment) => void;
+    }
+  ): () => void {
+    // EventSource cannot send headers, so the access token goes in the query string
+    const token = localStorage.getItem('access_token') || '';
+    const url = `${this.api.defaults.baseURL}/appointments/appointments/live/${branchId}/?token=${encodeURIComponent(token)}`;
+    const source = new EventSource(url);
+    source.addEventListener('ready', (event) => {
+      handlers.onReady?.(JSON.parse((event as MessageEvent).data).appointments);
+    });
+    (['created', 'updated', 'status_changed', 'deleted'] as const).forEach(type => {
+      source.addEventListener(type, (event) => {
+        handlers.onEvent(type, JSON.parse((event as MessageEvent).data).appointment);
+      });
+    });
+    return () => source.close();
+  }
+
   async updateAppointmentStatus(id: number, status: string, notes?: string): Promise<Appointment> {
     const response: AxiosResponse<Appointment> = await this.api.post(`/appointments/appointments/${id}/status/`, { status, notes });
     return response.data;
   }
 
+  async bulkUpdateAppointmentStatus(ids: number[], status: string, notes?: string): Promise<{
+    status: string;
+    updated: Array<{ id: number; old_status: string }>;
+    unchanged: number[];
+  }> {
+    const response = await this.api.post('/appointments/appointments/bulk-status/', { ids, status, notes });
+    return response.data;
+  }
+
   async checkAppointmentAvailability(params: {
     doctor_id: number;
     appointment_date: string;
@@ -365,6 +453,32 @@ class ApiService {
     return response.data;
   }
 
+  async getFreeSlots(params: {
+    branch: number;
+    date_from: string;
+    date_to?: string;
+    duration_minutes?: number;
+    doctor_ids?: number[];
+    limit?: number;
+    step?: number;
+  }): Promise<{
+    branch: { id: number; name: string };
+    date_from: string;
+    date_to: string;
+    duration_minutes: number;
+    doctors: Array<{
+      doctor_id: number;
+      doctor_name: string;
+      slots: Array<{ date: string; time: string; end_time: string }>;
+    }>;
+  }> {
+    const { doctor_ids, ...rest } = params;
+    const response = await this.api.get('/appointments/appointments/free-slots/', {
+      params: { ...rest, doctor_ids: doctor_ids?.join(',') },
+    });
+    return response.data;
+  }
+
   async exportAppointmentsXlsx(params?: Record<string, any>): Promise<void> {
     const response = await this.api.get(`/appointments/appointments/export/xlsx/`, { params, responseType: 'blob' });
     this.downloadBlob(response.data, 'appointments.xlsx');
@@ -481,6 +595,29 @@ class ApiService {
     return response.data;
   }
 
+  async getGeneratedReport(id: number): Promise<GeneratedReport> {
+    const response: AxiosResponse<GeneratedReport> = await this.api.get(`/reports/generated/${id}/`);
+    return response.data;
+  }
+
+  // Queue the report on the server (job mode) and poll until the worker finishes it
+  async generateReportJob(
+    reportData: Record<string, any>,
+    onProgress?: (report: GeneratedReport) => void,
+    pollIntervalMs: number = 1500
+  ): Promise<GeneratedReport> {
+    let report = await this.generateReport({ ...reportData, mode: 'job' });
+    while (report.status === 'pending' || report.status === 'running') {
+      onProgress?.(report);
+      await new Promise(resolve => setTimeout(resolve, pollIntervalMs));
+      report = await this.getGeneratedReport(report.id);
+    }
+    if (report.status === 'failed') {
+      throw new Error(report.error || 'Không thể tạo báo cáo');
+    }
+    return report;
+  }
+
   async exportGeneratedReportXlsx(id: number): Promise<void> {
     const response = await this.api.get(`/reports/generated/${id}/export/xlsx/`, { responseType: 'blob' });
     this.downloadBlob(response.data, `report_${id}.xlsx`);
@@ -490,6 +627,45 @@ class ApiService {
     const response = await this.api.get(`/reports/generated/${id}/export/pdf/`, { responseType: 'blob' });
     this.downloadBlob(response.data, `report_${id}.pdf`);
   }
+
+  // Background exports: queue the file on the server, poll until ready, then download it
+  async createExportJob(
+    resource: ExportJob['resource'],
+    fileFormat: ExportJob['file_format'],
+    parameters: Record<string, any> = {}
+  ): Promise<ExportJob> {
+    const response: AxiosResponse<ExportJob> = await this.api.post('/reports/exports/', {
+      resource,
+      file_format: fileFormat,
+      parameters,
+    });
+    return response.data;
+  }
+
+  async getExportJob(id: number): Promise<ExportJob> {
+    const response: AxiosResponse<ExportJob> = await this.api.get(`/reports/exports/${id}/`);
+    return response.data;
+  }
+
+  async runExportJob(
+    resource: ExportJob['resource'],
+    fileFormat: ExportJob['file_format'],
+    parameters: Record<string, any> = {},
+    onProgress?: (job: ExportJob) => void,
+    pollIntervalMs: number = 2000
+  ): Promise<void> {
+    let job = await this.createExportJob(resource, fileFormat, parameters);
+    while (job.status === 'pending' || job.status === 'running') {
+      onProgress?.(job);
+      await new Promise(resolve => setTimeout(resolve, pollIntervalMs));
+      job = await this.getExportJob(job.id);
+    }
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Không thể xuất file');
+    }
+    const response = await this.api.get(`/reports/exports/${job.id}/download/`, { responseType: 'blob' });
+    this.downloadBlob(response.data, `${resource}.${fileFormat}`);
+  }
 }
 
 export default new ApiService();
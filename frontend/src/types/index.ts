@@ -210,13 +210,41 @@ export interface GeneratedReport {
   description?: string;
   start_date: string;
   end_date: string;
+  report_type?: string;
+  parameters?: Record<string, any>;
   data: Record<string, any>;
   summary: Record<string, any>;
+  status: 'pending' | 'running' | 'completed' | 'failed';
+  status_display?: string;
+  progress: number;
+  error?: string | null;
+  started_at?: string | null;
+  finished_at?: string | null;
+  duration_ms?: number | null;
   generated_by?: number;
   generated_by_name?: string;
   generated_at: string;
 }
 
+export interface ExportJob {
+  id: number;
+  resource: 'appointments' | 'customers' | 'payments' | 'expenses' | 'generated_report';
+  file_format: 'xlsx' | 'pdf';
+  parameters: Record<string, any>;
+  status: 'pending' | 'running' | 'completed' | 'failed';
+  status_display?: string;
+  progress: number;
+  error?: string | null;
+  file_size?: number | null;
+  download_url?: string | null;
+  started_at?: string | null;
+  finished_at?: string | null;
+  expires_at?: string | null;
+  created_by?: number;
+  created_by_name?: string;
+  created_at: string;
+}
+
 // API Response types
 export interface ApiResponse<T> {
   count?: number;